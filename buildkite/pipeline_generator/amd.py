@@ -1,9 +1,11 @@
 import os
 from copy import deepcopy
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Any, Dict, List, Mapping, Optional, TypedDict
 
 from constants import AgentQueue, DeviceType
+from utils_lib.frozen import FrozenDict, freeze
 
 AMD_TEST_COMMAND = "bash .buildkite/scripts/hardware_ci/run-amd-test.sh"
 AMD_STABLE_CI_BASE_IMAGE = "rocm/vllm-dev:ci_base"
@@ -409,6 +411,38 @@ def get_amd_k8s_plugin(
     }
 
 
+@lru_cache(maxsize=None)
+def _get_amd_env_template(dind: bool, gpu_count: int) -> FrozenDict:
+    """The env of a step without extra env; only VLLM_TEST_COMMANDS differs."""
+    return freeze(
+        _get_amd_env(commands="", extra_env=None, dind=dind, gpu_count=gpu_count)
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_amd_native_plugin(gpu_count: int) -> FrozenDict:
+    """The pod patch of native steps, shared by every step with `gpu_count`."""
+    container_env = {
+        "AMD_CI_RUNTIME": "native",
+        "NATIVE_CI": "true",
+        "VLLM_CI_DOCKER_DISABLED": "1",
+        "VLLM_CI_EXPECTED_GPU_COUNT": str(gpu_count),
+        "VLLM_CI_WORKSPACE": AMD_NATIVE_WORKSPACE,
+        "VLLM_CI_REQUIRE_WORKSPACE_MOUNT": "1",
+        "PYTORCH_ROCM_ARCH": "",
+    }
+    return freeze(
+        get_amd_k8s_plugin(
+            image=AMD_NATIVE_BASE_IMAGE,
+            gpu_count=gpu_count,
+            workspace=AMD_NATIVE_WORKSPACE,
+            workspace_volume_name=AMD_NATIVE_WORKSPACE_VOLUME,
+            shm_size=AMD_NATIVE_SHM_SIZE,
+            container_env=container_env,
+        )
+    )
+
+
 def build_amd_step_options(
     *,
     label: str,
@@ -439,32 +473,12 @@ def build_amd_step_options(
         raise ValueError("Native AMD jobs do not support multi-node execution.")
 
     gpu_count = resolve_amd_gpu_count(device, num_devices, no_gpu)
-    plugins = None
-    if not dind:
-        container_env = {
-            "AMD_CI_RUNTIME": "native",
-            "NATIVE_CI": "true",
-            "VLLM_CI_DOCKER_DISABLED": "1",
-            "VLLM_CI_EXPECTED_GPU_COUNT": str(gpu_count),
-            "VLLM_CI_WORKSPACE": AMD_NATIVE_WORKSPACE,
-            "VLLM_CI_REQUIRE_WORKSPACE_MOUNT": "1",
-            "PYTORCH_ROCM_ARCH": "",
-        }
-        plugins = [
-            get_amd_k8s_plugin(
-                image=AMD_NATIVE_BASE_IMAGE,
-                gpu_count=gpu_count,
-                workspace=AMD_NATIVE_WORKSPACE,
-                workspace_volume_name=AMD_NATIVE_WORKSPACE_VOLUME,
-                shm_size=AMD_NATIVE_SHM_SIZE,
-                container_env=container_env,
-            )
-        ]
+    plugins = None if dind else [_get_amd_native_plugin(gpu_count)]
 
     if no_plugin:
         env = dict(extra_env or {}) or None
         step_commands = [commands]
-    else:
+    elif extra_env:
         env = _get_amd_env(
             commands=commands,
             extra_env=extra_env,
@@ -472,6 +486,10 @@ def build_amd_step_options(
             gpu_count=gpu_count,
         )
         step_commands = [AMD_TEST_COMMAND]
+    else:
+        env = dict(_get_amd_env_template(dind, gpu_count))
+        env["VLLM_TEST_COMMANDS"] = commands
+        step_commands = [AMD_TEST_COMMAND]
 
     return {
         "label": get_amd_label(label, device),
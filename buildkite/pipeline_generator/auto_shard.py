@@ -0,0 +1,139 @@
+import csv
+import heapq
+import json
+import math
+import statistics
+from typing import Dict, List
+
+from step import Step
+
+# Commands opt in to auto-sharding by taking their test arguments from this
+# variable, with the unsharded arguments as the shell default, e.g.
+# `pytest -v -s $${VLLM_TEST_SHARD_ARGS:-models/}`.
+SHARD_ARGS_ENV_VAR = "VLLM_TEST_SHARD_ARGS"
+DEFAULT_TARGET_MINUTES = 30
+MAX_SHARDS = 16
+
+
+def load_test_timings(path: str) -> Dict[str, Dict[str, float]]:
+    """Read per-test durations in seconds, keyed by step key then test id.
+
+    JSON files map step keys to `{test_id: seconds}` objects, where seconds
+    may be a list of samples. CSV files have `step_key`, `test` and
+    `duration_seconds` columns, one row per sample. Several samples for a
+    test are reduced to their median.
+    """
+    samples: Dict[str, Dict[str, List[float]]] = {}
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            columns = {"step_key", "test", "duration_seconds"}
+            if not reader.fieldnames or not columns <= set(reader.fieldnames):
+                raise ValueError(
+                    f"{path} must have 'step_key', 'test' and 'duration_seconds' "
+                    "columns"
+                )
+            for row in reader:
+                samples.setdefault(row["step_key"], {}).setdefault(
+                    row["test"], []
+                ).append(float(row["duration_seconds"]))
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not all(
+            isinstance(tests, dict) for tests in data.values()
+        ):
+            raise ValueError(f"{path} must map step keys to {{test: seconds}} objects")
+        for key, tests in data.items():
+            samples[key] = {}
+            for test, value in tests.items():
+                values = value if isinstance(value, list) else [value]
+                samples[key][test] = [float(v) for v in values]
+    return {
+        key: {
+            test: statistics.median(values) for test, values in tests.items() if values
+        }
+        for key, tests in samples.items()
+    }
+
+
+def balance_shards(timings: Dict[str, float], num_shards: int) -> List[List[str]]:
+    """Split tests into `num_shards` lists of near-equal total duration.
+
+    Longest tests are placed first, each on the least loaded shard (the LPT
+    rule), which keeps the longest shard within 4/3 of the optimum. Ties go
+    to the lower shard and the lexically smaller test, so the split is
+    stable across runs.
+    """
+    shards: List[List[str]] = [[] for _ in range(num_shards)]
+    loads = [(0.0, index) for index in range(num_shards)]
+    for test in sorted(timings, key=lambda test: (-timings[test], test)):
+        load, index = heapq.heappop(loads)
+        shards[index].append(test)
+        heapq.heappush(loads, (load + timings[test], index))
+    return shards
+
+
+def shard_count(timings: Dict[str, float], target_seconds: float) -> int:
+    """Jobs needed for each to take about `target_seconds`."""
+    if not timings or target_seconds <= 0:
+        return 1
+    needed = math.ceil(sum(timings.values()) / target_seconds)
+    return max(1, min(needed, len(timings), MAX_SHARDS))
+
+
+def _uses_shard_args(step: Step) -> bool:
+    return any(SHARD_ARGS_ENV_VAR in command for command in step.commands or [])
+
+
+def _shell_double_quote(text: str) -> str:
+    # `$` is doubled so `buildkite-agent pipeline upload` leaves it alone.
+    # Step commands have every `'` rewritten to `"`, so a single quote is
+    # produced by printf instead of appearing literally.
+    escaped = (
+        text.replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("`", "\\`")
+        .replace("$", "\\$$")
+        .replace("'", "$$(printf \\\\047)")
+    )
+    return f'"{escaped}"'
+
+
+def shard_selection_command(shards: List[List[str]]) -> str:
+    """Shell that exports the test arguments of this parallel job's shard."""
+    cases = " ".join(
+        f"{index}) {SHARD_ARGS_ENV_VAR}={_shell_double_quote(' '.join(tests))};;"
+        for index, tests in enumerate(shards)
+    )
+    return (
+        f'case "$$BUILDKITE_PARALLEL_JOB" in {cases} '
+        f'*) echo "No test shard $$BUILDKITE_PARALLEL_JOB" >&2; exit 1;; esac; '
+        f"export {SHARD_ARGS_ENV_VAR}"
+    )
+
+
+def auto_shard_steps(
+    steps: List[Step],
+    test_timings: Dict[str, Dict[str, float]],
+    target_seconds: float,
+) -> Dict[str, List[List[str]]]:
+    """Set `parallelism` on steps whose tests take longer than the target.
+
+    Eligible steps have timings, no hand-set `parallelism`, and commands that
+    read their test arguments from `VLLM_TEST_SHARD_ARGS`. Each gets a first
+    command that exports its shard's tests. Returns the shards by step key.
+    """
+    sharded = {}
+    for step in steps:
+        timings = test_timings.get(step.key or "")
+        if not timings or step.parallelism or not _uses_shard_args(step):
+            continue
+        num_shards = shard_count(timings, target_seconds)
+        if num_shards < 2:
+            continue
+        shards = balance_shards(timings, num_shards)
+        step.parallelism = num_shards
+        step.commands = [shard_selection_command(shards)] + step.commands
+        sharded[step.key] = shards
+    return sharded
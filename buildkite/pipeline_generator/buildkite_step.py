@@ -1,13 +1,23 @@
-from pydantic import BaseModel
-from typing import Dict, List, Optional, Any, Union, Literal
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Any,
+    Union,
+    Literal,
+)
 from copy import deepcopy
+from enum import Enum
 import base64
+import bisect
 from functools import lru_cache
 import gzip
+import hashlib
 from io import BytesIO
 import os
 from pathlib import Path
-import re
 import tarfile
 
 from amd import (
@@ -24,17 +34,24 @@ from amd import (
     get_rocm_base_refresh_timeout,
     is_amd_gpu_device,
 )
+from impact_analysis import ImpactAnalysis
 from step import Step
 from utils_lib.docker_utils import (
     get_image,
     get_ecr_cache_registry,
     get_torch_nightly_image,
 )
+from utils_lib.source_trie import SourceDependencyTrie, TriggeredDependencies
+from utils_lib.variable_injector import get_variable_injector
 from global_config import get_global_config
+import profiling
 from plugin.k8s_plugin import get_k8s_plugin
 from plugin.docker_plugin import get_docker_plugin
 from constants import DeviceType, AgentQueue
 
+if TYPE_CHECKING:
+    from output_cache import OutputCache
+
 # Key for the dedicated pre-commit step. Test steps that depend on an image
 # build also depend on this so pre-commit and image build can run in parallel.
 PRECOMMIT_STEP_KEY = "pre-commit"
@@ -43,6 +60,15 @@ PRECOMMIT_WAIT_INTERVAL = 60
 
 SKIP_TIMEOUT_ENV_VAR = "SKIP_TIMEOUT"
 EXIT_STATUS_NEGATIVE_ONE_RETRY = {"exit_status": -1, "limit": 1}
+AMD_HARDWARE_GROUP = "Hardware-AMD Tests"
+# The two parts of a converted group, cached separately because the AMD
+# group needs the AMD steps of later groups before their command steps.
+COMMAND_STEPS_PART = "steps"
+AMD_STEPS_PART = "amd_steps"
+
+# "inline" embeds the helper bundle in every traced step; "artifact" uploads it
+# once from the bootstrap step and has each traced step download it.
+OTEL_BUNDLE_ENV_VAR = "CI_INFRA_OTEL_BUNDLE"
 
 OTEL_HELPERS_DIR = Path(__file__).resolve().parent / "otel_helpers"
 OTEL_HELPER_FILES = (
@@ -54,8 +80,8 @@ OTEL_HELPER_FILES = (
 
 
 @lru_cache(maxsize=1)
-def _otel_helpers_bundle() -> str:
-    """Return a deterministic compressed bundle for injection into CI jobs."""
+def _otel_helpers_archive() -> bytes:
+    """Return a deterministic gzip tarball of the tracing helpers."""
     archive = BytesIO()
     with gzip.GzipFile(
         fileobj=archive, mode="wb", compresslevel=9, mtime=0
@@ -68,18 +94,66 @@ def _otel_helpers_bundle() -> str:
                 info.mode = 0o755 if name.endswith(".sh") else 0o644
                 info.mtime = 0
                 bundle.addfile(info, BytesIO(contents))
-    return base64.b64encode(archive.getvalue()).decode()
+    return archive.getvalue()
+
+
+@lru_cache(maxsize=1)
+def _otel_helpers_bundle() -> str:
+    """Return a deterministic compressed bundle for injection into CI jobs."""
+    return base64.b64encode(_otel_helpers_archive()).decode()
+
+
+@lru_cache(maxsize=1)
+def _otel_helpers_sha256() -> str:
+    return hashlib.sha256(_otel_helpers_archive()).hexdigest()
+
+
+def otel_helpers_artifact_name() -> str:
+    """Content-addressed name of the published helper bundle."""
+    return f"ci-infra-otel-{_otel_helpers_sha256()}.tar.gz"
+
+
+def otel_bundle_is_artifact() -> bool:
+    return os.getenv(OTEL_BUNDLE_ENV_VAR, "inline") == "artifact"
+
+
+def write_otel_helpers_artifact(directory: str) -> str:
+    """Write the helper bundle under its content-addressed name."""
+    path = os.path.join(directory, otel_helpers_artifact_name())
+    with open(path, "wb") as f:
+        f.write(_otel_helpers_archive())
+    return path
+
+
+def _otel_fetch_command() -> str:
+    """Shell that places the helpers in $CI_INFRA_OTEL_DIR."""
+    if not otel_bundle_is_artifact():
+        bundle = _otel_helpers_bundle()
+        return (
+            f'printf "%s" "{bundle}" | base64 --decode | '
+            'tar -xz -C "$$CI_INFRA_OTEL_DIR"'
+        )
+    # Every traced step downloads the one bundle published by the bootstrap
+    # step and refuses it unless the contents hash to the name it was
+    # published under.
+    name = otel_helpers_artifact_name()
+    archive = f"$$CI_INFRA_OTEL_DIR/{name}"
+    return (
+        f'buildkite-agent artifact download "{name}" "$$CI_INFRA_OTEL_DIR" '
+        ">/dev/null 2>&1 && "
+        f'test "$$(sha256sum "{archive}" | cut -d " " -f 1)" = '
+        f'"{_otel_helpers_sha256()}" && '
+        f'tar -xz -C "$$CI_INFRA_OTEL_DIR" -f "{archive}"'
+    )
 
 
 def _otel_setup_command() -> str:
     """Best-effort install of ci-infra-owned tracing helpers."""
-    bundle = _otel_helpers_bundle()
     return (
         "CI_INFRA_OTEL_READY=0; export CI_INFRA_OTEL_READY; "
         "if CI_INFRA_OTEL_DIR=$$(mktemp -d 2>/dev/null) && "
         "export CI_INFRA_OTEL_DIR && "
-        f'printf "%s" "{bundle}" | base64 --decode | '
-        'tar -xz -C "$$CI_INFRA_OTEL_DIR" && '
+        f"{_otel_fetch_command()} && "
         'sh -n "$$CI_INFRA_OTEL_DIR/ci_otel.sh" && '
         '. "$$CI_INFRA_OTEL_DIR/ci_otel.sh"; then :; else '
         'echo "vLLM CI OTel: tracing setup skipped" >&2 || :; '
@@ -200,23 +274,125 @@ def _get_timeout_in_minutes(
     return timeout_in_minutes
 
 
-class BuildkiteCommandStep(BaseModel):
-    label: str
-    group: Optional[str] = None
-    key: str
-    agents: Dict[str, str] = {}
-    commands: List[str] = []
-    depends_on: Optional[List[str]] = None
-    soft_fail: Optional[bool] = False
-    retry: Optional[Dict[str, Any]] = None
-    plugins: Optional[List[Dict[str, Any]]] = None
-    env: Optional[Dict[str, str]] = None
-    artifact_paths: Optional[List[str]] = None
-    parallelism: Optional[int] = None
-    concurrency: Optional[int] = None
-    concurrency_group: Optional[str] = None
-    timeout_in_minutes: Optional[int] = None
-    priority: Optional[int] = None
+def _copy(value: Any) -> Any:
+    """A shallow copy of a container argument, so callers can't alias it."""
+    if isinstance(value, dict):
+        return dict(value)
+    if isinstance(value, list):
+        return list(value)
+    return value
+
+
+def _str_values(values: Dict[str, Any]) -> Dict[str, str]:
+    # Agent queues are str enums; store their plain values.
+    return {
+        name: value.value if isinstance(value, Enum) else value
+        for name, value in values.items()
+    }
+
+
+def _dump_value(value: Any, exclude_none: bool) -> Any:
+    if isinstance(value, _SlottedStep):
+        return value.model_dump(exclude_none=exclude_none)
+    if isinstance(value, dict):
+        return {key: _dump_value(item, exclude_none) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_dump_value(item, exclude_none) for item in value]
+    return value
+
+
+class _SlottedStep:
+    """Base of the converted Buildkite steps: plain `__slots__` records.
+
+    Pydantic validates the job-dir `Step`s once, when they are loaded. The
+    steps converted from them are built many times per pipeline and are
+    not validated again. As with the pydantic models they replace,
+    container arguments are copied, so steps never share a `depends_on`
+    list, and `model_dump` returns every slot in order in fresh dicts and
+    lists.
+    """
+
+    __slots__ = ()
+
+    def model_dump(self, exclude_none: bool = False) -> Dict[str, Any]:
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None and exclude_none:
+                continue
+            data[name] = _dump_value(value, exclude_none)
+        return data
+
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self.__slots__
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class BuildkiteCommandStep(_SlottedStep):
+    __slots__ = (
+        "label",
+        "group",
+        "key",
+        "agents",
+        "commands",
+        "depends_on",
+        "soft_fail",
+        "retry",
+        "plugins",
+        "env",
+        "artifact_paths",
+        "parallelism",
+        "concurrency",
+        "concurrency_group",
+        "timeout_in_minutes",
+        "priority",
+    )
+
+    def __init__(
+        self,
+        *,
+        label: str,
+        key: str,
+        group: Optional[str] = None,
+        agents: Optional[Dict[str, str]] = None,
+        commands: Optional[List[str]] = None,
+        depends_on: Optional[List[str]] = None,
+        soft_fail: Optional[bool] = False,
+        retry: Optional[Dict[str, Any]] = None,
+        plugins: Optional[List[Dict[str, Any]]] = None,
+        env: Optional[Dict[str, str]] = None,
+        artifact_paths: Optional[List[str]] = None,
+        parallelism: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        concurrency_group: Optional[str] = None,
+        timeout_in_minutes: Optional[int] = None,
+        priority: Optional[int] = None,
+    ):
+        self.label = label
+        self.group = group
+        self.key = key
+        self.agents = _str_values(agents or {})
+        self.commands = list(commands or ())
+        self.depends_on = _copy(depends_on)
+        self.soft_fail = soft_fail
+        self.retry = _copy(retry)
+        self.plugins = _copy(plugins)
+        self.env = _copy(env)
+        self.artifact_paths = _copy(artifact_paths)
+        self.parallelism = parallelism
+        self.concurrency = concurrency
+        self.concurrency_group = concurrency_group
+        self.timeout_in_minutes = timeout_in_minutes
+        self.priority = priority
 
     def to_yaml(self):
         return {
@@ -239,18 +415,35 @@ class BuildkiteCommandStep(BaseModel):
         }
 
 
-class BuildkiteBlockStep(BaseModel):
-    block: str
-    depends_on: Optional[Union[str, List[str]]] = None
-    key: str
+class BuildkiteBlockStep(_SlottedStep):
+    __slots__ = ("block", "depends_on", "key")
+
+    def __init__(
+        self,
+        *,
+        block: str,
+        key: str,
+        depends_on: Optional[Union[str, List[str]]] = None,
+    ):
+        self.block = block
+        self.depends_on = _copy(depends_on)
+        self.key = key
 
     def to_yaml(self):
         return {"block": self.block, "depends_on": self.depends_on, "key": self.key}
 
 
-class BuildkiteGroupStep(BaseModel):
-    group: str
-    steps: List[Union[BuildkiteCommandStep, BuildkiteBlockStep]]
+class BuildkiteGroupStep(_SlottedStep):
+    __slots__ = ("group", "steps")
+
+    def __init__(
+        self,
+        *,
+        group: str,
+        steps: List[Union[BuildkiteCommandStep, BuildkiteBlockStep]],
+    ):
+        self.group = group
+        self.steps = list(steps)
 
 
 def _get_step_plugin(step: Step):
@@ -344,7 +537,8 @@ def _get_variables_to_inject() -> Dict[str, str]:
     if global_config["name"] != "vllm_ci":
         return {}
 
-    cache_from_tag, cache_to_tag = get_ecr_cache_registry()
+    with profiling.phase("ecr_cache"):
+        cache_from_tag, cache_to_tag = get_ecr_cache_registry()
     registries = global_config["registries"]
     repositories = global_config["repositories"]
     repo = (
@@ -474,18 +668,14 @@ def _prepare_commands(
     if continue_on_failure:
         commands.append("exit $$CI_OVERALL_STATUS")
 
+    # Only whole variable references are replaced (not substrings), with one
+    # precompiled pass per command.
+    injector = get_variable_injector(variables_to_inject)
     final_commands = []
     for command in commands:
         if not step.num_nodes:
             command = command.replace("'", '"')
-        for variable, value in variables_to_inject.items():
-            if not value:
-                continue
-            # Use regex to only replace whole variable matches (not substrings)
-            # Escape variable (may have $ or special characters)
-            pattern = re.escape(variable)
-            command = re.sub(pattern + r"\b", value, command)
-        final_commands.append(command)
+        final_commands.append(injector.inject(command))
 
     if step.working_dir and not (
         step.label.startswith(":docker:") or (step.num_nodes and step.num_nodes >= 2)
@@ -568,234 +758,331 @@ def ensure_exit_status_negative_one_retry(
     return retry_policy
 
 
-def convert_group_step_to_buildkite_step(
-    group_steps: Dict[str, List[Step]],
-) -> List[BuildkiteGroupStep]:
-    buildkite_group_steps = []
-    variables_to_inject = _get_variables_to_inject()
-    print(variables_to_inject)
-    global_config = get_global_config()
-    list_file_diff = global_config["list_file_diff"]
+def _convert_command_steps(
+    steps: List[Step],
+    variables_to_inject: Dict[str, str],
+    list_file_diff: List[str],
+    triggered: Optional[TriggeredDependencies] = None,
+    test_impact: Optional[ImpactAnalysis] = None,
+) -> List[Union["BuildkiteCommandStep", "BuildkiteBlockStep"]]:
+    """Command steps, and their block steps, of a group's non-AMD steps."""
+    group_steps_list = []
+    for step in steps:
+        if is_amd_gpu_device(step.device):
+            continue
+        step_key = step.key or _generate_step_key(step.label)
+
+        # command step
+        step_commands = _prepare_commands(step, variables_to_inject)
+
+        buildkite_step = BuildkiteCommandStep(
+            label=step.label,
+            key=step_key,
+            commands=step_commands,
+            depends_on=step.depends_on,
+            soft_fail=step.soft_fail,
+            agents=_get_step_agents(step),
+            priority=1000 if os.getenv("PRIORITY", "") == "HIGH" else 0,
+            concurrency=step.concurrency,
+            concurrency_group=step.concurrency_group,
+        )
 
-    amd_hardware_steps = []
+        if step.env:
+            buildkite_step.env = step.env
+        if step.retry:
+            buildkite_step.retry = step.retry
+        buildkite_step.retry = ensure_exit_status_negative_one_retry(
+            buildkite_step.retry
+        )
+        if step.parallelism:
+            buildkite_step.parallelism = step.parallelism
+        if (
+            step.device == DeviceType.AMD_CPU
+            or step.device == DeviceType.AMD_CPU.value
+        ):
+            buildkite_step.retry = ensure_amd_stack_error_retry(
+                buildkite_step.retry
+            )
+        if step.key == AMD_ROCM_BASE_REFRESH_STEP_KEY:
+            refresh_env = dict(buildkite_step.env or {})
+            refresh_env.update(get_rocm_base_refresh_env())
+            buildkite_step.env = refresh_env
+            buildkite_step.timeout_in_minutes = _get_timeout_in_minutes(
+                get_rocm_base_refresh_timeout()
+            )
+        elif (
+            step.device == DeviceType.AMD_CPU
+            or step.device == DeviceType.AMD_CPU.value
+        ):
+            buildkite_step.timeout_in_minutes = _get_timeout_in_minutes(
+                get_amd_timeout_in_minutes(step.timeout_in_minutes)
+            )
+        elif step.timeout_in_minutes:
+            buildkite_step.timeout_in_minutes = _get_timeout_in_minutes(
+                step.timeout_in_minutes
+            )
 
-    for group, steps in group_steps.items():
-        group_steps_list = []
-        for step in steps:
-            step_key = step.key or _generate_step_key(step.label)
-            if is_amd_gpu_device(step.device):
-                amd_commands = [f"export VLLM_TEST_GROUP_NAME={step_key}"]
-                amd_commands.extend(
-                    _prepare_commands(
-                        step,
-                        variables_to_inject,
-                        setup_profile="amd",
-                    )
-                )
-                amd_step = _create_amd_step(
-                    label=step.label,
-                    key=step_key,
-                    device=step.device,
-                    num_devices=step.num_devices,
-                    commands_str=" && ".join(amd_commands),
-                    depends_on=step.depends_on,
-                    extra_env=step.env,
-                    dind=step.dind,
-                    no_plugin=step.no_plugin or False,
-                    no_gpu=step.no_gpu or False,
-                    num_nodes=step.num_nodes,
-                    soft_fail=step.soft_fail,
-                    parallelism=step.parallelism,
-                    concurrency=step.concurrency,
-                    concurrency_group=step.concurrency_group,
-                    timeout_in_minutes=step.timeout_in_minutes,
-                    agent_tags=step.agent_tags,
-                )
-                if not _step_should_run(step, list_file_diff):
-                    block_step = _create_block_step(
-                        block=f"Run {amd_step.label}",
-                        key=f"block-amd-{step_key}",
-                        command_step=amd_step,
-                        depends_on=amd_step.depends_on,
-                    )
-                    amd_hardware_steps.append(block_step)
-                amd_hardware_steps.append(amd_step)
-                continue
+        if not _step_should_run(step, list_file_diff, triggered, test_impact):
+            block_step = _create_block_step(
+                block=f"Run {step.label}",
+                key=f"block-{step_key}",
+                command_step=buildkite_step,
+                depends_on=[],
+                append_to_command_depends_on=False,
+            )
+            group_steps_list.append(block_step)
+
+        # add plugin
+        if not step.no_plugin and not (
+            step.label.startswith(":docker:")
+            or (step.num_nodes and step.num_nodes >= 2)
+        ):
+            buildkite_step.plugins = [_get_step_plugin(step)]
 
-            # command step
-            step_commands = _prepare_commands(step, variables_to_inject)
+        group_steps_list.append(buildkite_step)
 
-            buildkite_step = BuildkiteCommandStep(
+    return group_steps_list
+
+
+def _convert_amd_steps(
+    steps: List[Step],
+    variables_to_inject: Dict[str, str],
+    list_file_diff: List[str],
+    triggered: Optional[TriggeredDependencies] = None,
+    test_impact: Optional[ImpactAnalysis] = None,
+) -> List[Union["BuildkiteCommandStep", "BuildkiteBlockStep"]]:
+    """AMD GPU steps and AMD mirrors of a group, with their block steps."""
+    global_config = get_global_config()
+    amd_hardware_steps = []
+    for step in steps:
+        step_key = step.key or _generate_step_key(step.label)
+        if is_amd_gpu_device(step.device):
+            amd_commands = [f"export VLLM_TEST_GROUP_NAME={step_key}"]
+            amd_commands.extend(
+                _prepare_commands(
+                    step,
+                    variables_to_inject,
+                    setup_profile="amd",
+                )
+            )
+            amd_step = _create_amd_step(
                 label=step.label,
                 key=step_key,
-                commands=step_commands,
+                device=step.device,
+                num_devices=step.num_devices,
+                commands_str=" && ".join(amd_commands),
                 depends_on=step.depends_on,
+                extra_env=step.env,
+                dind=step.dind,
+                no_plugin=step.no_plugin or False,
+                no_gpu=step.no_gpu or False,
+                num_nodes=step.num_nodes,
                 soft_fail=step.soft_fail,
-                agents=_get_step_agents(step),
-                priority=1000 if os.getenv("PRIORITY", "") == "HIGH" else 0,
+                parallelism=step.parallelism,
                 concurrency=step.concurrency,
                 concurrency_group=step.concurrency_group,
+                timeout_in_minutes=step.timeout_in_minutes,
+                agent_tags=step.agent_tags,
             )
-
-            if step.env:
-                buildkite_step.env = step.env
-            if step.retry:
-                buildkite_step.retry = step.retry
-            buildkite_step.retry = ensure_exit_status_negative_one_retry(
-                buildkite_step.retry
+            if not _step_should_run(step, list_file_diff, triggered, test_impact):
+                block_step = _create_block_step(
+                    block=f"Run {amd_step.label}",
+                    key=f"block-amd-{step_key}",
+                    command_step=amd_step,
+                    depends_on=amd_step.depends_on,
+                )
+                amd_hardware_steps.append(block_step)
+            amd_hardware_steps.append(amd_step)
+            continue
+
+        # Create AMD mirror step and its block step if specified/applicable
+        if (
+            step.mirror
+            and step.mirror.get("amd")
+            and global_config["only_step_keys"] is None
+        ):
+            amd = step.mirror["amd"]
+            amd_no_plugin = amd.get("no_plugin", False)
+            amd_no_gpu = amd.get("no_gpu", step.no_gpu or False)
+            amd_num_devices = _first_configured(
+                amd.get("num_devices"),
+                amd.get("num_gpus"),
+                step.num_devices,
             )
-            if step.parallelism:
-                buildkite_step.parallelism = step.parallelism
-            if (
-                step.device == DeviceType.AMD_CPU
-                or step.device == DeviceType.AMD_CPU.value
-            ):
-                buildkite_step.retry = ensure_amd_stack_error_retry(
-                    buildkite_step.retry
+            custom_commands = amd.get("commands")
+            if custom_commands:
+                amd_command_step = step.model_copy(
+                    update={
+                        "commands": custom_commands,
+                        "working_dir": amd.get("working_dir", step.working_dir),
+                        "no_plugin": amd_no_plugin,
+                    }
                 )
-            if step.key == AMD_ROCM_BASE_REFRESH_STEP_KEY:
-                refresh_env = dict(buildkite_step.env or {})
-                refresh_env.update(get_rocm_base_refresh_env())
-                buildkite_step.env = refresh_env
-                buildkite_step.timeout_in_minutes = _get_timeout_in_minutes(
-                    get_rocm_base_refresh_timeout()
+                amd_commands_str = " && ".join(
+                    _prepare_commands(
+                        amd_command_step,
+                        variables_to_inject,
+                        setup_profile="amd",
+                    )
                 )
-            elif (
-                step.device == DeviceType.AMD_CPU
-                or step.device == DeviceType.AMD_CPU.value
-            ):
-                buildkite_step.timeout_in_minutes = _get_timeout_in_minutes(
-                    get_amd_timeout_in_minutes(step.timeout_in_minutes)
+            else:
+                amd_command_step = step.model_copy(
+                    update={"no_plugin": amd_no_plugin}
                 )
-            elif step.timeout_in_minutes:
-                buildkite_step.timeout_in_minutes = _get_timeout_in_minutes(
-                    step.timeout_in_minutes
+                amd_commands_str = " && ".join(
+                    _prepare_commands(
+                        amd_command_step,
+                        variables_to_inject,
+                        setup_profile="amd",
+                    )
                 )
 
-            if not _step_should_run(step, list_file_diff):
-                block_step = _create_block_step(
-                    block=f"Run {step.label}",
-                    key=f"block-{step_key}",
-                    command_step=buildkite_step,
-                    depends_on=[],
-                    append_to_command_depends_on=False,
+            extra_env = dict(step.env or {})
+            extra_env.update(amd.get("env", {}))
+            amd_step = _create_amd_step(
+                label=step.label,
+                key=f"amd-{step_key}",
+                device=amd["device"],
+                num_devices=amd_num_devices,
+                commands_str=amd_commands_str,
+                depends_on=amd.get("depends_on"),
+                extra_env=extra_env,
+                dind=amd.get("dind", True),
+                no_plugin=amd_no_plugin,
+                no_gpu=amd_no_gpu,
+                num_nodes=amd.get("num_nodes", step.num_nodes),
+                soft_fail=amd.get("soft_fail", step.soft_fail or False),
+                parallelism=step.parallelism,
+                concurrency=amd.get("concurrency", step.concurrency),
+                concurrency_group=amd.get(
+                    "concurrency_group", step.concurrency_group
+                ),
+                timeout_in_minutes=amd.get("timeout_in_minutes"),
+                agent_tags=amd.get("agent_tags"),
+                display_label=amd.get("label"),
+            )
+            if not _amd_mirror_step_should_run(
+                step, amd, list_file_diff, triggered, test_impact
+            ):
+                # Block step depends on the shared AMD image build.
+                mirror_build_dep = (
+                    amd_step.depends_on[0]
+                    if amd_step.depends_on
+                    else "image-build-amd"
                 )
-                group_steps_list.append(block_step)
+                amd_block_step = _create_block_step(
+                    block=f"Run {amd_step.label}"
+                    if amd.get("label")
+                    else f"Run AMD: {step.label}",
+                    key=f"block-amd-{step_key}",
+                    command_step=amd_step,
+                    depends_on=[mirror_build_dep],
+                )
+                amd_hardware_steps.append(amd_block_step)
+            amd_hardware_steps.append(amd_step)
 
-            # add plugin
-            if not step.no_plugin and not (
-                step.label.startswith(":docker:")
-                or (step.num_nodes and step.num_nodes >= 2)
-            ):
-                buildkite_step.plugins = [_get_step_plugin(step)]
+    return amd_hardware_steps
 
-            group_steps_list.append(buildkite_step)
 
-            # Create AMD mirror step and its block step if specified/applicable
-            if (
-                step.mirror
-                and step.mirror.get("amd")
-                and global_config["only_step_keys"] is None
-            ):
-                amd = step.mirror["amd"]
-                amd_no_plugin = amd.get("no_plugin", False)
-                amd_no_gpu = amd.get("no_gpu", step.no_gpu or False)
-                amd_num_devices = _first_configured(
-                    amd.get("num_devices"),
-                    amd.get("num_gpus"),
-                    step.num_devices,
-                )
-                custom_commands = amd.get("commands")
-                if custom_commands:
-                    amd_command_step = step.model_copy(
-                        update={
-                            "commands": custom_commands,
-                            "working_dir": amd.get("working_dir", step.working_dir),
-                            "no_plugin": amd_no_plugin,
-                        }
-                    )
-                    amd_commands_str = " && ".join(
-                        _prepare_commands(
-                            amd_command_step,
-                            variables_to_inject,
-                            setup_profile="amd",
-                        )
-                    )
-                else:
-                    amd_command_step = step.model_copy(
-                        update={"no_plugin": amd_no_plugin}
-                    )
-                    amd_commands_str = " && ".join(
-                        _prepare_commands(
-                            amd_command_step,
-                            variables_to_inject,
-                            setup_profile="amd",
-                        )
-                    )
+def iter_buildkite_group_steps(
+    group_steps: Dict[str, List[Step]],
+    test_impact: Optional[ImpactAnalysis] = None,
+    output_cache: Optional["OutputCache"] = None,
+) -> Iterator[BuildkiteGroupStep]:
+    """Convert groups one at a time, yielding them in output order.
+
+    Groups come sorted by name. The AMD group takes its sorted place but
+    collects the AMD steps of every group, so the AMD steps of the groups
+    after it are converted before it is yielded and their command steps
+    after. Only the group being yielded, plus the AMD steps, is kept.
+    """
+    variables_to_inject = _get_variables_to_inject()
+    print(variables_to_inject)
+    list_file_diff = get_global_config()["list_file_diff"]
+    triggered = _build_source_dependency_trie(group_steps).triggered(list_file_diff)
+    group_keys: Dict[str, str] = {}
+
+    def convert(group: str, part: str) -> List[Any]:
+        steps = group_steps[group]
+        convert_steps = (
+            _convert_amd_steps if part == AMD_STEPS_PART else _convert_command_steps
+        )
+        if output_cache is None:
+            return convert_steps(
+                steps, variables_to_inject, list_file_diff, triggered, test_impact
+            )
+        if group not in group_keys:
+            group_keys[group] = output_cache.group_key(
+                group,
+                steps,
+                variables_to_inject,
+                _group_run_decisions(steps, list_file_diff, triggered, test_impact),
+            )
+        converted = output_cache.get_steps(part, group_keys[group])
+        if converted is None:
+            converted = convert_steps(
+                steps, variables_to_inject, list_file_diff, triggered, test_impact
+            )
+            output_cache.put_steps(part, group_keys[group], converted)
+        return converted
+
+    def command_group(group: str) -> Optional[BuildkiteGroupStep]:
+        steps = convert(group, COMMAND_STEPS_PART)
+        return BuildkiteGroupStep(group=group, steps=steps) if steps else None
+
+    groups = sorted(group_steps)
+    amd_index = bisect.bisect_right(groups, AMD_HARDWARE_GROUP)
+    amd_steps_by_group: Dict[str, List[Any]] = {}
+    for group in groups[:amd_index]:
+        amd_steps_by_group[group] = convert(group, AMD_STEPS_PART)
+        group_step = command_group(group)
+        if group_step is not None:
+            yield group_step
+    for group in groups[amd_index:]:
+        amd_steps_by_group[group] = convert(group, AMD_STEPS_PART)
+    # AMD steps keep the order of the job files, like the other groups' steps.
+    amd_hardware_steps = [
+        amd_step for group in group_steps for amd_step in amd_steps_by_group[group]
+    ]
+    del amd_steps_by_group
+    if amd_hardware_steps:
+        yield BuildkiteGroupStep(group=AMD_HARDWARE_GROUP, steps=amd_hardware_steps)
+    del amd_hardware_steps
+    for group in groups[amd_index:]:
+        group_step = command_group(group)
+        if group_step is not None:
+            yield group_step
 
-                extra_env = dict(step.env or {})
-                extra_env.update(amd.get("env", {}))
-                amd_step = _create_amd_step(
-                    label=step.label,
-                    key=f"amd-{step_key}",
-                    device=amd["device"],
-                    num_devices=amd_num_devices,
-                    commands_str=amd_commands_str,
-                    depends_on=amd.get("depends_on"),
-                    extra_env=extra_env,
-                    dind=amd.get("dind", True),
-                    no_plugin=amd_no_plugin,
-                    no_gpu=amd_no_gpu,
-                    num_nodes=amd.get("num_nodes", step.num_nodes),
-                    soft_fail=amd.get("soft_fail", step.soft_fail or False),
-                    parallelism=step.parallelism,
-                    concurrency=amd.get("concurrency", step.concurrency),
-                    concurrency_group=amd.get(
-                        "concurrency_group", step.concurrency_group
-                    ),
-                    timeout_in_minutes=amd.get("timeout_in_minutes"),
-                    agent_tags=amd.get("agent_tags"),
-                    display_label=amd.get("label"),
-                )
-                if not _amd_mirror_should_run(
-                    _step_should_run(
-                        _get_amd_mirror_effective_step(step, amd),
-                        list_file_diff,
-                    ),
-                    list_file_diff,
-                ):
-                    # Block step depends on the shared AMD image build.
-                    mirror_build_dep = (
-                        amd_step.depends_on[0]
-                        if amd_step.depends_on
-                        else "image-build-amd"
-                    )
-                    amd_block_step = _create_block_step(
-                        block=f"Run {amd_step.label}"
-                        if amd.get("label")
-                        else f"Run AMD: {step.label}",
-                        key=f"block-amd-{step_key}",
-                        command_step=amd_step,
-                        depends_on=[mirror_build_dep],
-                    )
-                    amd_hardware_steps.append(amd_block_step)
-                amd_hardware_steps.append(amd_step)
 
-        if group_steps_list:
-            buildkite_group_steps.append(
-                BuildkiteGroupStep(group=group, steps=group_steps_list)
-            )
+def convert_group_step_to_buildkite_step(
+    group_steps: Dict[str, List[Step]],
+    test_impact: Optional[ImpactAnalysis] = None,
+    output_cache: Optional["OutputCache"] = None,
+) -> List[BuildkiteGroupStep]:
+    return list(iter_buildkite_group_steps(group_steps, test_impact, output_cache))
 
-    # If AMD hardware steps exist, make them a group step.
-    if amd_hardware_steps:
-        buildkite_group_steps.append(
-            BuildkiteGroupStep(group="Hardware-AMD Tests", steps=amd_hardware_steps)
-        )
 
-    return buildkite_group_steps
+def _build_source_dependency_trie(
+    group_steps: Dict[str, List[Step]],
+) -> SourceDependencyTrie:
+    """Compile every dependency list _step_should_run may look up."""
+    trie = SourceDependencyTrie([AMD_NATIVE_RUNTIME_SOURCE_DEPENDENCIES])
+    for steps in group_steps.values():
+        for step in steps:
+            trie.add(step.source_file_dependencies)
+            if step.mirror and step.mirror.get("amd"):
+                trie.add(
+                    _get_amd_mirror_source_file_dependencies(step, step.mirror["amd"])
+                )
+    return trie
 
 
-def _step_should_run(step: Step, list_file_diff: List[str]) -> bool:
+def _step_should_run(
+    step: Step,
+    list_file_diff: List[str],
+    triggered: Optional[TriggeredDependencies] = None,
+    test_impact: Optional[ImpactAnalysis] = None,
+) -> bool:
     if os.getenv("NOAUTO") == "1":
         return False
     global_config = get_global_config()
@@ -813,41 +1100,101 @@ def _step_should_run(step: Step, list_file_diff: List[str]) -> bool:
         is_amd_gpu_device(step.device)
         and not step.dind
         and _source_file_dependencies_match(
-            AMD_NATIVE_RUNTIME_SOURCE_DEPENDENCIES, list_file_diff
+            AMD_NATIVE_RUNTIME_SOURCE_DEPENDENCIES, list_file_diff, triggered
         )
     ):
         return True
     if global_config["run_all"]:
         return True
+    if test_impact is not None:
+        impacted = test_impact.step_is_impacted(step)
+        if impacted is not None:
+            # Changed modules are matched by imports; the rest by prefix.
+            return impacted or _source_file_dependencies_match(
+                step.source_file_dependencies, test_impact.unmapped_diff
+            )
     return _source_file_dependencies_match(
-        step.source_file_dependencies, list_file_diff
+        step.source_file_dependencies, list_file_diff, triggered
     )
 
 
-def _get_amd_mirror_effective_step(step: Step, amd: Dict[str, Any]) -> Step:
+def _amd_mirror_step_should_run(
+    step: Step,
+    amd: Dict[str, Any],
+    list_file_diff: List[str],
+    triggered: Optional[TriggeredDependencies] = None,
+    test_impact: Optional[ImpactAnalysis] = None,
+) -> bool:
+    return _amd_mirror_should_run(
+        _step_should_run(
+            _get_amd_mirror_effective_step(step, amd),
+            list_file_diff,
+            triggered,
+            test_impact,
+        ),
+        list_file_diff,
+    )
+
+
+def _group_run_decisions(
+    steps: List[Step],
+    list_file_diff: List[str],
+    triggered: Optional[TriggeredDependencies] = None,
+    test_impact: Optional[ImpactAnalysis] = None,
+) -> List[bool]:
+    """Whether each step of a group, and each AMD mirror, runs unblocked.
+
+    These are the only part of a group's conversion that reads the changed
+    files.
+    """
+    decisions = []
+    for step in steps:
+        decisions.append(_step_should_run(step, list_file_diff, triggered, test_impact))
+        if step.mirror and step.mirror.get("amd"):
+            decisions.append(
+                _amd_mirror_step_should_run(
+                    step, step.mirror["amd"], list_file_diff, triggered, test_impact
+                )
+            )
+    return decisions
+
+
+def _get_amd_mirror_source_file_dependencies(
+    step: Step, amd: Dict[str, Any]
+) -> Optional[List[str]]:
     source_file_dependencies = list(amd.get("source_file_dependencies") or [])
     for dependency in step.source_file_dependencies or []:
         if dependency not in source_file_dependencies:
             source_file_dependencies.append(dependency)
-    if not source_file_dependencies:
-        source_file_dependencies = None
+    return source_file_dependencies or None
 
+
+def _get_amd_mirror_effective_step(step: Step, amd: Dict[str, Any]) -> Step:
     return step.model_copy(
         update={
             "key": None,
             "device": amd["device"],
             "dind": amd.get("dind", True),
             "optional": amd.get("optional", step.optional),
-            "source_file_dependencies": source_file_dependencies,
+            "source_file_dependencies": _get_amd_mirror_source_file_dependencies(
+                step, amd
+            ),
         }
     )
 
 
 def _source_file_dependencies_match(
-    source_file_dependencies: Optional[List[str]], list_file_diff: List[str]
+    source_file_dependencies: Optional[List[str]],
+    list_file_diff: List[str],
+    triggered: Optional[TriggeredDependencies] = None,
 ) -> bool:
     if not source_file_dependencies:
         return False
+    if triggered is not None:
+        # Precomputed by SourceDependencyTrie; lists it never saw are scanned.
+        matched = triggered.match(source_file_dependencies)
+        if matched is not None:
+            return matched
     # A "!"-prefixed entry is an exclusion: a changed file that matches an
     # exclusion does not count as a match, even if it also matches an include.
     # This lets a broad include like "vllm/" skip a self-contained subtree that
@@ -0,0 +1,245 @@
+import csv
+import json
+import statistics
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+from buildkite_step import BuildkiteBlockStep, BuildkiteCommandStep
+from step_graph import StepGraph
+
+# A critical-path step taking at least this share of the earliest finish
+# time is worth splitting, e.g. with `parallelism` or a second step.
+SPLIT_SHARE = 1 / 3
+# assign_priorities adds 0 to PRIORITY_LEVELS - 1 to each step's priority.
+PRIORITY_LEVELS = 100
+
+
+def load_step_durations(path: str) -> Dict[str, float]:
+    """Read historical step durations in seconds, keyed by step key.
+
+    JSON files map each key to a duration or to a list of samples. CSV files
+    have `key` and `duration_seconds` columns, one row per sample. Several
+    samples for a key are reduced to their median.
+    """
+    samples: Dict[str, List[float]] = {}
+    if path.endswith(".csv"):
+        with open(path, newline="") as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames or not {"key", "duration_seconds"} <= set(
+                reader.fieldnames
+            ):
+                raise ValueError(
+                    f"{path} must have 'key' and 'duration_seconds' columns"
+                )
+            for row in reader:
+                samples.setdefault(row["key"], []).append(
+                    float(row["duration_seconds"])
+                )
+    else:
+        with open(path) as f:
+            data = json.load(f)
+        if not isinstance(data, dict):
+            raise ValueError(f"{path} must map step keys to durations in seconds")
+        for key, value in data.items():
+            values = value if isinstance(value, list) else [value]
+            samples[key] = [float(v) for v in values]
+    return {key: statistics.median(values) for key, values in samples.items() if values}
+
+
+@dataclass
+class CriticalPathReport:
+    """Earliest schedule of a pipeline with unlimited agents."""
+
+    earliest_finish: float
+    critical_path: List[str]
+    durations: Dict[str, float]
+    earliest_start: Dict[str, float]
+    slack: Dict[str, float]
+    labels: Dict[str, str]
+    missing_durations: List[str] = field(default_factory=list)
+    gated: List[str] = field(default_factory=list)
+    split: List[str] = field(default_factory=list)
+    prioritize: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        lines = [
+            f"Critical path: {_minutes(self.earliest_finish)} earliest finish, "
+            f"{len(self.critical_path)} steps"
+        ]
+        for key in self.critical_path:
+            lines.append(
+                f"  {_minutes(self.earliest_start[key]):>10} +"
+                f"{_minutes(self.durations.get(key, 0.0)):>10}  {self.labels[key]}"
+            )
+        for key in self.split:
+            share = self.durations[key] / self.earliest_finish
+            lines.append(
+                f"Split: {self.labels[key]} ({_minutes(self.durations[key])}, "
+                f"{share:.0%} of the critical path)"
+            )
+        for key in self.prioritize:
+            lines.append(f"Prioritize: {self.labels[key]} (no slack)")
+        if self.missing_durations:
+            lines.append(
+                f"{len(self.missing_durations)} steps have no recorded duration "
+                "and count as zero."
+            )
+        if self.gated:
+            lines.append(
+                f"{len(self.gated)} steps wait on a block step and are left out."
+            )
+        return "\n".join(lines)
+
+    def to_json(self) -> Dict[str, Any]:
+        return {
+            "earliest_finish_seconds": self.earliest_finish,
+            "critical_path": self.critical_path,
+            "split": self.split,
+            "prioritize": self.prioritize,
+            "missing_durations": self.missing_durations,
+            "gated": self.gated,
+            "steps": {
+                key: {
+                    "earliest_start_seconds": self.earliest_start[key],
+                    "duration_seconds": self.durations.get(key, 0.0),
+                    "slack_seconds": self.slack[key],
+                }
+                for key in self.earliest_start
+            },
+        }
+
+
+def _minutes(seconds: float) -> str:
+    return f"{seconds / 60:.1f} min"
+
+
+def analyze_critical_path(
+    buildkite_group_steps: List[Any], durations: Dict[str, float]
+) -> CriticalPathReport:
+    """Compute the earliest finish time and critical path of a pipeline.
+
+    Every step starts as soon as all of its dependencies finish. Block steps
+    and the steps that wait on them run only if someone unblocks them, so
+    they are left out of the schedule and listed as gated. Dependencies
+    outside the pipeline, such as an image build uploaded by another step,
+    start at zero and take their recorded duration.
+    """
+    steps = [step for group in buildkite_group_steps for step in group.steps]
+    pipeline_graph = StepGraph(steps)
+    gated: Set[str] = set()
+    for key, step in pipeline_graph.steps_by_key.items():
+        if isinstance(step, BuildkiteBlockStep):
+            gated.add(key)
+            gated |= pipeline_graph.dependent_closure(key)
+    # Ungated steps only depend on ungated steps, so this graph is closed.
+    graph = StepGraph(step for step in steps if step.key not in gated)
+    labels: Dict[str, str] = {}
+    step_durations: Dict[str, float] = {}
+    missing: List[str] = []
+    for key, step in graph.steps_by_key.items():
+        labels[key] = step.label
+        step_durations[key] = durations.get(key, 0.0)
+        if key not in durations:
+            missing.append(key)
+
+    def finish_of(dependency: str) -> float:
+        if dependency in graph:
+            return earliest_finish[dependency]
+        labels.setdefault(dependency, dependency)
+        return durations.get(dependency, 0.0)
+
+    earliest_start: Dict[str, float] = {}
+    earliest_finish: Dict[str, float] = {}
+    for key in graph.topological_order():
+        earliest_start[key] = max(
+            (finish_of(dependency) for dependency in graph.dependencies[key]),
+            default=0.0,
+        )
+        earliest_finish[key] = earliest_start[key] + step_durations[key]
+    pipeline_finish = max(earliest_finish.values(), default=0.0)
+
+    latest_finish: Dict[str, float] = {}
+    for key in reversed(graph.topological_order()):
+        latest_finish[key] = min(
+            (
+                latest_finish[dependent] - step_durations[dependent]
+                for dependent in graph.dependents[key]
+            ),
+            default=pipeline_finish,
+        )
+    slack = {key: latest_finish[key] - earliest_finish[key] for key in earliest_finish}
+
+    critical_path: List[str] = []
+    current: Optional[str] = max(
+        earliest_finish, key=earliest_finish.__getitem__, default=None
+    )
+    while current is not None:
+        critical_path.append(current)
+        if current not in graph or not earliest_start[current]:
+            break
+        current = max(graph.dependencies[current], key=finish_of)
+    critical_path.reverse()
+    for key in critical_path:
+        if key not in graph:
+            step_durations[key] = durations.get(key, 0.0)
+            earliest_start[key] = 0.0
+            slack[key] = 0.0
+
+    split = sorted(
+        (
+            key
+            for key in critical_path
+            if pipeline_finish
+            and step_durations[key] >= SPLIT_SHARE * pipeline_finish
+            and key in graph
+            and not getattr(graph.steps_by_key[key], "parallelism", None)
+        ),
+        key=step_durations.__getitem__,
+        reverse=True,
+    )
+    prioritize = [
+        key
+        for key in critical_path
+        if key in graph and key not in split and step_durations[key] > 0
+    ]
+    return CriticalPathReport(
+        earliest_finish=pipeline_finish,
+        critical_path=critical_path,
+        durations=step_durations,
+        earliest_start=earliest_start,
+        slack=slack,
+        labels=labels,
+        missing_durations=missing,
+        gated=[key for key in pipeline_graph.steps_by_key if key in gated],
+        split=split,
+        prioritize=prioritize,
+    )
+
+
+def assign_priorities(
+    buildkite_group_steps: List[Any],
+    report: CriticalPathReport,
+    levels: int = PRIORITY_LEVELS,
+):
+    """Raise the priority of steps that head the longest remaining chains.
+
+    A step's boost grows with the time from its latest start to the end of
+    the pipeline: its own duration plus the longest chain waiting on it.
+    Long steps and steps without slack are dispatched first, ahead of short
+    ones that could run later without delaying the build. The boost is added
+    to the existing priority, so `PRIORITY=HIGH` builds still come first.
+    Gated steps keep their priority.
+    """
+    if not report.earliest_finish:
+        return
+    for group in buildkite_group_steps:
+        for step in group.steps:
+            if not isinstance(step, BuildkiteCommandStep):
+                continue
+            if step.key not in report.slack:
+                continue
+            latest_start = report.earliest_start[step.key] + report.slack[step.key]
+            remaining = report.earliest_finish - latest_start
+            step.priority = (step.priority or 0) + round(
+                (levels - 1) * remaining / report.earliest_finish
+            )
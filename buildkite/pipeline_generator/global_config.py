@@ -1,11 +1,12 @@
 import json
 import os
 import re
-from typing import Dict, FrozenSet, List, Optional, TypedDict
-
-import yaml
+from typing import Dict, FrozenSet, List, Optional, Tuple, TypedDict
 
+import profiling
+from utils_lib import yaml_io
 from utils_lib.git_utils import get_merge_base_commit, get_list_file_diff, get_pr_labels
+from utils_lib.pattern_set import PatternSet
 
 
 ONLY_STEP_KEYS_ENV_VAR = "VLLM_CI_ONLY_STEP_KEYS"
@@ -39,7 +40,7 @@ def init_global_config(pipeline_config_path: str):
     global config
     if config:
         return
-    pipeline_config = yaml.safe_load(open(pipeline_config_path, "r"))
+    pipeline_config = yaml_io.safe_load(open(pipeline_config_path, "r"))
     _validate_pipeline_config(pipeline_config)
 
     if "github_repo_name" not in pipeline_config:
@@ -55,9 +56,12 @@ def init_global_config(pipeline_config_path: str):
                 f"Invalid branch name: {branch}. Contains disallowed characters."
             )
     pull_request = os.getenv("BUILDKITE_PULL_REQUEST")
-    merge_base_commit = get_merge_base_commit()
-    list_file_diff = get_list_file_diff(branch, merge_base_commit)
-    pr_labels = get_pr_labels(pull_request, pipeline_config["github_repo_name"])
+    with profiling.phase("merge_base"):
+        merge_base_commit = get_merge_base_commit()
+    with profiling.phase("git_diff"):
+        list_file_diff = get_list_file_diff(branch, merge_base_commit)
+    with profiling.phase("pr_labels"):
+        pr_labels = get_pr_labels(pull_request, pipeline_config["github_repo_name"])
 
     config = GlobalConfig(
         name=pipeline_config["name"],
@@ -154,23 +158,33 @@ def _should_run_all(
         return True
     if "ready-run-all-tests" in pr_labels:
         return True
-    for file in list_file_diff:
-        pattern_matched = False
-        for pattern in run_all_patterns:
-            if re.match(pattern, file):
-                pattern_matched = True
-                break
-        if pattern_matched:
-            match_ignore = False
-            for exclude_pattern in run_all_exclude_patterns:
-                if re.match(exclude_pattern, file):
-                    match_ignore = True
-                    break
-            if not match_ignore:
-                return True
+    trigger = _find_run_all_trigger(
+        list_file_diff, run_all_patterns, run_all_exclude_patterns
+    )
+    if trigger:
+        file, pattern = trigger
+        print(f"Running all tests: {file} matches run_all pattern {pattern!r}")
+        return True
     return False
 
 
+def _find_run_all_trigger(
+    list_file_diff: List[str],
+    run_all_patterns: Optional[List[str]],
+    run_all_exclude_patterns: Optional[List[str]],
+) -> Optional[Tuple[str, str]]:
+    """Return the first (file, pattern) that forces a full run, if any."""
+    patterns = PatternSet(run_all_patterns)
+    if not patterns:
+        return None
+    exclude_patterns = PatternSet(run_all_exclude_patterns)
+    for file in list_file_diff:
+        pattern = patterns.first_match(file)
+        if pattern is not None and exclude_patterns.first_match(file) is None:
+            return file, pattern
+    return None
+
+
 def _should_fail_fast(pr_labels: List[str]) -> bool:
     if "ci-no-fail-fast" in pr_labels:
         return False
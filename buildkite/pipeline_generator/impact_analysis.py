@@ -0,0 +1,295 @@
+import ast
+import hashlib
+import json
+import os
+import shlex
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from step import Step
+from utils_lib.cache_utils import (
+    get_cache_dir,
+    get_generator_version,
+    write_json_atomic,
+)
+
+IMPORT_GRAPH_CACHE_NAME = "import_graph"
+IMPORT_GRAPH_CACHE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+# Job commands run from paths under the checkout mounted here.
+WORKSPACE_ROOT = "/vllm-workspace"
+SKIPPED_DIRS = frozenset({"build", "node_modules", "__pycache__", "venv"})
+
+
+def _module_name(path: str) -> str:
+    parts = path[: -len(".py")].split("/")
+    if parts[-1] == "__init__":
+        parts.pop()
+    return ".".join(parts)
+
+
+def parse_imports(path: str, source: bytes) -> List[str]:
+    """Absolute names of the modules a file may import.
+
+    `from a import b` yields both `a` and `a.b`, since `b` may be a
+    submodule. Relative imports are resolved against the file's package.
+    Files that do not parse import nothing.
+    """
+    try:
+        tree = ast.parse(source, filename=path)
+    except (SyntaxError, ValueError):
+        return []
+    package = _module_name(path).split(".")
+    if not path.endswith("/__init__.py"):
+        package = package[:-1]
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                if node.level - 1 > len(package):
+                    continue
+                base = package[: len(package) - node.level + 1]
+                module = ".".join(base + ([node.module] if node.module else []))
+            else:
+                module = node.module or ""
+            if module:
+                names.add(module)
+            names.update(
+                f"{module}.{alias.name}" if module else alias.name
+                for alias in node.names
+                if alias.name != "*"
+            )
+    return sorted(names)
+
+
+def list_python_files(root: str) -> List[str]:
+    """Paths of the Python files under `root`, relative to it."""
+    files = []
+    for directory, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if not name.startswith(".") and name not in SKIPPED_DIRS
+        )
+        relative = os.path.relpath(directory, root)
+        for filename in sorted(filenames):
+            if filename.endswith(".py"):
+                files.append(os.path.normpath(os.path.join(relative, filename)))
+    return files
+
+
+class ImportGraph:
+    """Which files each Python file of a checkout imports."""
+
+    def __init__(self, imports: Dict[str, List[str]]):
+        self.imports = imports
+        self.files_by_module = {_module_name(path): path for path in imports}
+        self._importers: Optional[Dict[str, List[str]]] = None
+
+    @classmethod
+    def from_checkout(
+        cls,
+        root: str,
+        merge_base: Optional[str] = None,
+        changed_files: Iterable[str] = (),
+    ) -> "ImportGraph":
+        """Parse the checkout, reusing the imports cached for its merge base.
+
+        Changed files are not cached, since they differ between the builds
+        that share a merge base; they are parsed on every run instead.
+        """
+        changed = {path for path in changed_files if path.endswith(".py")}
+        cache_path = _cache_path(merge_base)
+        cached = _read_cache(cache_path) if cache_path else None
+        if cached is None:
+            imports = {}
+            for path in list_python_files(root):
+                if path not in changed:
+                    imports[path] = _parse_file(root, path)
+            if cache_path:
+                _write_cache(cache_path, imports, sorted(changed))
+        else:
+            imports, uncached = cached
+            changed.update(uncached)
+        for path in changed:
+            if os.path.isfile(os.path.join(root, path)):
+                imports[path] = _parse_file(root, path)
+            else:
+                imports.pop(path, None)
+        return cls(imports)
+
+    def resolve(self, name: str) -> List[str]:
+        """Files run by importing `name`: the module and its parent packages."""
+        parts = name.split(".")
+        files = []
+        for end in range(1, len(parts) + 1):
+            path = self.files_by_module.get(".".join(parts[:end]))
+            if path:
+                files.append(path)
+        return files
+
+    def importers(self) -> Dict[str, List[str]]:
+        if self._importers is None:
+            self._importers = {}
+            for path, names in self.imports.items():
+                for name in names:
+                    for imported in self.resolve(name):
+                        if imported != path:
+                            self._importers.setdefault(imported, []).append(path)
+        return self._importers
+
+    def affected_by(self, changed_files: Iterable[str]) -> FrozenSet[str]:
+        """The changed files and every file that transitively imports one."""
+        importers = self.importers()
+        affected = {path for path in changed_files if path in self.imports}
+        queue = deque(affected)
+        while queue:
+            for importer in importers.get(queue.popleft(), ()):
+                if importer not in affected:
+                    affected.add(importer)
+                    queue.append(importer)
+        return frozenset(affected)
+
+    def in_package(self, path: str) -> bool:
+        """Whether `path` is a module of a package, so imports can reach it."""
+        init = os.path.join(os.path.dirname(path), "__init__.py")
+        return path in self.imports and (
+            path.endswith("__init__.py") or init in self.imports
+        )
+
+
+def _parse_file(root: str, path: str) -> List[str]:
+    with open(os.path.join(root, path), "rb") as f:
+        return parse_imports(path, f.read())
+
+
+def _cache_path(merge_base: Optional[str]) -> Optional[Path]:
+    if not merge_base:
+        return None
+    cache_dir = get_cache_dir(IMPORT_GRAPH_CACHE_NAME)
+    if cache_dir is None:
+        return None
+    digest = hashlib.sha256(get_generator_version().encode())
+    digest.update(merge_base.strip().encode())
+    return cache_dir / f"{digest.hexdigest()}.json"
+
+
+def _read_cache(cache_path: Path):
+    try:
+        with open(cache_path, "r") as f:
+            entry = json.load(f)
+        return entry["imports"], entry["uncached"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_cache(cache_path: Path, imports: Dict[str, List[str]], uncached: List[str]):
+    cutoff = time.time() - IMPORT_GRAPH_CACHE_MAX_AGE_SECONDS
+    for entry in os.scandir(cache_path.parent):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+    try:
+        write_json_atomic(cache_path, {"imports": imports, "uncached": uncached})
+    except OSError as e:
+        print(f"Import graph cache: failed to write {cache_path.name}: {e}")
+
+
+def _split_command(command: str) -> List[str]:
+    try:
+        return shlex.split(command)
+    except ValueError:
+        return command.split()
+
+
+class ImpactAnalysis:
+    """Selects steps by the Python files their test files import.
+
+    Changed files that are modules of a package are matched against the
+    import closure of each step's test files. Every other change, such as
+    CUDA sources, requirements or job YAML, still goes through the step's
+    `source_file_dependencies`.
+
+    The closure comes from `import` statements alone. Modules loaded by
+    `importlib.import_module`, plugin entry points or registries of lazy
+    imports by name are not in it, so a step reached only that way is
+    reported as not impacted and skipped.
+    """
+
+    def __init__(self, graph: ImportGraph, list_file_diff: List[str]):
+        self.graph = graph
+        self.changed_modules = [p for p in list_file_diff if graph.in_package(p)]
+        self.unmapped_diff = [p for p in list_file_diff if not graph.in_package(p)]
+        self.affected = graph.affected_by(self.changed_modules)
+        self._files_under_directory: Dict[str, FrozenSet[str]] = {}
+        for path in graph.imports:
+            directory = os.path.dirname(path)
+            while directory and directory not in self._files_under_directory:
+                self._files_under_directory[directory] = frozenset()
+                directory = os.path.dirname(directory)
+
+    @classmethod
+    def from_checkout(
+        cls, root: str, merge_base: Optional[str], list_file_diff: List[str]
+    ) -> "ImpactAnalysis":
+        graph = ImportGraph.from_checkout(root, merge_base, list_file_diff)
+        return cls(graph, list_file_diff)
+
+    def _files_under(self, path: str) -> FrozenSet[str]:
+        if path in self.graph.imports:
+            return frozenset([path])
+        files = self._files_under_directory.get(path)
+        if files is None:
+            return frozenset()
+        if not files:
+            prefix = f"{path}/"
+            files = frozenset(f for f in self.graph.imports if f.startswith(prefix))
+            self._files_under_directory[path] = files
+        return files
+
+    def test_files(self, step: Step) -> FrozenSet[str]:
+        """Python files named in the step's commands, with their conftests."""
+        working_dir = step.working_dir or WORKSPACE_ROOT
+        files: Set[str] = set()
+        for command in step.commands or []:
+            for token in _split_command(command):
+                if token.startswith("-") or "$" in token:
+                    continue
+                path = os.path.join(working_dir, token.split("::")[0])
+                path = os.path.relpath(os.path.normpath(path), WORKSPACE_ROOT)
+                if path.startswith(".."):
+                    continue
+                files.update(self._files_under(path))
+        for path in list(files):
+            directory = os.path.dirname(path)
+            while True:
+                conftest = os.path.join(directory, "conftest.py")
+                if conftest in self.graph.imports:
+                    files.add(conftest)
+                if not directory:
+                    break
+                directory = os.path.dirname(directory)
+        return frozenset(files)
+
+    def step_is_impacted(self, step: Step) -> Optional[bool]:
+        """Whether a changed module reaches the step's tests.
+
+        None when the step's commands name no Python files under the
+        checkout, so its impact is unknown.
+        """
+        test_files = self.test_files(step)
+        if not test_files:
+            return None
+        return not test_files.isdisjoint(self.affected)
+
+    def summary(self) -> str:
+        return (
+            f"Test impact: {len(self.changed_modules)} changed modules affect "
+            f"{len(self.affected)} of {len(self.graph.imports)} Python files; "
+            f"{len(self.unmapped_diff)} other changed files"
+        )
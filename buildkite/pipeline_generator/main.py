@@ -1,17 +1,192 @@
+import cProfile
 import click
+import profiling
+from auto_shard import DEFAULT_TARGET_MINUTES
+from critical_path import load_step_durations
 from pipeline_generator import PipelineGenerator
+from pipeline_simulator import load_pipeline, simulate as simulate_pipeline
+from pipeline_writer import OUTPUT_FORMATS
+from queue_capacity import load_queue_capacity
 
 
-@click.command()
+@click.group(invoke_without_command=True)
+@click.pass_context
 @click.option(
     "--pipeline_config_path",
     type=click.Path(exists=True),
     help="Path to the pipeline config file",
 )
 @click.option("--output_file_path", type=click.Path(), help="Path to the output file")
-def main(pipeline_config_path, output_file_path):
-    pipeline_generator = PipelineGenerator(pipeline_config_path, output_file_path)
-    pipeline_generator.generate()
+@click.option(
+    "--num_workers",
+    type=click.IntRange(min=0),
+    default=1,
+    show_default=True,
+    help="Worker processes used to parse job YAML files (0 uses one per CPU)",
+)
+@click.option(
+    "--output_format",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="yaml",
+    show_default=True,
+    help="Format of the output file; `pipeline upload` accepts each",
+)
+@click.option(
+    "--step_durations_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON/CSV of historical step durations; prints the critical path",
+)
+@click.option(
+    "--test_timings_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="JSON/CSV of per-test durations; shards opted-in steps by duration",
+)
+@click.option(
+    "--shard_target_minutes",
+    type=click.FloatRange(min=0, min_open=True),
+    default=DEFAULT_TARGET_MINUTES,
+    show_default=True,
+    help="Target duration of each auto-sharded job",
+)
+@click.option(
+    "--queue_capacity_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="YAML of agents per queue; limits and staggers jobs to fit capacity",
+)
+@click.option(
+    "--test_impact",
+    is_flag=True,
+    default=False,
+    help=(
+        "Select steps by the import graph of their test files; importlib, "
+        "entry point and lazy imports by name are not seen"
+    ),
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write a JSON report of wall/CPU time and step counts per phase here",
+)
+@click.option(
+    "--profile_pstats",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Run under cProfile and dump pstats data here",
+)
+def main(
+    ctx,
+    pipeline_config_path,
+    output_file_path,
+    num_workers,
+    output_format,
+    step_durations_path,
+    test_timings_path,
+    shard_target_minutes,
+    queue_capacity_path,
+    test_impact,
+    profile_path,
+    profile_pstats,
+):
+    """Generate the pipeline, unless a subcommand is given."""
+    if ctx.invoked_subcommand is not None:
+        return
+    profiler = cProfile.Profile() if profile_pstats else None
+    if profile_path:
+        profiling.start()
+    if profiler:
+        profiler.enable()
+    try:
+        pipeline_generator = PipelineGenerator(
+            pipeline_config_path,
+            output_file_path,
+            num_workers=num_workers,
+            output_format=output_format,
+            step_durations_path=step_durations_path,
+            test_timings_path=test_timings_path,
+            shard_target_minutes=shard_target_minutes,
+            queue_capacity_path=queue_capacity_path,
+            test_impact=test_impact,
+        )
+        pipeline_generator.generate()
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(profile_pstats)
+        timer = profiling.stop()
+        if timer:
+            timer.write_report(profile_path)
+
+
+def _parse_agents(ctx, param, values):
+    agents = {}
+    for value in values:
+        queue, _, count = value.rpartition("=")
+        if not queue or not count.isdigit():
+            raise click.BadParameter(f"expected QUEUE=COUNT, got {value!r}")
+        agents[queue] = int(count)
+    return agents
+
+
+@main.command()
+@click.argument("pipeline_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--step_durations_path",
+    type=click.Path(exists=True, dir_okay=False),
+    required=True,
+    help="JSON/CSV of historical step durations, as for generation",
+)
+@click.option(
+    "--queue_capacity_path",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="YAML of agents per queue, as for generation",
+)
+@click.option(
+    "--agents",
+    multiple=True,
+    callback=_parse_agents,
+    help="Agents of a queue as QUEUE=COUNT; repeatable, overrides the YAML",
+)
+@click.option(
+    "--default_agents",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Agents of queues without a count",
+)
+@click.option(
+    "--run_blocked/--skip_blocked",
+    default=True,
+    show_default=True,
+    help="Unblock block steps at once, or never run the steps behind them",
+)
+def simulate(
+    pipeline_path,
+    step_durations_path,
+    queue_capacity_path,
+    agents,
+    default_agents,
+    run_blocked,
+):
+    """Replay a generated pipeline offline and report its makespan."""
+    agents_per_queue = {}
+    if queue_capacity_path:
+        capacity = load_queue_capacity(queue_capacity_path)
+        agents_per_queue = {queue: c.agents for queue, c in capacity.items()}
+    agents_per_queue.update(agents)
+    result = simulate_pipeline(
+        load_pipeline(pipeline_path),
+        load_step_durations(step_durations_path),
+        agents_per_queue,
+        default_agents=default_agents,
+        run_blocked=run_blocked,
+    )
+    click.echo(result.format())
 
 
 if __name__ == "__main__":
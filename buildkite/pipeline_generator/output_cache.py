@@ -0,0 +1,250 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from buildkite_step import (
+    COMMAND_STEPS_PART,
+    BuildkiteBlockStep,
+    BuildkiteCommandStep,
+)
+from step import Step
+from utils_lib.cache_utils import (
+    get_cache_dir,
+    get_generator_version,
+    write_json_atomic,
+)
+
+OUTPUT_CACHE_NAME = "output"
+# Conversion also reads the ECR cache tags, which can appear at any time;
+# entries expire so a stale `cache-from` is not reused for long.
+OUTPUT_CACHE_MAX_AGE_SECONDS = 24 * 60 * 60
+# Environment read during generation that changes the output. Values that
+# also land in the global config, like the branch, are listed anyway.
+FINGERPRINT_ENV_VARS = (
+    "BUILDKITE_BRANCH",
+    "BUILDKITE_COMMIT",
+    "BUILDKITE_PULL_REQUEST",
+    "BUILDKITE_PULL_REQUEST_BASE_BRANCH",
+    "BUILDKITE_SOURCE",
+    "CI_INFRA_OTEL_BUNDLE",
+    "CI_INFRA_OTEL_TREATMENT_BRANCH",
+    "CONTINUE_ON_FAILURE",
+    "DOCS_ONLY_DISABLE",
+    "MERGE_BASE_COMMIT",
+    "NIGHTLY",
+    "NOAUTO",
+    "PIPELINE_GENERATOR_DIFF_MODE",
+    "PRIORITY",
+    "ROCM_BASE_REFRESH_FORCE",
+    "ROCM_BASE_REFRESH_SKIP",
+    "RUN_ALL",
+    "SKIP_TIMEOUT",
+    "TORCH_NIGHTLY",
+    "VLLM_CI_ENABLE_ROCM_DEBUG_AGENT",
+    "VLLM_CI_ONLY_STEP_KEYS",
+)
+
+# What converting a group reads besides its steps and the run decisions.
+# The commit and the changed files are left out; they reach a group only
+# through its run decisions, so a job file edit misses just its own group.
+CONVERSION_CONFIG_KEYS = (
+    "name",
+    "github_repo_name",
+    "registries",
+    "repositories",
+    "branch",
+    "pull_request",
+    "nightly",
+    "torch_nightly",
+    "run_all",
+    "fail_fast",
+    "only_step_keys",
+)
+CONVERSION_ENV_VARS = (
+    "BUILDKITE_PULL_REQUEST_BASE_BRANCH",
+    "BUILDKITE_SOURCE",
+    "CI_INFRA_OTEL_BUNDLE",
+    "CI_INFRA_OTEL_TREATMENT_BRANCH",
+    "CONTINUE_ON_FAILURE",
+    "NOAUTO",
+    "PRIORITY",
+    "ROCM_BASE_REFRESH_FORCE",
+    "ROCM_BASE_REFRESH_SKIP",
+    "SKIP_TIMEOUT",
+    "VLLM_CI_ENABLE_ROCM_DEBUG_AGENT",
+)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    return str(value)
+
+
+def _canonical_json(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, default=_json_default).encode()
+
+
+def config_fingerprint(
+    global_config: Dict[str, Any], changed_files_root: Optional[str] = None
+) -> str:
+    """Hash of the generator version, global config and environment.
+
+    With `changed_files_root`, the contents of the changed files under it
+    are hashed too, for modes such as test impact that read them.
+    """
+    digest = hashlib.sha256(get_generator_version().encode())
+    digest.update(_canonical_json(global_config))
+    for name in FINGERPRINT_ENV_VARS:
+        digest.update(_canonical_json([name, os.getenv(name)]))
+    if changed_files_root is not None:
+        for path in sorted(global_config["list_file_diff"]):
+            digest.update(_canonical_json(path))
+            try:
+                with open(os.path.join(changed_files_root, path), "rb") as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                digest.update(b"missing")
+    return digest.hexdigest()
+
+
+def conversion_fingerprint(global_config: Dict[str, Any]) -> str:
+    """Hash of the generator version, config and environment conversion reads."""
+    digest = hashlib.sha256(get_generator_version().encode())
+    digest.update(
+        _canonical_json({key: global_config.get(key) for key in CONVERSION_CONFIG_KEYS})
+    )
+    for name in CONVERSION_ENV_VARS:
+        digest.update(_canonical_json([name, os.getenv(name)]))
+    return digest.hexdigest()
+
+
+def pipeline_key(
+    config: str, options: Dict[str, Any], input_paths: Iterable[Optional[str]]
+) -> str:
+    """Hash of the config fingerprint, options and input files.
+
+    Input files are hashed by path and contents; None stands for an unset
+    optional input.
+    """
+    digest = hashlib.sha256(_canonical_json([config, options]))
+    for path in input_paths:
+        digest.update(_canonical_json(path))
+        if path is not None:
+            with open(path, "rb") as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def _step_from_dump(data: Dict[str, Any]) -> Any:
+    if "block" in data:
+        return BuildkiteBlockStep(**data)
+    return BuildkiteCommandStep(**data)
+
+
+class OutputCache:
+    """On-disk cache of generated pipelines and of converted groups.
+
+    Pipelines are keyed by a fingerprint of every generation input, so a
+    retried bootstrap of the same build writes the stored document without
+    reading a job file. Groups are keyed by the conversion fingerprint, the
+    variables injected into commands, the group's steps and whether each
+    of them runs, so after a job file edit only the groups whose steps or
+    run decisions changed are converted again.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_age_seconds: int = OUTPUT_CACHE_MAX_AGE_SECONDS,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_age_seconds = max_age_seconds
+        self.group_hits = 0
+        self.group_misses = 0
+        self.config = ""
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["OutputCache"]:
+        cache_dir = get_cache_dir(OUTPUT_CACHE_NAME)
+        if cache_dir is None:
+            return None
+        return cls(str(cache_dir))
+
+    def _read(self, name: str) -> Optional[Any]:
+        path = self.cache_dir / f"{name}.json"
+        try:
+            if time.time() - path.stat().st_mtime > self.max_age_seconds:
+                return None
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, name: str, data: Any):
+        try:
+            write_json_atomic(self.cache_dir / f"{name}.json", data)
+        except OSError as e:
+            print(f"Output cache: failed to write {name}: {e}")
+
+    def get_pipeline(self, key: str) -> Optional[str]:
+        entry = self._read(f"pipeline-{key}")
+        return entry.get("pipeline") if isinstance(entry, dict) else None
+
+    def put_pipeline(self, key: str, pipeline: str):
+        self._write(f"pipeline-{key}", {"pipeline": pipeline})
+
+    def group_key(
+        self,
+        group: str,
+        steps: List[Step],
+        variables_to_inject: Dict[str, str],
+        run_decisions: List[bool],
+    ) -> str:
+        digest = hashlib.sha256(self.config.encode())
+        digest.update(_canonical_json([group, variables_to_inject, run_decisions]))
+        for step in steps:
+            digest.update(_canonical_json(step.model_dump()))
+        return digest.hexdigest()
+
+    def get_steps(self, part: str, key: str) -> Optional[List[Any]]:
+        """The converted steps of one part of a group, or None on a miss.
+
+        Hits and misses are counted per group, by its command steps.
+        """
+        entry = self._read(f"group-{key}-{part}")
+        try:
+            steps = [_step_from_dump(step) for step in entry["steps"]]
+        except (KeyError, TypeError):
+            steps = None
+        if part == COMMAND_STEPS_PART:
+            if steps is None:
+                self.group_misses += 1
+            else:
+                self.group_hits += 1
+        return steps
+
+    def put_steps(self, part: str, key: str, steps: List[Any]):
+        self._write(
+            f"group-{key}-{part}", {"steps": [step.model_dump() for step in steps]}
+        )
+
+    def evict(self):
+        """Drop entries older than the max age."""
+        cutoff = time.time() - self.max_age_seconds
+        for entry in os.scandir(self.cache_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def stats_line(self) -> str:
+        return (
+            f"Output cache: {self.group_hits} groups reused, "
+            f"{self.group_misses} converted"
+        )
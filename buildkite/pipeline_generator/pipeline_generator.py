@@ -1,16 +1,45 @@
 import os
 import subprocess
-from typing import FrozenSet, List, Optional, Tuple
-
-import yaml
+from typing import Any, Dict, FrozenSet, Iterator, List, Optional, Tuple
 
+from auto_shard import (
+    DEFAULT_TARGET_MINUTES,
+    auto_shard_steps,
+    load_test_timings,
+)
 from buildkite_step import (
+    BuildkiteGroupStep,
     add_precommit_dependency,
-    convert_group_step_to_buildkite_step,
     create_precommit_group_step,
+    iter_buildkite_group_steps,
+    otel_bundle_is_artifact,
+    write_otel_helpers_artifact,
+)
+from critical_path import (
+    analyze_critical_path,
+    assign_priorities,
+    load_step_durations,
 )
 from global_config import get_global_config, init_global_config
-from step import Step, group_steps, read_steps_from_job_dir
+from impact_analysis import ImpactAnalysis
+from output_cache import (
+    OutputCache,
+    config_fingerprint,
+    conversion_fingerprint,
+    pipeline_key,
+)
+import profiling
+from pipeline_writer import write_pipeline
+from queue_capacity import annotate_estimates, load_queue_capacity, shape_pipeline
+from step import (
+    Step,
+    group_steps,
+    list_job_files,
+    otel_tracing_enabled,
+    read_steps_from_job_dirs,
+)
+from step_cache import StepCache
+from step_graph import StepGraph
 
 
 class PipelineGenerator:
@@ -19,9 +48,24 @@ class PipelineGenerator:
         pipeline_config_path: str,
         output_file_path: str,
         docs_only_disable: bool = False,
+        num_workers: int = 1,
+        output_format: str = "yaml",
+        step_durations_path: Optional[str] = None,
+        test_timings_path: Optional[str] = None,
+        shard_target_minutes: float = DEFAULT_TARGET_MINUTES,
+        queue_capacity_path: Optional[str] = None,
+        test_impact: bool = False,
     ):
-        init_global_config(pipeline_config_path)
+        with profiling.phase("init_config"):
+            init_global_config(pipeline_config_path)
         self.output_file_path = output_file_path
+        self.num_workers = num_workers
+        self.output_format = output_format
+        self.step_durations_path = step_durations_path
+        self.test_timings_path = test_timings_path
+        self.shard_target_minutes = shard_target_minutes
+        self.queue_capacity_path = queue_capacity_path
+        self.test_impact = test_impact
 
     def generate(self):
         global_config = get_global_config()
@@ -48,40 +92,161 @@ class PipelineGenerator:
                     f.write("true")
                 return
 
-        steps = []
-        for job_dir in global_config["job_dirs"]:
-            steps.extend(read_steps_from_job_dir(job_dir))
-        steps, selected_step_keys = select_steps_and_dependencies(
-            steps, global_config["only_step_keys"]
-        )
-        global_config["only_step_keys"] = selected_step_keys
-        grouped_steps = group_steps(steps)
+        output_cache = OutputCache.from_env()
+        cache_key = None
+        if output_cache is not None:
+            with profiling.phase("output_cache"):
+                cache_key = self._pipeline_key(global_config)
+                cached_pipeline = (
+                    output_cache.get_pipeline(cache_key) if cache_key else None
+                )
+            if cached_pipeline is not None:
+                print("Output cache: reusing the pipeline generated from these inputs")
+                if otel_bundle_is_artifact() and otel_tracing_enabled():
+                    publish_otel_helpers_artifact(
+                        os.path.dirname(self.output_file_path)
+                    )
+                with profiling.phase("write_pipeline"):
+                    with open(self.output_file_path, "w") as f:
+                        f.write(cached_pipeline)
+                return
+
+        with profiling.phase("load_steps") as record:
+            steps = read_steps_from_job_dirs(
+                global_config["job_dirs"],
+                num_workers=self.num_workers,
+                step_cache=StepCache.from_env(),
+            )
+            record["steps"] = len(steps)
+        with profiling.phase("select_steps") as record:
+            steps, selected_step_keys = select_steps_and_dependencies(
+                steps, global_config["only_step_keys"]
+            )
+            global_config["only_step_keys"] = selected_step_keys
+            grouped_steps = group_steps(steps)
+            record["steps"] = len(steps)
+
+        if self.test_timings_path:
+            with profiling.phase("auto_shard") as record:
+                shards = auto_shard_steps(
+                    steps,
+                    load_test_timings(self.test_timings_path),
+                    target_seconds=self.shard_target_minutes * 60,
+                )
+                record["steps"] = len(shards)
+            for key, step_shards in shards.items():
+                print(f"Auto-sharded {key} into {len(step_shards)} jobs")
+
+        test_impact = None
+        if self.test_impact:
+            with profiling.phase("test_impact"):
+                test_impact = ImpactAnalysis.from_checkout(
+                    os.getcwd(),
+                    global_config["merge_base_commit"],
+                    global_config["list_file_diff"],
+                )
+            print(test_impact.summary())
 
-        buildkite_group_steps = convert_group_step_to_buildkite_step(grouped_steps)
-        buildkite_group_steps = sorted(buildkite_group_steps, key=lambda x: x.group)
+        if output_cache is not None:
+            # Taken after step selection, which narrows `only_step_keys`.
+            output_cache.config = conversion_fingerprint(global_config)
+        # The critical path and queue capacity passes need every group at
+        # once. Otherwise groups are converted as the writer consumes them,
+        # so only one is held at a time and `convert` also times the write.
+        whole_pipeline = bool(self.step_durations_path or self.queue_capacity_path)
+        if whole_pipeline:
+            with profiling.phase("convert") as record:
+                buildkite_group_steps = list(
+                    self._convert(grouped_steps, test_impact, output_cache, record)
+                )
+
+        if self.step_durations_path:
+            with profiling.phase("critical_path"):
+                report = analyze_critical_path(
+                    buildkite_group_steps,
+                    load_step_durations(self.step_durations_path),
+                )
+            print(report.format())
+            assign_priorities(buildkite_group_steps, report)
+
+        # After the critical-path priorities, which set the dispatch order.
+        if self.queue_capacity_path:
+            with profiling.phase("queue_capacity"):
+                estimates = shape_pipeline(
+                    buildkite_group_steps,
+                    load_queue_capacity(self.queue_capacity_path),
+                    global_config["name"],
+                )
+            annotate_estimates(estimates)
 
+        if otel_bundle_is_artifact() and otel_tracing_enabled():
+            publish_otel_helpers_artifact(os.path.dirname(self.output_file_path))
+
+        if whole_pipeline:
+            with profiling.phase("write_pipeline"):
+                write_pipeline(
+                    buildkite_group_steps, self.output_file_path, self.output_format
+                )
+        else:
+            with profiling.phase("convert") as record:
+                write_pipeline(
+                    self._convert(grouped_steps, test_impact, output_cache, record),
+                    self.output_file_path,
+                    self.output_format,
+                )
+        if output_cache is not None:
+            print(output_cache.stats_line())
+            if cache_key:
+                with open(self.output_file_path, "r") as f:
+                    output_cache.put_pipeline(cache_key, f.read())
+            output_cache.evict()
+        return
+
+    def _convert(
+        self,
+        grouped_steps: Dict[str, List[Step]],
+        test_impact: Optional[ImpactAnalysis],
+        output_cache: Optional[OutputCache],
+        record: Dict[str, Any],
+    ) -> Iterator[BuildkiteGroupStep]:
+        """Yield the converted groups in output order, counting their steps."""
+        global_config = get_global_config()
         # Run pre-commit as a dedicated step in parallel with the image build.
         # Steps that depend on the image build also wait for pre-commit to pass.
         # Place it first so it shows up right after the bootstrap step.
-        if global_config["pull_request"] and global_config["pull_request"] != "false":
-            add_precommit_dependency(buildkite_group_steps)
-            buildkite_group_steps.insert(
-                0,
-                create_precommit_group_step(
-                    global_config["github_repo_name"], global_config["commit"]
-                ),
+        pull_request = global_config["pull_request"]
+        if pull_request and pull_request != "false":
+            yield create_precommit_group_step(
+                global_config["github_repo_name"], global_config["commit"]
             )
+        record["steps"] = 0
+        for group_step in iter_buildkite_group_steps(
+            grouped_steps, test_impact, output_cache
+        ):
+            if pull_request and pull_request != "false":
+                add_precommit_dependency([group_step])
+            record["steps"] += len(group_step.steps)
+            yield group_step
 
-        buildkite_steps_dict = {"steps": []}
-        for buildkite_group_step in buildkite_group_steps:
-            buildkite_steps_dict["steps"].append(
-                buildkite_group_step.dict(exclude_none=True)
-            )
-        with open(self.output_file_path, "w") as f:
-            yaml.dump(
-                buildkite_steps_dict, f, sort_keys=False, default_flow_style=False
-            )
-        return
+    def _changed_files_root(self) -> Optional[str]:
+        # Test impact reads the changed files, not just their paths.
+        return os.getcwd() if self.test_impact else None
+
+    def _pipeline_key(self, global_config) -> Optional[str]:
+        """Fingerprint of every input of the pipeline, or None if uncacheable."""
+        if (
+            self.test_timings_path
+            or self.step_durations_path
+            or self.queue_capacity_path
+        ):
+            # These also print the shards or the critical path, or annotate
+            # queue estimates, which a cached document cannot.
+            return None
+        return pipeline_key(
+            config_fingerprint(global_config, self._changed_files_root()),
+            {"output_format": self.output_format, "test_impact": self.test_impact},
+            list_job_files(global_config["job_dirs"]),
+        )
 
 
 def select_steps_and_dependencies(
@@ -91,33 +256,27 @@ def select_steps_and_dependencies(
     if requested_step_keys is None:
         return steps, None
 
-    steps_by_key = {}
-    for step in steps:
-        if not step.key:
-            continue
-        if step.key in steps_by_key:
-            raise ValueError(f"Duplicate CI step key: {step.key}")
-        steps_by_key[step.key] = step
-
-    missing = requested_step_keys - steps_by_key.keys()
-    if missing:
-        raise ValueError("Unknown CI step key(s): " + ", ".join(sorted(missing)))
-
-    selected_step_keys = set(requested_step_keys)
-    pending = list(requested_step_keys)
-    while pending:
-        step_key = pending.pop()
-        for dependency in steps_by_key[step_key].depends_on or []:
-            if dependency not in steps_by_key:
-                raise ValueError(
-                    f"CI step {step_key} depends on unknown step {dependency}."
-                )
-            if dependency not in selected_step_keys:
-                selected_step_keys.add(dependency)
-                pending.append(dependency)
+    graph = StepGraph(steps)
+    selected_step_keys = graph.select(requested_step_keys)
+    cycle = graph.find_cycle(selected_step_keys)
+    if cycle:
+        raise ValueError("CI step dependency cycle: " + " -> ".join(cycle))
 
     selected = [step for step in steps if step.key in selected_step_keys]
-    return selected, frozenset(selected_step_keys)
+    return selected, selected_step_keys
+
+
+def publish_otel_helpers_artifact(output_dir_path: str):
+    """Upload the tracing helpers once for every traced step to download."""
+    artifact_path = write_otel_helpers_artifact(output_dir_path or ".")
+    # Upload from the artifact's directory so its artifact path is its name.
+    result = subprocess.run(
+        ["buildkite-agent", "artifact", "upload", os.path.basename(artifact_path)],
+        cwd=os.path.dirname(artifact_path),
+        check=False,
+    )
+    if result.returncode != 0:
+        print("Failed to upload the OTel helper bundle; tracing will be skipped.")
 
 
 def is_docs_only_change(list_file_diff: List[str]) -> bool:
@@ -0,0 +1,249 @@
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from buildkite_step import (
+    BuildkiteBlockStep,
+    BuildkiteCommandStep,
+    BuildkiteGroupStep,
+)
+from step_graph import StepGraph
+from utils_lib import yaml_io
+
+DEFAULT_QUEUE = "default"
+
+
+@dataclass
+class QueueStats:
+    agents: int
+    jobs: int = 0
+    busy_seconds: float = 0.0
+    wait_seconds: float = 0.0
+    max_wait_seconds: float = 0.0
+    idle_seconds: float = 0.0
+
+
+@dataclass
+class SimulationResult:
+    makespan: float
+    start: Dict[str, float]
+    finish: Dict[str, float]
+    queues: Dict[str, QueueStats] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        lines = [f"Simulated build: {_minutes(self.makespan)} makespan"]
+        lines.append(
+            f"  {'Queue':<32} {'Agents':>6} {'Jobs':>5} {'Mean wait':>10} "
+            f"{'Max wait':>10} {'Idle agent time':>16}"
+        )
+        for queue, stats in sorted(self.queues.items()):
+            mean_wait = stats.wait_seconds / stats.jobs if stats.jobs else 0.0
+            lines.append(
+                f"  {queue:<32} {stats.agents:>6} {stats.jobs:>5} "
+                f"{_minutes(mean_wait):>10} {_minutes(stats.max_wait_seconds):>10} "
+                f"{_minutes(stats.idle_seconds):>16}"
+            )
+        if self.skipped:
+            lines.append(f"{len(self.skipped)} blocked steps were not run.")
+        return "\n".join(lines)
+
+
+def _minutes(seconds: float) -> str:
+    return f"{seconds / 60:.1f} min"
+
+
+def _queue_of(step: Any) -> str:
+    return (getattr(step, "agents", None) or {}).get("queue") or DEFAULT_QUEUE
+
+
+def _step_from_dict(data: Dict[str, Any]) -> Any:
+    if "block" in data:
+        return BuildkiteBlockStep(
+            block=data["block"], depends_on=data.get("depends_on"), key=data["key"]
+        )
+    known = BuildkiteCommandStep.__slots__
+    return BuildkiteCommandStep(
+        **{name: value for name, value in data.items() if name in known}
+    )
+
+
+def load_pipeline(path: str) -> List[BuildkiteGroupStep]:
+    """Read a generated pipeline file, YAML or JSON, back into group steps.
+
+    Steps outside a group are collected into groups of their own. Fields the
+    generator does not emit are ignored.
+    """
+    with open(path) as f:
+        pipeline = yaml_io.safe_load(f) or {}
+    groups = []
+    for entry in pipeline.get("steps") or []:
+        if "group" in entry and "steps" in entry:
+            steps = [_step_from_dict(step) for step in entry["steps"]]
+            groups.append(BuildkiteGroupStep(group=entry["group"], steps=steps))
+        else:
+            groups.append(BuildkiteGroupStep(group="", steps=[_step_from_dict(entry)]))
+    return groups
+
+
+def simulate(
+    buildkite_group_steps: List[Any],
+    durations: Dict[str, float],
+    agents_per_queue: Dict[str, int],
+    default_agents: int = 1,
+    run_blocked: bool = True,
+) -> SimulationResult:
+    """Replay a pipeline on a fixed number of agents per queue.
+
+    Like Buildkite, each free agent takes the runnable job of its queue with
+    the highest `priority`, then the earliest in pipeline order, skipping
+    jobs whose `concurrency_group` already runs `concurrency` jobs. A step
+    with `parallelism` runs that many jobs of its recorded duration. Block
+    steps are unblocked as soon as their dependencies finish, or, without
+    `run_blocked`, never, and the steps behind them do not run. Dependencies
+    outside the pipeline finish at their recorded duration.
+    """
+    steps = [step for group in buildkite_group_steps for step in group.steps]
+    graph = StepGraph(steps)
+    graph.topological_order()  # Raises on a dependency cycle.
+    position = {key: index for index, key in enumerate(graph.steps_by_key)}
+    skipped = set()
+    if not run_blocked:
+        for key, step in graph.steps_by_key.items():
+            if isinstance(step, BuildkiteBlockStep):
+                skipped.add(key)
+                skipped.update(graph.dependent_closure(key))
+
+    waiting: Dict[str, int] = {}
+    external_dependents: Dict[str, List[str]] = {}
+    for key, dependencies in graph.dependencies.items():
+        if key in skipped:
+            continue
+        waiting[key] = len(dependencies)
+        for dependency in dependencies:
+            if dependency not in graph:
+                external_dependents.setdefault(dependency, []).append(key)
+
+    queues: Dict[str, QueueStats] = {}
+    free_agents: Dict[str, int] = {}
+    ready: Dict[str, List[Tuple[int, int, str]]] = {}
+    ready_at: Dict[str, float] = {}
+    remaining_jobs: Dict[str, int] = {}
+    running_in_group: Dict[str, int] = {}
+    # (time, sequence, key, queue); queue is None for events holding no agent.
+    events: List[Tuple[float, int, str, Any]] = []
+    sequence = itertools.count()
+    start: Dict[str, float] = {}
+    finish: Dict[str, float] = {}
+
+    def push_event(time: float, key: str, queue: Any = None):
+        heapq.heappush(events, (time, next(sequence), key, queue))
+
+    def make_ready(key: str, now: float):
+        step = graph.steps_by_key[key]
+        if isinstance(step, BuildkiteBlockStep):
+            start[key] = now
+            push_event(now, key)
+            return
+        queue = _queue_of(step)
+        if queue not in queues:
+            agents = agents_per_queue.get(queue, default_agents)
+            queues[queue] = QueueStats(agents=agents)
+            free_agents[queue] = queues[queue].agents
+        jobs = getattr(step, "parallelism", None) or 1
+        remaining_jobs[key] = jobs
+        ready_at[key] = now
+        for _ in range(jobs):
+            heapq.heappush(
+                ready.setdefault(queue, []),
+                (-(getattr(step, "priority", None) or 0), position[key], key),
+            )
+
+    def concurrency_group(key: str) -> Any:
+        step = graph.steps_by_key[key]
+        if getattr(step, "concurrency", None) and step.concurrency_group:
+            return step.concurrency_group
+        return None
+
+    def release(dependents: Any, now: float):
+        for dependent in dependents:
+            if dependent in skipped:
+                continue
+            waiting[dependent] -= 1
+            if waiting[dependent] == 0:
+                make_ready(dependent, now)
+
+    for dependency in external_dependents:
+        push_event(durations.get(dependency, 0.0), dependency)
+    for key, count in waiting.items():
+        if count == 0:
+            make_ready(key, 0.0)
+
+    now = 0.0
+    while True:
+        for queue, jobs in ready.items():
+            held_back = []
+            while jobs and free_agents[queue] > 0:
+                job = heapq.heappop(jobs)
+                key = job[2]
+                group = concurrency_group(key)
+                if group is not None:
+                    if (
+                        running_in_group.get(group, 0)
+                        >= graph.steps_by_key[key].concurrency
+                    ):
+                        held_back.append(job)
+                        continue
+                    running_in_group[group] = running_in_group.get(group, 0) + 1
+                free_agents[queue] -= 1
+                start.setdefault(key, now)
+                duration = durations.get(key, 0.0)
+                stats = queues[queue]
+                stats.jobs += 1
+                stats.busy_seconds += duration
+                stats.wait_seconds += now - ready_at[key]
+                stats.max_wait_seconds = max(
+                    stats.max_wait_seconds, now - ready_at[key]
+                )
+                push_event(now + duration, key, queue)
+            for job in held_back:
+                heapq.heappush(jobs, job)
+        if not events:
+            break
+        # Finish everything due now before handing out the freed agents.
+        now = events[0][0]
+        while events and events[0][0] == now:
+            _, _, key, queue = heapq.heappop(events)
+            if key not in graph:
+                finish[key] = now
+                release(external_dependents[key], now)
+                continue
+            if queue is not None:
+                free_agents[queue] += 1
+                group = concurrency_group(key)
+                if group is not None:
+                    running_in_group[group] -= 1
+                remaining_jobs[key] -= 1
+                if remaining_jobs[key]:
+                    continue
+            finish[key] = now
+            release(graph.dependents[key], now)
+
+    unfinished = [
+        key for key in graph.steps_by_key if key not in finish and key not in skipped
+    ]
+    if unfinished:
+        raise ValueError(
+            "Steps never ran; their queues have no agents: " + ", ".join(unfinished)
+        )
+    makespan = max(finish.values(), default=0.0)
+    for stats in queues.values():
+        stats.idle_seconds = stats.agents * makespan - stats.busy_seconds
+    return SimulationResult(
+        makespan=makespan,
+        start=start,
+        finish=finish,
+        queues=queues,
+        skipped=[key for key in graph.steps_by_key if key in skipped],
+    )
@@ -0,0 +1,106 @@
+import json
+import os
+from pathlib import Path
+from typing import IO, Any, Dict, Iterable
+
+from buildkite_step import BuildkiteGroupStep
+from utils_lib import yaml_io
+
+OUTPUT_FORMATS = ("yaml", "json", "yaml_anchors")
+# Step fields whose values repeat verbatim across many steps.
+ANCHORED_FIELDS = ("agents", "plugins", "retry")
+
+
+def _write_yaml(group_steps: Iterable[BuildkiteGroupStep], f: IO[str]):
+    # A block sequence under a top-level key is not indented, so dumping each
+    # group as a one-item list yields the same bytes as dumping the whole
+    # {"steps": [...]} mapping at once.
+    wrote_any = False
+    for group_step in group_steps:
+        if not wrote_any:
+            f.write("steps:\n")
+            wrote_any = True
+        yaml_io.dump(
+            [group_step.model_dump(exclude_none=True)],
+            f,
+            sort_keys=False,
+            default_flow_style=False,
+        )
+    if not wrote_any:
+        f.write("steps: []\n")
+
+
+def _share_repeated_fields(value: Any, shared: Dict[str, Any]) -> Any:
+    """Point equal `ANCHORED_FIELDS` values of all steps at one object.
+
+    The YAML dumper anchors an object on its first appearance and writes
+    an alias wherever the same object appears again.
+    """
+    if isinstance(value, list):
+        return [_share_repeated_fields(item, shared) for item in value]
+    if not isinstance(value, dict):
+        return value
+    for name, field_value in value.items():
+        if name == "steps":
+            value[name] = _share_repeated_fields(field_value, shared)
+        elif name in ANCHORED_FIELDS and isinstance(field_value, (dict, list)):
+            key = json.dumps([name, field_value])
+            value[name] = shared.setdefault(key, field_value)
+    return value
+
+
+def _write_yaml_anchors(group_steps: Iterable[BuildkiteGroupStep], f: IO[str]):
+    # Aliases can only refer to anchors in the same document, so the groups
+    # are dumped together rather than streamed.
+    shared: Dict[str, Any] = {}
+    groups = [
+        _share_repeated_fields(group_step.model_dump(exclude_none=True), shared)
+        for group_step in group_steps
+    ]
+    yaml_io.dump({"steps": groups}, f, sort_keys=False, default_flow_style=False)
+
+
+def _write_json(group_steps: Iterable[BuildkiteGroupStep], f: IO[str]):
+    f.write('{"steps": [')
+    for index, group_step in enumerate(group_steps):
+        if index:
+            f.write(", ")
+        json.dump(group_step.model_dump(exclude_none=True), f)
+    f.write("]}\n")
+
+
+def write_pipeline(
+    group_steps: Iterable[BuildkiteGroupStep],
+    output_file_path: str,
+    output_format: str = "yaml",
+):
+    """Serialize group steps one at a time instead of building one document.
+
+    Only a single group's plain-dict form is alive at any point, which keeps
+    peak memory flat on full runs with large expanded commands. JSON is a
+    subset of YAML, so `buildkite-agent pipeline upload` accepts either.
+    `yaml_anchors` trades that for a smaller file: repeated agents, plugins
+    and retry values are written once and referenced by YAML aliases.
+
+    Groups may still be converted while they are written, so the output goes
+    to a temporary file that replaces `output_file_path` only on success; a
+    failed run never leaves a truncated pipeline behind for upload.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unsupported output format: {output_format}. Valid formats: {OUTPUT_FORMATS}"
+        )
+    path = Path(output_file_path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w") as f:
+            if output_format == "json":
+                _write_json(group_steps, f)
+            elif output_format == "yaml_anchors":
+                _write_yaml_anchors(group_steps, f)
+            else:
+                _write_yaml(group_steps, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
@@ -1,5 +1,8 @@
+from functools import lru_cache
+
 from step import Step
 from constants import DeviceType
+from utils_lib.frozen import freeze
 import copy
 
 docker_plugin_template = {
@@ -122,31 +125,43 @@ amd_zen5_plugin_template = {
     ],
 }
 
-def get_docker_plugin(step: Step, image: str):
+
+@lru_cache(maxsize=None)
+def _build_docker_plugin(device: str, image: str, mount_buildkite_agent: bool):
     plugin = None
-    if step.device == DeviceType.H200_18GB:
+    if device == DeviceType.H200_18GB:
         plugin = copy.deepcopy(h200_18gb_plugin_template)
-    elif step.device == DeviceType.H200_35GB:
+    elif device == DeviceType.H200_35GB:
         plugin = copy.deepcopy(h200_35gb_plugin_template)
-    elif step.device == DeviceType.H200:
+    elif device == DeviceType.H200:
         plugin = copy.deepcopy(h200_plugin_template)
-    elif step.device == DeviceType.B200:
+    elif device == DeviceType.B200:
         plugin = copy.deepcopy(b200_plugin_template)
-    elif step.device == DeviceType.AMD_ZEN5_CPU:
+    elif device == DeviceType.AMD_ZEN5_CPU:
         plugin = copy.deepcopy(amd_zen5_plugin_template)
     else:
         plugin = copy.deepcopy(docker_plugin_template)
     plugin["image"] = image
 
-    if step.device in (DeviceType.H200_18GB, DeviceType.H200_35GB):
+    if device in (DeviceType.H200_18GB, DeviceType.H200_35GB):
         image = image.replace("public.ecr.aws", "936637512419.dkr.ecr.us-west-2.amazonaws.com/vllm-ci-pull-through-cache")
         plugin["image"] = image
-    if (
+    if mount_buildkite_agent:
+        plugin["mount_buildkite_agent"] = True
+    if device in (DeviceType.CPU, DeviceType.CPU_SMALL, DeviceType.CPU_MEDIUM) and plugin.get("gpus"):
+        del plugin["gpus"]
+    return freeze(plugin)
+
+
+def get_docker_plugin(step: Step, image: str):
+    """Return the docker plugin of `step`, shared with every step like it.
+
+    Plugins are built once per device, image and agent mount, and handed
+    out frozen; copy one before changing it.
+    """
+    mount_buildkite_agent = bool(
         step.label == "Benchmarks"
         or step.mount_buildkite_agent
         or step.otel_tracing_enabled()
-    ):
-        plugin["mount_buildkite_agent"] = True
-    if step.device in (DeviceType.CPU, DeviceType.CPU_SMALL, DeviceType.CPU_MEDIUM) and plugin.get("gpus"):
-        del plugin["gpus"]
-    return plugin
+    )
+    return _build_docker_plugin(step.device, image, mount_buildkite_agent)
@@ -1,7 +1,10 @@
 import copy
+from functools import lru_cache
+
 from step import Step
 from constants import DeviceType
 from plugin.analytics import get_buildkite_analytics_token_env
+from utils_lib.frozen import freeze
 
 HF_HOME = "/root/.cache/huggingface"
 
@@ -233,21 +236,31 @@ h100_rh_plugin_template = {
 }
 
 
-def get_k8s_plugin(step: Step, image: str):
+@lru_cache(maxsize=None)
+def _build_k8s_plugin(device: str, image: str, num_devices: int):
     plugin = None
-    if step.device == DeviceType.H100:
+    if device == DeviceType.H100:
         plugin = copy.deepcopy(h100_plugin_template)
-    elif step.device == DeviceType.H200:
+    elif device == DeviceType.H200:
         plugin = copy.deepcopy(nebius_h200_plugin_template)
-    elif step.device == DeviceType.A100.value:
+    elif device == DeviceType.A100.value:
         plugin = copy.deepcopy(a100_plugin_template)
-    elif step.device == DeviceType.B200_K8S:
+    elif device == DeviceType.B200_K8S:
         plugin = copy.deepcopy(b200_plugin_template)
 
-    if step.device in (DeviceType.H100, DeviceType.B200_K8S):
+    if device in (DeviceType.H100, DeviceType.B200_K8S):
         image = image.replace("public.ecr.aws", "936637512419.dkr.ecr.us-west-2.amazonaws.com/vllm-ci-pull-through-cache")
     plugin["kubernetes"]["podSpec"]["containers"][0]["image"] = image
     plugin["kubernetes"]["podSpec"]["containers"][0]["resources"]["limits"][
         "nvidia.com/gpu"
-    ] = step.num_devices or 1
-    return plugin
+    ] = num_devices
+    return freeze(plugin)
+
+
+def get_k8s_plugin(step: Step, image: str):
+    """Return the Kubernetes plugin of `step`, shared with every step like it.
+
+    Plugins are built once per device, image and GPU count, and handed out
+    frozen; copy one before changing it.
+    """
+    return _build_k8s_plugin(step.device, image, step.num_devices or 1)
@@ -0,0 +1,76 @@
+import json
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+
+class PhaseTimer:
+    """Wall and CPU time of the named phases of one generator run.
+
+    Phases may nest; each record names its parent so the report can be read
+    as a tree. CPU time is this process only, so work done in
+    `--num_workers` subprocesses shows up as wall time alone.
+    """
+
+    def __init__(self):
+        self.phases: List[Dict[str, Any]] = []
+        self._stack: List[str] = []
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        record: Dict[str, Any] = {
+            "name": name,
+            "parent": self._stack[-1] if self._stack else None,
+        }
+        self._stack.append(name)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record["wall_ms"] = round((time.perf_counter() - start_wall) * 1000, 3)
+            record["cpu_ms"] = round((time.process_time() - start_cpu) * 1000, 3)
+            self._stack.pop()
+            self.phases.append(record)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "total_wall_ms": round((time.perf_counter() - self._start_wall) * 1000, 3),
+            "total_cpu_ms": round((time.process_time() - self._start_cpu) * 1000, 3),
+            "phases": self.phases,
+        }
+
+    def write_report(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+            f.write("\n")
+
+
+_timer: Optional[PhaseTimer] = None
+
+
+def start() -> PhaseTimer:
+    global _timer
+    _timer = PhaseTimer()
+    return _timer
+
+
+def stop() -> Optional[PhaseTimer]:
+    global _timer
+    timer, _timer = _timer, None
+    return timer
+
+
+@contextmanager
+def phase(name: str) -> Iterator[Dict[str, Any]]:
+    """Time `name` when profiling is on; otherwise just yield a scratch record.
+
+    Callers may set `record["steps"]` to the number of steps the phase handled.
+    """
+    if _timer is None:
+        yield {}
+        return
+    with _timer.phase(name) as record:
+        yield record
@@ -0,0 +1,166 @@
+import math
+import os
+import subprocess
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+from buildkite_step import BuildkiteCommandStep
+from utils_lib import yaml_io
+
+DEFAULT_JOB_MINUTES = 15
+# Buildkite interpolates this at upload, so each build gets its own groups.
+CONCURRENCY_GROUP_TEMPLATE = "{name}/{queue}/$BUILDKITE_BUILD_ID"
+
+
+@dataclass(frozen=True)
+class QueueCapacity:
+    agents: int
+    max_jobs_per_build: Optional[int] = None
+    job_minutes: float = DEFAULT_JOB_MINUTES
+
+    @property
+    def build_slots(self) -> int:
+        """Jobs of one build that can run on this queue at once."""
+        return min(self.agents, self.max_jobs_per_build or self.agents)
+
+
+@dataclass
+class QueueEstimate:
+    queue: str
+    jobs: int
+    slots: int
+    waves: int
+    last_start_minutes: float
+
+
+def load_queue_capacity(path: str) -> Dict[str, QueueCapacity]:
+    """Read per-queue capacity from a YAML file.
+
+    ```yaml
+    default_job_minutes: 15
+    queues:
+      gpu_1_queue:
+        agents: 40
+        max_jobs_per_build: 16
+        job_minutes: 20
+    ```
+    """
+    with open(path) as f:
+        data = yaml_io.safe_load(f) or {}
+    default_job_minutes = data.get("default_job_minutes", DEFAULT_JOB_MINUTES)
+    queues = data.get("queues")
+    if not isinstance(queues, dict) or not queues:
+        raise ValueError(f"{path} must have a 'queues' mapping")
+    capacity = {}
+    for queue, config in queues.items():
+        agents = (config or {}).get("agents")
+        if not isinstance(agents, int) or agents < 1:
+            raise ValueError(f"Queue {queue} in {path} needs a positive 'agents'")
+        max_jobs_per_build = config.get("max_jobs_per_build")
+        if max_jobs_per_build is not None and (
+            not isinstance(max_jobs_per_build, int) or max_jobs_per_build < 1
+        ):
+            raise ValueError(
+                f"Queue {queue} in {path} has an invalid 'max_jobs_per_build'"
+            )
+        capacity[queue] = QueueCapacity(
+            agents=agents,
+            max_jobs_per_build=max_jobs_per_build,
+            job_minutes=float(config.get("job_minutes", default_job_minutes)),
+        )
+    return capacity
+
+
+def _command_steps_by_queue(
+    buildkite_group_steps: List[Any],
+) -> Dict[str, List[BuildkiteCommandStep]]:
+    by_queue: Dict[str, List[BuildkiteCommandStep]] = {}
+    for group in buildkite_group_steps:
+        for step in group.steps:
+            if isinstance(step, BuildkiteCommandStep) and step.agents.get("queue"):
+                by_queue.setdefault(step.agents["queue"], []).append(step)
+    return by_queue
+
+
+def shape_pipeline(
+    buildkite_group_steps: List[Any],
+    capacity: Dict[str, QueueCapacity],
+    pipeline_name: str,
+) -> List[QueueEstimate]:
+    """Fit each queue's jobs to its capacity and estimate when they start.
+
+    On queues with `max_jobs_per_build`, steps without their own limit share a
+    per-build concurrency group of that size. Jobs past the first wave of
+    `build_slots` lose one priority point per wave, in dispatch order, so a
+    large fan-out yields to the first jobs of other builds instead of
+    holding every agent.
+    """
+    estimates = []
+    for queue, steps in _command_steps_by_queue(buildkite_group_steps).items():
+        queue_capacity = capacity.get(queue)
+        if queue_capacity is None:
+            continue
+        if queue_capacity.max_jobs_per_build:
+            group = CONCURRENCY_GROUP_TEMPLATE.format(name=pipeline_name, queue=queue)
+            for step in steps:
+                if step.concurrency is None and step.concurrency_group is None:
+                    step.concurrency = queue_capacity.max_jobs_per_build
+                    step.concurrency_group = group
+
+        slots = queue_capacity.build_slots
+        # Buildkite dispatches by priority, then pipeline order.
+        dispatch_order = sorted(
+            enumerate(steps), key=lambda item: (-(item[1].priority or 0), item[0])
+        )
+        jobs = 0
+        for _, step in dispatch_order:
+            wave = jobs // slots
+            if wave:
+                step.priority = (step.priority or 0) - wave
+            jobs += step.parallelism or 1
+        waves = math.ceil(jobs / slots)
+        estimates.append(
+            QueueEstimate(
+                queue=queue,
+                jobs=jobs,
+                slots=slots,
+                waves=waves,
+                last_start_minutes=(waves - 1) * queue_capacity.job_minutes,
+            )
+        )
+    return sorted(estimates, key=lambda estimate: estimate.queue)
+
+
+def format_estimates(estimates: List[QueueEstimate]) -> str:
+    lines = [
+        "| Queue | Jobs | Slots | Est. time to start (last job) |",
+        "| --- | ---: | ---: | ---: |",
+    ]
+    for estimate in estimates:
+        lines.append(
+            f"| {estimate.queue} | {estimate.jobs} | {estimate.slots} | "
+            f"~{estimate.last_start_minutes:.0f} min |"
+        )
+    return "\n".join(lines)
+
+
+def annotate_estimates(estimates: List[QueueEstimate]):
+    """Print the estimates, and post them as an annotation on Buildkite."""
+    table = format_estimates(estimates)
+    print(table)
+    if os.getenv("BUILDKITE") != "true":
+        return
+    result = subprocess.run(
+        [
+            "buildkite-agent",
+            "annotate",
+            "--style",
+            "info",
+            "--context",
+            "queue-capacity",
+            f"Estimated time to start per queue, assuming idle agents:\n\n{table}",
+        ],
+        check=False,
+    )
+    if result.returncode != 0:
+        print("Failed to annotate the queue time-to-start estimates.")
@@ -1,11 +1,28 @@
 from pydantic import BaseModel, Field
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pydantic import model_validator
 from typing_extensions import Self
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from global_config import get_global_config
 import os
-import yaml
+from utils_lib import yaml_io
+
+
+def otel_tracing_enabled() -> bool:
+    """Whether jobs of this build get command and pytest tracing."""
+    config = get_global_config()
+    treatment_branch = os.getenv("CI_INFRA_OTEL_TREATMENT_BRANCH", "")
+    trusted_branch = config["branch"] == "main" or bool(
+        treatment_branch
+        and treatment_branch == config["branch"]
+        and os.getenv("BUILDKITE_SOURCE") == "api"
+    )
+    return bool(
+        config["github_repo_name"] == "vllm-project/vllm"
+        and trusted_branch
+        and config["pull_request"] == "false"
+    )
 
 
 class Step(BaseModel):
@@ -35,18 +52,7 @@ class Step(BaseModel):
     mirror: Optional[Dict[str, Dict[str, Any]]] = None
 
     def otel_tracing_enabled(self) -> bool:
-        config = get_global_config()
-        treatment_branch = os.getenv("CI_INFRA_OTEL_TREATMENT_BRANCH", "")
-        trusted_branch = config["branch"] == "main" or bool(
-            treatment_branch
-            and treatment_branch == config["branch"]
-            and os.getenv("BUILDKITE_SOURCE") == "api"
-        )
-        return bool(
-            config["github_repo_name"] == "vllm-project/vllm"
-            and trusted_branch
-            and config["pull_request"] == "false"
-        )
+        return otel_tracing_enabled()
 
     @model_validator(mode="after")
     def validate_multi_node(self) -> Self:
@@ -75,32 +81,100 @@ def parse_steps_from_yaml(yaml_data: dict):
     return steps
 
 
-def read_steps_from_job_dir(job_dir: str):
-    global_config = get_global_config()
-    steps = []
+def _list_job_files(job_dir: str) -> List[str]:
+    yaml_paths = []
     for root, _, files in os.walk(job_dir):
         for file in files:
-            if not file.endswith(".yaml"):
+            if file.endswith(".yaml"):
+                yaml_paths.append(os.path.join(root, file))
+    return yaml_paths
+
+
+def list_job_files(job_dirs: List[str]) -> List[str]:
+    """Job YAML paths of every job dir, in the order steps are read."""
+    return [path for job_dir in job_dirs for path in _list_job_files(job_dir)]
+
+
+def _parse_job_contents(contents: bytes) -> Tuple[Optional[List[str]], List[Step]]:
+    """Load and validate one job file. Runs in worker processes when parallel."""
+    data = yaml_io.safe_load(contents)
+    return data.get("depends_on"), parse_steps_from_yaml(data)
+
+
+def _apply_group_depends_on(
+    yaml_path: str, group_depends_on: Optional[List[str]], file_steps: List[Step]
+):
+    global_config = get_global_config()
+    for step in file_steps:
+        if not step.depends_on:
+            step.depends_on = group_depends_on
+        if (
+            not step.working_dir
+            and global_config["github_repo_name"] == "vllm-project/vllm"
+        ):
+            step.working_dir = "/vllm-workspace/tests"
+        step.source_file_dependencies = getattr(step, "source_file_dependencies", [])
+        if not step.source_file_dependencies:
+            step.source_file_dependencies = []
+        step.source_file_dependencies.append(os.path.relpath(yaml_path))
+
+
+def read_steps_from_job_dir(job_dir: str, num_workers: int = 1, step_cache=None):
+    return read_steps_from_job_dirs(
+        [job_dir], num_workers=num_workers, step_cache=step_cache
+    )
+
+
+def read_steps_from_job_dirs(
+    job_dirs: List[str], num_workers: int = 1, step_cache=None
+):
+    """Read steps from every job dir, parsing files in a process pool.
+
+    Files are listed serially in `os.walk` order and the parsed results are
+    merged back in that order, so the output does not depend on `num_workers`.
+    A `num_workers` of 0 uses one worker per CPU. With a `StepCache`, files
+    whose contents were already parsed are served from the cache and only
+    the misses are parsed.
+    """
+    yaml_paths = list_job_files(job_dirs)
+    parsed_files = [None] * len(yaml_paths)
+    miss_indices, miss_contents, miss_keys = [], [], []
+    for index, yaml_path in enumerate(yaml_paths):
+        with open(yaml_path, "rb") as f:
+            contents = f.read()
+        if step_cache is not None:
+            cache_key = step_cache.key(contents)
+            parsed_files[index] = step_cache.get(cache_key)
+            if parsed_files[index] is not None:
                 continue
-            yaml_path = os.path.join(root, file)
-            with open(yaml_path, "r") as f:
-                data = yaml.safe_load(f)
-            group_depends_on = data.get("depends_on")
-            file_steps = parse_steps_from_yaml(data)
-            if group_depends_on:
-                for step in file_steps:
-                    if not step.depends_on:
-                        step.depends_on = group_depends_on
-                    if (
-                        not step.working_dir
-                        and global_config["github_repo_name"] == "vllm-project/vllm"
-                    ):
-                        step.working_dir = "/vllm-workspace/tests"
-                    step.source_file_dependencies = getattr(step, "source_file_dependencies", [])
-                    if not step.source_file_dependencies:
-                        step.source_file_dependencies = []
-                    step.source_file_dependencies.append(os.path.relpath(yaml_path))
-            steps.extend(file_steps)
+            miss_keys.append(cache_key)
+        miss_indices.append(index)
+        miss_contents.append(contents)
+
+    if num_workers == 0:
+        num_workers = os.cpu_count() or 1
+    if num_workers > 1 and len(miss_contents) > 1:
+        chunksize = max(1, len(miss_contents) // (num_workers * 4))
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            parsed_misses = list(
+                executor.map(_parse_job_contents, miss_contents, chunksize=chunksize)
+            )
+    else:
+        parsed_misses = [_parse_job_contents(contents) for contents in miss_contents]
+    for index, parsed_file in zip(miss_indices, parsed_misses):
+        parsed_files[index] = parsed_file
+
+    if step_cache is not None:
+        for cache_key, (group_depends_on, file_steps) in zip(miss_keys, parsed_misses):
+            step_cache.put(cache_key, group_depends_on, file_steps)
+        step_cache.evict()
+        print(step_cache.stats_line())
+
+    steps = []
+    for yaml_path, (group_depends_on, file_steps) in zip(yaml_paths, parsed_files):
+        if group_depends_on:
+            _apply_group_depends_on(yaml_path, group_depends_on, file_steps)
+        steps.extend(file_steps)
     return steps
 
 
@@ -0,0 +1,118 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from step import Step
+from utils_lib.cache_utils import (
+    get_cache_dir,
+    get_generator_version,
+    write_json_atomic,
+)
+
+STEP_CACHE_NAME = "steps"
+STEP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+STEP_CACHE_MAX_AGE_SECONDS = 14 * 24 * 60 * 60
+
+
+class StepCache:
+    """On-disk cache of validated steps, keyed by job file content hash.
+
+    Entries hold the output of parsing one job file: the file-level
+    `depends_on` and the validated steps. A hit rebuilds the steps with
+    `Step.model_construct`, skipping both YAML parsing and validation.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = STEP_CACHE_MAX_BYTES,
+        max_age_seconds: int = STEP_CACHE_MAX_AGE_SECONDS,
+    ):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        os.makedirs(cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional["StepCache"]:
+        cache_dir = get_cache_dir(STEP_CACHE_NAME)
+        if cache_dir is None:
+            return None
+        return cls(str(cache_dir))
+
+    @staticmethod
+    def key(contents: bytes) -> str:
+        digest = hashlib.sha256(get_generator_version().encode())
+        digest.update(contents)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key: str) -> Optional[Tuple[Optional[List[str]], List[Step]]]:
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            steps = [Step.model_construct(**step) for step in entry["steps"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            self.misses += 1
+            return None
+        # Refresh the mtime so age and size eviction drop the coldest entries.
+        os.utime(path)
+        self.hits += 1
+        return entry["depends_on"], steps
+
+    def put(self, key: str, depends_on: Optional[List[str]], steps: List[Step]):
+        entry: Dict[str, Any] = {
+            "depends_on": depends_on,
+            "steps": [step.model_dump() for step in steps],
+        }
+        try:
+            write_json_atomic(self._path(key), entry)
+        except OSError as e:
+            print(f"Step cache: failed to write entry {key}: {e}")
+
+    def evict(self):
+        """Drop entries older than the max age, then the oldest beyond max size."""
+        entries = []
+        now = time.time()
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+    def _remove(self, path: str):
+        try:
+            os.remove(path)
+            self.evicted += 1
+        except OSError:
+            pass
+
+    def stats_line(self) -> str:
+        total = self.hits + self.misses
+        hit_rate = self.hits / total * 100 if total else 0.0
+        return (
+            f"Step cache: {self.hits} hits, {self.misses} misses "
+            f"({hit_rate:.1f}% hit rate), {self.evicted} evicted"
+        )
@@ -0,0 +1,164 @@
+import heapq
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+class StepGraph:
+    """Dependency index over keyed steps.
+
+    Steps are anything with `key` and `depends_on`: the `Step`s loaded from
+    the job dirs, or the Buildkite steps generated from them.
+
+    Built once, it answers "what does X need" and "what needs X" from
+    memoized closures instead of re-walking `depends_on`. Dependencies on
+    keys that no loaded step defines are kept in the adjacency but only
+    raise when a closure has to walk through them.
+    """
+
+    def __init__(self, steps: Iterable[Any]):
+        self.steps_by_key: Dict[str, Any] = {}
+        for step in steps:
+            if not step.key:
+                continue
+            if step.key in self.steps_by_key:
+                raise ValueError(f"Duplicate CI step key: {step.key}")
+            self.steps_by_key[step.key] = step
+
+        self.dependencies: Dict[str, Tuple[str, ...]] = {}
+        dependents: Dict[str, List[str]] = {key: [] for key in self.steps_by_key}
+        for key, step in self.steps_by_key.items():
+            depends_on = step.depends_on or []
+            if isinstance(depends_on, str):
+                depends_on = [depends_on]
+            self.dependencies[key] = tuple(dict.fromkeys(depends_on))
+            for dependency in self.dependencies[key]:
+                if dependency in dependents:
+                    dependents[dependency].append(key)
+        self.dependents: Dict[str, Tuple[str, ...]] = {
+            key: tuple(keys) for key, keys in dependents.items()
+        }
+
+        self._dependency_closures: Dict[str, FrozenSet[str]] = {}
+        self._dependent_closures: Dict[str, FrozenSet[str]] = {}
+        self._topological_order: Optional[List[str]] = None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.steps_by_key
+
+    def __len__(self) -> int:
+        return len(self.steps_by_key)
+
+    def _closure(
+        self,
+        key: str,
+        edges: Dict[str, Tuple[str, ...]],
+        memo: Dict[str, FrozenSet[str]],
+        check_unknown: bool,
+    ) -> FrozenSet[str]:
+        if key in memo:
+            return memo[key]
+        reached: Set[str] = set()
+        pending = [key]
+        while pending:
+            current = pending.pop()
+            for neighbor in edges[current]:
+                if neighbor in reached:
+                    continue
+                if check_unknown and neighbor not in self.steps_by_key:
+                    raise ValueError(
+                        f"CI step {current} depends on unknown step {neighbor}."
+                    )
+                reached.add(neighbor)
+                if neighbor in memo:
+                    reached |= memo[neighbor]
+                else:
+                    pending.append(neighbor)
+        # A step on a cycle reaches itself; that is reported by
+        # topological_order, not by the closures.
+        reached.discard(key)
+        memo[key] = frozenset(reached)
+        return memo[key]
+
+    def dependency_closure(self, key: str) -> FrozenSet[str]:
+        """Every step `key` transitively depends on, excluding itself."""
+        return self._closure(
+            key, self.dependencies, self._dependency_closures, check_unknown=True
+        )
+
+    def dependent_closure(self, key: str) -> FrozenSet[str]:
+        """Every step that transitively depends on `key`, excluding itself."""
+        return self._closure(
+            key, self.dependents, self._dependent_closures, check_unknown=False
+        )
+
+    def select(self, requested_keys: Iterable[str]) -> FrozenSet[str]:
+        """The requested keys plus everything they transitively depend on."""
+        requested_keys = frozenset(requested_keys)
+        missing = requested_keys - self.steps_by_key.keys()
+        if missing:
+            raise ValueError("Unknown CI step key(s): " + ", ".join(sorted(missing)))
+        selected = set(requested_keys)
+        for key in requested_keys:
+            selected |= self.dependency_closure(key)
+        return frozenset(selected)
+
+    def find_cycle(self, keys: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+        """A dependency cycle as `[a, b, ..., a]`, or None if there is none.
+
+        With `keys`, only cycles among those steps are considered.
+        """
+        subset = self.steps_by_key.keys() if keys is None else frozenset(keys)
+        visiting: Dict[str, int] = {}
+        done: Set[str] = set()
+        path: List[str] = []
+        for root in self.steps_by_key:
+            if root not in subset or root in done:
+                continue
+            stack = [(root, iter(self.dependencies[root]))]
+            visiting[root] = len(path)
+            path.append(root)
+            while stack:
+                key, remaining = stack[-1]
+                for dependency in remaining:
+                    if dependency not in subset or dependency in done:
+                        continue
+                    if dependency in visiting:
+                        return path[visiting[dependency] :] + [dependency]
+                    visiting[dependency] = len(path)
+                    path.append(dependency)
+                    stack.append((dependency, iter(self.dependencies[dependency])))
+                    break
+                else:
+                    stack.pop()
+                    path.pop()
+                    del visiting[key]
+                    done.add(key)
+        return None
+
+    def topological_order(self) -> List[str]:
+        """Step keys with every dependency before its dependents.
+
+        Ties keep the order the steps were loaded in. Raises ValueError on a
+        dependency cycle.
+        """
+        if self._topological_order is not None:
+            return self._topological_order
+        cycle = self.find_cycle()
+        if cycle:
+            raise ValueError("CI step dependency cycle: " + " -> ".join(cycle))
+        position = {key: index for index, key in enumerate(self.steps_by_key)}
+        remaining = {
+            key: sum(dependency in self.steps_by_key for dependency in dependencies)
+            for key, dependencies in self.dependencies.items()
+        }
+        ready = [position[key] for key, count in remaining.items() if count == 0]
+        keys = list(self.steps_by_key)
+        order = []
+        while ready:
+            key = keys[heapq.heappop(ready)]
+            order.append(key)
+            for dependent in self.dependents[key]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    heapq.heappush(ready, position[dependent])
+        self._topological_order = order
+        return order
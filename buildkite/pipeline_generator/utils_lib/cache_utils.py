@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, List, Optional, Union
+
+CACHE_DIR_ENV_VAR = "PIPELINE_GENERATOR_CACHE_DIR"
+GENERATOR_DIR = Path(__file__).resolve().parent.parent
+
+
+def get_cache_dir(name: str) -> Optional[Path]:
+    """Return the named cache subdirectory, or None when caching is disabled."""
+    root = os.getenv(CACHE_DIR_ENV_VAR)
+    if not root:
+        return None
+    path = Path(root) / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _generator_files(root: Path) -> List[Path]:
+    # Every source, including the OTel shell helpers inlined into steps.
+    # Symlinks, such as the pytest shim ci_otel.sh links next to itself,
+    # and build artifacts are not part of the generator.
+    files = []
+    for path in root.rglob("*"):
+        if path.is_symlink() or not path.is_file():
+            continue
+        parts = path.relative_to(root).parts
+        if any(part == "__pycache__" or part.endswith(".egg-info") for part in parts):
+            continue
+        files.append(path)
+    return sorted(files)
+
+
+@lru_cache(maxsize=1)
+def get_generator_version() -> str:
+    """Hash of the generator's files, so any change invalidates caches."""
+    digest = hashlib.sha256()
+    for path in _generator_files(GENERATOR_DIR):
+        digest.update(str(path.relative_to(GENERATOR_DIR)).encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def write_json_atomic(path: Union[str, Path], data: Any):
+    """Write JSON so concurrent readers never observe a partial file."""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
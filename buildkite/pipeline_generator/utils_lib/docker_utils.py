@@ -1,8 +1,13 @@
-import subprocess
 import os
 import re
-from typing import Tuple
+from typing import Optional, Tuple
 from global_config import get_global_config
+from utils_lib.registry_client import (
+    DockerCliRegistryClient,
+    ManifestCache,
+    RegistryClient,
+    first_existing_tag,
+)
 
 
 def get_image(cpu: bool = False, arm64: bool = False) -> str:
@@ -44,75 +49,40 @@ def _clean_docker_tag(tag: str) -> str:
     return re.sub(r"[^a-zA-Z0-9_.-]", "-", tag or "")
 
 
-def _docker_manifest_exists(image_tag: str) -> bool:
-    try:
-        subprocess.run(
-            ["docker", "manifest", "inspect", image_tag],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=True,
-        )
-        return True
-    except subprocess.CalledProcessError:
-        return False
+ECR_REGISTRY = "936637512419.dkr.ecr.us-east-1.amazonaws.com"
 
 
-def get_ecr_cache_registry() -> Tuple[str, str]:
+def get_ecr_cache_registry(
+    registry_client: Optional[RegistryClient] = None,
+) -> Tuple[str, str]:
     global_config = get_global_config()
     branch = global_config["branch"]
-    test_cache_ecr = "936637512419.dkr.ecr.us-east-1.amazonaws.com/vllm-ci-test-cache"
-    postmerge_cache_ecr = (
-        "936637512419.dkr.ecr.us-east-1.amazonaws.com/vllm-ci-postmerge-cache"
-    )
-    cache_from_tag, cache_to_tag = None, None
-    # Authenticate Docker to AWS ECR
-    login_cmd = ["aws", "ecr", "get-login-password", "--region", "us-east-1"]
-    try:
-        proc = subprocess.Popen(login_cmd, stdout=subprocess.PIPE)
-        subprocess.run(
-            [
-                "docker",
-                "login",
-                "--username",
-                "AWS",
-                "--password-stdin",
-                "936637512419.dkr.ecr.us-east-1.amazonaws.com",
-            ],
-            stdin=proc.stdout,
-            check=True,
-        )
-        proc.stdout.close()
-        proc.wait()
-    except Exception as e:
-        raise RuntimeError(f"Failed to authenticate with AWS ECR: {e}")
-
+    test_cache_ecr = f"{ECR_REGISTRY}/vllm-ci-test-cache"
+    postmerge_cache_ecr = f"{ECR_REGISTRY}/vllm-ci-postmerge-cache"
+    postmerge_cache_tag = f"{postmerge_cache_ecr}:latest"
+    # Existing tags to reuse, highest priority first; the postmerge cache is
+    # the fallback when none of them exist.
+    candidates = []
     if global_config["pull_request"]:  # PR build
         cache_to_tag = f"{test_cache_ecr}:pr-{global_config['pull_request']}"
-        if _docker_manifest_exists(cache_to_tag):  # use PR cache if exists
-            cache_from_tag = cache_to_tag
-        elif (
-            os.getenv("BUILDKITE_PULL_REQUEST_BASE_BRANCH") != "main"
-        ):  # use base branch cache if exists
-            clean_base = _clean_docker_tag(
-                os.getenv("BUILDKITE_PULL_REQUEST_BASE_BRANCH")
-            )
-            if _docker_manifest_exists(f"{test_cache_ecr}:{clean_base}"):
-                cache_from_tag = f"{test_cache_ecr}:{clean_base}"
-            else:  # fall back to postmerge cache ecr if base branch cache does not exist
-                cache_from_tag = f"{postmerge_cache_ecr}:latest"
-        else:
-            cache_from_tag = f"{postmerge_cache_ecr}:latest"
-    else:  # non-PR build
-        if branch == "main":  # postmerge
-            cache_to_tag = f"{postmerge_cache_ecr}:latest"
-            cache_from_tag = f"{postmerge_cache_ecr}:latest"
-        else:
-            clean_branch = _clean_docker_tag(branch)
-            cache_to_tag = f"{test_cache_ecr}:{clean_branch}"
-            if _docker_manifest_exists(f"{test_cache_ecr}:{clean_branch}"):
-                cache_from_tag = f"{test_cache_ecr}:{clean_branch}"
-            else:
-                cache_from_tag = f"{postmerge_cache_ecr}:latest"
+        candidates.append(cache_to_tag)  # use PR cache if exists
+        base_branch = os.getenv("BUILDKITE_PULL_REQUEST_BASE_BRANCH")
+        clean_base = _clean_docker_tag(base_branch)
+        if base_branch != "main" and clean_base:  # then base branch cache
+            candidates.append(f"{test_cache_ecr}:{clean_base}")
+    elif branch == "main":  # postmerge
+        cache_to_tag = postmerge_cache_tag
+    else:
+        cache_to_tag = f"{test_cache_ecr}:{_clean_docker_tag(branch)}"
+        candidates.append(cache_to_tag)
+
+    # Authenticate Docker to AWS ECR; builds push to cache_to_tag either way.
+    registry_client = registry_client or DockerCliRegistryClient()
+    registry_client.login(ECR_REGISTRY)
+    cache_from_tag = (
+        first_existing_tag(registry_client, candidates, ManifestCache.from_env())
+        or postmerge_cache_tag
+    )
     if not cache_from_tag or not cache_to_tag:
         raise RuntimeError("Failed to get ECR cache tags")
     return cache_from_tag, cache_to_tag
@@ -1,7 +1,23 @@
+import json
 import subprocess
 import os
-from typing import List, Optional
-import requests
+import time
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+from utils_lib.cache_utils import get_cache_dir, write_json_atomic
+from utils_lib.github_client import GitHubClient, PullRequestMetadata
+
+# "worktree" (default) and "head" list changes without touching the index;
+# "stage" is the original `git add .` + `git diff` path.
+DIFF_MODE_ENV_VAR = "PIPELINE_GENERATOR_DIFF_MODE"
+DIFF_FILTER = "--diff-filter=ACMDR"
+MERGE_BASE_CACHE_NAME = "merge_base"
+MERGE_BASE_CACHE_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+# Single-file and split commit-graphs, relative to the objects/info dir.
+COMMIT_GRAPH_FILES = (
+    "commit-graph",
+    os.path.join("commit-graphs", "commit-graph-chain"),
+)
 
 
 def get_merge_base_commit() -> Optional[str]:
@@ -10,53 +26,160 @@ def get_merge_base_commit() -> Optional[str]:
     if merge_base:
         return merge_base
     # Compute merge base if not provided
+    start = time.perf_counter()
+    merge_base, source = _resolve_merge_base()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    print(f"Merge base lookup: {elapsed_ms:.1f} ms ({source})")
+    return merge_base
+
+
+def _resolve_merge_base() -> Tuple[Optional[str], str]:
+    """Return the merge base of origin/main and HEAD and how it was found.
+
+    Results are memoized per (HEAD, origin/main) sha pair, so agents that
+    reuse a clone only walk history once per pair. A commit-graph file in
+    the clone, found by the same rev-parse call, is used for the walk.
+    """
     try:
-        result = subprocess.run(
-            ["git", "merge-base", "origin/main", "HEAD"],
-            capture_output=True,
-            text=True,
-            check=True,
-        )
-        return result.stdout.strip()
+        objects_info, head, main = subprocess.check_output(
+            ["git", "rev-parse", "--git-path", "objects/info", "HEAD", "origin/main"],
+            universal_newlines=True,
+        ).splitlines()
+    except (subprocess.CalledProcessError, ValueError):
+        return None, "unresolved refs"
+    cache_dir = get_cache_dir(MERGE_BASE_CACHE_NAME)
+    cache_path = cache_dir / f"{head}-{main}.json" if cache_dir else None
+    if cache_path is not None:
+        try:
+            with open(cache_path, "r") as f:
+                return json.load(f)["merge_base"], "cached"
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+
+    merge_base_cmd = ["git", "merge-base", main, head]
+    has_commit_graph = any(
+        os.path.exists(os.path.join(objects_info, name)) for name in COMMIT_GRAPH_FILES
+    )
+    if has_commit_graph:
+        # On by default, but agent git config may have turned it off.
+        merge_base_cmd[1:1] = ["-c", "core.commitGraph=true"]
+    try:
+        merge_base = subprocess.check_output(
+            merge_base_cmd, universal_newlines=True
+        ).strip()
     except subprocess.CalledProcessError:
-        return None
+        return None, "no merge base"
+    if cache_path is not None:
+        _prune_merge_base_cache(cache_dir)
+        try:
+            write_json_atomic(cache_path, {"merge_base": merge_base})
+        except OSError:
+            pass
+    return merge_base, "commit-graph" if has_commit_graph else "git merge-base"
+
+
+def _prune_merge_base_cache(cache_dir: Path):
+    cutoff = time.time() - MERGE_BASE_CACHE_MAX_AGE_SECONDS
+    for entry in os.scandir(cache_dir):
+        try:
+            if entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+        except OSError:
+            pass
+
+
+class FileChange(NamedTuple):
+    status: str  # one of A, C, M, D, R
+    path: str
+    old_path: Optional[str] = None  # source of a rename or copy
+
+
+def _parse_name_status(output: str) -> List[FileChange]:
+    """Parse `--name-status -z` output into FileChanges."""
+    fields = output.split("\0")
+    changes = []
+    i = 0
+    while i < len(fields) and fields[i]:
+        status = fields[i][0]
+        if status in "RC":
+            changes.append(FileChange(status, fields[i + 2], fields[i + 1]))
+            i += 3
+        else:
+            changes.append(FileChange(status, fields[i + 1]))
+            i += 2
+    return changes
+
+
+def get_file_changes(base: str, mode: str = "worktree") -> List[FileChange]:
+    """Changes from `base` to HEAD or to the working tree, without staging.
+
+    "head" compares the two commit trees. "worktree" also picks up
+    uncommitted edits and untracked, non-ignored files, which `git add .`
+    would have staged; those are reported as additions.
+    """
+    if mode == "head":
+        output = subprocess.check_output(
+            ["git", "diff-tree", "-r", "-z", "-M", "--name-status", DIFF_FILTER]
+            + [base, "HEAD"],
+            universal_newlines=True,
+        )
+        changes = _parse_name_status(output)
+    elif mode == "worktree":
+        output = subprocess.check_output(
+            ["git", "diff", "-z", "-M", "--name-status", DIFF_FILTER, base],
+            universal_newlines=True,
+        )
+        changes = _parse_name_status(output)
+        untracked = subprocess.check_output(
+            ["git", "ls-files", "-z", "--others", "--exclude-standard"],
+            universal_newlines=True,
+        )
+        changes.extend(FileChange("A", path) for path in untracked.split("\0") if path)
+    else:
+        raise ValueError(f"Unsupported diff mode: {mode}")
+    return sorted(changes, key=lambda change: change.path)
 
 
 def get_list_file_diff(branch: str, merge_base_commit: Optional[str]) -> List[str]:
     """Get list of file paths that get changed between current branch and origin/main."""
+    base = "HEAD~1" if branch == "main" else merge_base_commit
+    if not base:
+        raise RuntimeError("Failed to determine merge base commit for git diff.")
+    base = base.strip()
+    mode = os.getenv(DIFF_MODE_ENV_VAR, "worktree")
+    if mode != "stage":
+        try:
+            return [change.path for change in get_file_changes(base, mode)]
+        except subprocess.CalledProcessError as e:
+            print(f"git diff without staging failed, using git add: {e}")
+    return _get_list_file_diff_staged(base)
+
+
+def _get_list_file_diff_staged(base: str) -> List[str]:
+    """Stage the whole checkout, then diff the index-refreshed tree against base."""
     try:
         subprocess.run(["git", "add", "."], check=True)
-        if branch == "main":
-            output = subprocess.check_output(
-                ["git", "diff", "--name-only", "--diff-filter=ACMDR", "HEAD~1"],
-                universal_newlines=True,
-            )
-        else:
-            merge_base = merge_base_commit
-            if not merge_base:
-                pass
-            output = subprocess.check_output(
-                [
-                    "git",
-                    "diff",
-                    "--name-only",
-                    "--diff-filter=ACMDR",
-                    merge_base.strip(),
-                ],
-                universal_newlines=True,
-            )
+        output = subprocess.check_output(
+            ["git", "diff", "--name-only", DIFF_FILTER, base],
+            universal_newlines=True,
+        )
         return [line for line in output.split("\n") if line.strip()]
     except subprocess.CalledProcessError as e:
         raise RuntimeError(f"Failed to get git diff: {e}")
-    except AttributeError:
-        # Case where merge_base_commit is None
-        raise RuntimeError("Failed to determine merge base commit for git diff.")
 
 
-def get_pr_labels(pull_request: str, repo_name: str) -> List[str]:
+def get_pr_metadata(
+    pull_request: str, repo_name: str, client: Optional[GitHubClient] = None
+) -> Optional[PullRequestMetadata]:
+    """Labels, base branch and head sha of a PR in one request, or None."""
     if not pull_request or pull_request == "false":
-        return []
-    request_url = f"https://api.github.com/repos/{repo_name}/pulls/{pull_request}"
-    response = requests.get(request_url)
-    response.raise_for_status()
-    return [label["name"] for label in response.json()["labels"]]
+        return None
+    client = client or GitHubClient.from_env()
+    return client.get_pull_request(repo_name, pull_request)
+
+
+def get_pr_labels(
+    pull_request: str, repo_name: str, client: Optional[GitHubClient] = None
+) -> List[str]:
+    metadata = get_pr_metadata(pull_request, repo_name, client)
+    return metadata.labels if metadata else []
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from typing import List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from utils_lib.cache_utils import get_cache_dir, write_json_atomic
+
+GITHUB_API_URL_ENV_VAR = "GITHUB_API_URL"
+GITHUB_TOKEN_ENV_VAR = "GITHUB_TOKEN"
+DEFAULT_GITHUB_API_URL = "https://api.github.com"
+GITHUB_CACHE_NAME = "github"
+GITHUB_TIMEOUT_SECONDS = 10
+GITHUB_RETRIES = 3
+
+
+@dataclass(frozen=True)
+class PullRequestMetadata:
+    labels: List[str]
+    base_branch: str
+    head_sha: str
+
+
+class GitHubClient:
+    """Pooled, retrying GitHub REST client with an ETag-validated disk cache.
+
+    A cached response is revalidated with If-None-Match; GitHub answers an
+    unchanged resource with 304, which is cheap and, for authenticated
+    requests, does not count against the rate limit.
+    """
+
+    def __init__(
+        self,
+        base_url: str = DEFAULT_GITHUB_API_URL,
+        token: Optional[str] = None,
+        cache_dir: Optional[str] = None,
+        timeout: float = GITHUB_TIMEOUT_SECONDS,
+        retries: int = GITHUB_RETRIES,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers["Accept"] = "application/vnd.github+json"
+        if token:
+            self.session.headers["Authorization"] = f"Bearer {token}"
+        retry = Retry(
+            total=retries,
+            backoff_factor=0.5,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        self.session.mount("http://", HTTPAdapter(max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(max_retries=retry))
+
+    @classmethod
+    def from_env(cls) -> "GitHubClient":
+        cache_dir = get_cache_dir(GITHUB_CACHE_NAME)
+        return cls(
+            base_url=os.getenv(GITHUB_API_URL_ENV_VAR) or DEFAULT_GITHUB_API_URL,
+            token=os.getenv(GITHUB_TOKEN_ENV_VAR),
+            cache_dir=str(cache_dir) if cache_dir else None,
+        )
+
+    def _cache_path(self, url: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(
+            self.cache_dir, f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+        )
+
+    def _read_cache(self, path: Optional[str], url: str) -> Optional[dict]:
+        if path is None:
+            return None
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+            if entry["url"] != url or not entry["etag"]:
+                return None
+            return entry
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def get_json(self, path: str) -> dict:
+        """GET `path` relative to the API root, revalidating any cached copy."""
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        cache_path = self._cache_path(url)
+        cached = self._read_cache(cache_path, url)
+        headers = {"If-None-Match": cached["etag"]} if cached else {}
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and cached:
+            return cached["body"]
+        response.raise_for_status()
+        body = response.json()
+        etag = response.headers.get("ETag")
+        if cache_path and etag:
+            try:
+                write_json_atomic(cache_path, {"url": url, "etag": etag, "body": body})
+            except OSError:
+                pass
+        return body
+
+    def get_pull_request(
+        self, repo_name: str, pull_request: str
+    ) -> PullRequestMetadata:
+        pull = self.get_json(f"repos/{repo_name}/pulls/{pull_request}")
+        return PullRequestMetadata(
+            labels=[label["name"] for label in pull["labels"]],
+            base_branch=pull["base"]["ref"],
+            head_sha=pull["head"]["sha"],
+        )
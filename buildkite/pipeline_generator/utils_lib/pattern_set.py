@@ -0,0 +1,47 @@
+import re
+from typing import Iterable, List, Optional, Pattern
+
+_DEFAULT_FLAGS = re.compile("").flags
+
+
+class PatternSet:
+    """A list of regexes checked with re.match, compiled into one alternation.
+
+    re.match tries the alternatives left to right at position 0, so the named
+    group that matched is the first listed pattern that matches on its own.
+    Patterns that define groups (their numbering would shift) or set global
+    inline flags (they only apply at the start of an expression) cannot be
+    joined, so the set then falls back to matching each pattern in turn.
+    """
+
+    def __init__(self, patterns: Optional[Iterable[str]]):
+        self.patterns: List[str] = list(patterns or [])
+        self._compiled: List[Pattern] = [re.compile(p) for p in self.patterns]
+        self._combined: Optional[Pattern] = None
+        if self._compiled and all(
+            p.groups == 0 and p.flags == _DEFAULT_FLAGS for p in self._compiled
+        ):
+            try:
+                self._combined = re.compile(
+                    "|".join(
+                        f"(?P<p{index}>{pattern})"
+                        for index, pattern in enumerate(self.patterns)
+                    )
+                )
+            except re.error:
+                self._combined = None
+
+    def __bool__(self) -> bool:
+        return bool(self.patterns)
+
+    def first_match(self, text: str) -> Optional[str]:
+        """Return the first pattern that re.match-es `text`, or None."""
+        if self._combined is not None:
+            match = self._combined.match(text)
+            if match is None:
+                return None
+            return self.patterns[int(match.lastgroup[1:])]
+        for pattern, compiled in zip(self.patterns, self._compiled):
+            if compiled.match(text):
+                return pattern
+        return None
@@ -0,0 +1,140 @@
+import hashlib
+import json
+import subprocess
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from utils_lib.cache_utils import get_cache_dir, write_json_atomic
+
+MANIFEST_CACHE_NAME = "manifests"
+# Cache tags are pushed by every build, so results only need to survive the
+# few bootstraps of one burst of builds.
+MANIFEST_CACHE_TTL_SECONDS = 5 * 60
+
+
+class RegistryClient(ABC):
+    """Minimal registry operations needed to choose Docker cache tags."""
+
+    @abstractmethod
+    def login(self, registry: str):
+        """Authenticate with `registry`, raising RuntimeError on failure."""
+
+    @abstractmethod
+    def manifest_exists(self, image_tag: str) -> bool:
+        """Whether `image_tag` can be pulled from its registry."""
+
+
+class DockerCliRegistryClient(RegistryClient):
+    """Talks to ECR through the aws and docker CLIs on the agent."""
+
+    def __init__(self, region: str = "us-east-1"):
+        self.region = region
+
+    def login(self, registry: str):
+        login_cmd = ["aws", "ecr", "get-login-password", "--region", self.region]
+        try:
+            proc = subprocess.Popen(login_cmd, stdout=subprocess.PIPE)
+            subprocess.run(
+                [
+                    "docker",
+                    "login",
+                    "--username",
+                    "AWS",
+                    "--password-stdin",
+                    registry,
+                ],
+                stdin=proc.stdout,
+                check=True,
+            )
+            proc.stdout.close()
+            proc.wait()
+        except Exception as e:
+            raise RuntimeError(f"Failed to authenticate with AWS ECR: {e}")
+
+    def manifest_exists(self, image_tag: str) -> bool:
+        try:
+            subprocess.run(
+                ["docker", "manifest", "inspect", image_tag],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                check=True,
+            )
+            return True
+        except subprocess.CalledProcessError:
+            return False
+
+
+class ManifestCache:
+    """Short-lived on-disk record of whether image tags exist."""
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = MANIFEST_CACHE_TTL_SECONDS):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+
+    @classmethod
+    def from_env(cls) -> Optional["ManifestCache"]:
+        cache_dir = get_cache_dir(MANIFEST_CACHE_NAME)
+        if cache_dir is None:
+            return None
+        return cls(str(cache_dir))
+
+    def _path(self, image_tag: str) -> str:
+        digest = hashlib.sha256(image_tag.encode()).hexdigest()
+        return f"{self.cache_dir}/{digest}.json"
+
+    def get(self, image_tag: str) -> Optional[bool]:
+        try:
+            with open(self._path(image_tag), "r") as f:
+                entry = json.load(f)
+            if entry["image_tag"] != image_tag:
+                return None
+            if time.time() - entry["checked_at"] > self.ttl_seconds:
+                return None
+            return bool(entry["exists"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def put(self, image_tag: str, exists: bool):
+        try:
+            write_json_atomic(
+                self._path(image_tag),
+                {"image_tag": image_tag, "exists": exists, "checked_at": time.time()},
+            )
+        except OSError:
+            # The cache is an optimization; never fail tag selection over it.
+            pass
+
+
+def first_existing_tag(
+    client: RegistryClient,
+    candidates: List[str],
+    manifest_cache: Optional[ManifestCache] = None,
+) -> Optional[str]:
+    """Return the first of `candidates` that exists, probing them concurrently."""
+    known = {}
+    if manifest_cache is not None:
+        for image_tag in candidates:
+            exists = manifest_cache.get(image_tag)
+            if exists is not None:
+                known[image_tag] = exists
+    to_probe = []
+    for image_tag in candidates:
+        if known.get(image_tag):
+            # Lower-priority tags cannot win over one known to exist.
+            break
+        if image_tag not in known:
+            to_probe.append(image_tag)
+    if to_probe:
+        with ThreadPoolExecutor(max_workers=len(to_probe)) as executor:
+            for image_tag, exists in zip(
+                to_probe, executor.map(client.manifest_exists, to_probe)
+            ):
+                known[image_tag] = exists
+                if manifest_cache is not None:
+                    manifest_cache.put(image_tag, exists)
+    for image_tag in candidates:
+        if known.get(image_tag):
+            return image_tag
+    return None
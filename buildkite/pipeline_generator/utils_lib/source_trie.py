@@ -0,0 +1,103 @@
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+DependencyKey = Tuple[str, ...]
+
+
+def dependency_key(source_file_dependencies: Optional[Sequence[str]]) -> DependencyKey:
+    return tuple(source_file_dependencies or ())
+
+
+class TriggeredDependencies:
+    """Which of a trie's dependency lists some changed files triggered."""
+
+    __slots__ = ("known", "matched")
+
+    def __init__(
+        self, known: FrozenSet[DependencyKey], matched: FrozenSet[DependencyKey]
+    ):
+        self.known = known
+        self.matched = matched
+
+    def __contains__(self, key: DependencyKey) -> bool:
+        return key in self.matched
+
+    def match(
+        self, source_file_dependencies: Optional[Sequence[str]]
+    ) -> Optional[bool]:
+        """Whether the list was triggered, or None if the trie never had it."""
+        key = dependency_key(source_file_dependencies)
+        if key not in self.known:
+            return None
+        return key in self.matched
+
+
+class _Node:
+    __slots__ = ("children", "includes", "excludes")
+
+    def __init__(self):
+        self.children: Dict[str, "_Node"] = {}
+        self.includes: Set[int] = set()
+        self.excludes: Set[int] = set()
+
+
+class SourceDependencyTrie:
+    """Path-component trie over the source_file_dependencies of many steps.
+
+    A dependency "a/b" matches a changed file "a/b" or anything under "a/b/",
+    which is exactly a component prefix of the file's path, so one walk down
+    the trie per changed file finds every include and "!"-exclude it hits.
+    """
+
+    def __init__(self, dependency_lists: Iterable[Optional[Sequence[str]]] = ()):
+        self._root = _Node()
+        self._ids: Dict[DependencyKey, int] = {}
+        self._keys: List[DependencyKey] = []
+        for source_file_dependencies in dependency_lists:
+            self.add(source_file_dependencies)
+
+    def __contains__(self, source_file_dependencies) -> bool:
+        return dependency_key(source_file_dependencies) in self._ids
+
+    def add(self, source_file_dependencies: Optional[Sequence[str]]):
+        key = dependency_key(source_file_dependencies)
+        if not key or key in self._ids:
+            return
+        dependency_id = len(self._keys)
+        self._ids[key] = dependency_id
+        self._keys.append(key)
+        for dependency in key:
+            if dependency.startswith("!"):
+                self._insert(dependency[1:]).excludes.add(dependency_id)
+            else:
+                self._insert(dependency).includes.add(dependency_id)
+
+    def _insert(self, prefix: str) -> _Node:
+        normalized = prefix.rstrip("/")
+        if not normalized:
+            # An empty prefix never matches; park it on an unreachable node.
+            return _Node()
+        node = self._root
+        for component in normalized.split("/"):
+            node = node.children.setdefault(component, _Node())
+        return node
+
+    def triggered(self, list_file_diff: Iterable[str]) -> TriggeredDependencies:
+        """The dependency lists matched by at least one changed file."""
+        matched: Set[int] = set()
+        for diff_file in set(list_file_diff):
+            node = self._root
+            includes: Set[int] = set()
+            excludes: Set[int] = set()
+            for component in diff_file.split("/"):
+                node = node.children.get(component)
+                if node is None:
+                    break
+                includes |= node.includes
+                excludes |= node.excludes
+            # Exclusions are per file: a file hitting both an include and an
+            # exclude of the same list does not trigger it.
+            matched |= includes - excludes
+        return TriggeredDependencies(
+            frozenset(self._ids),
+            frozenset(self._keys[dependency_id] for dependency_id in matched),
+        )
@@ -0,0 +1,87 @@
+import re
+from functools import lru_cache
+from typing import Dict, Optional, Pattern, Tuple
+
+_VARIABLE_NAME = re.compile(r"\$\w+")
+_NAME_CHARACTER = re.compile(r"[\w$]")
+
+
+class VariableInjector:
+    """Replace whole `$VARIABLE` references in one pass over each command.
+
+    The reference behaviour is one `re.sub(re.escape(variable) + r"\\b", ...)`
+    per variable, in dict order, skipping empty values. A single alternation
+    gives the same result except when one substitution can change what a
+    later one sees; those inputs use the sequential substitution instead.
+    """
+
+    def __init__(self, variables_to_inject: Dict[str, Optional[str]]):
+        self._variables = {
+            variable: value for variable, value in variables_to_inject.items() if value
+        }
+        self._pattern: Optional[Pattern] = None
+        if self._variables and self._can_combine():
+            self._pattern = re.compile(
+                "|".join(f"{re.escape(variable)}\\b" for variable in self._variables)
+            )
+
+    def _can_combine(self) -> bool:
+        variables = list(self._variables)
+        for index, (variable, value) in enumerate(self._variables.items()):
+            # Names must be "$" plus word characters so at most one of them
+            # matches at any position, and values must not be read as
+            # re.sub templates.
+            if not _VARIABLE_NAME.fullmatch(variable) or "\\" in value:
+                return False
+            # A "$" in a value could start a reference to a variable that is
+            # substituted later, which only the sequential form would expand.
+            for later in variables[index + 1 :]:
+                for position in range(len(value)):
+                    if value[position] != "$":
+                        continue
+                    tail = value[position:]
+                    if tail.startswith(later) or later.startswith(tail):
+                        return False
+        return True
+
+    def _inject_sequentially(self, command: str) -> str:
+        for variable, value in self._variables.items():
+            command = re.sub(re.escape(variable) + r"\b", value, command)
+        return command
+
+    def inject(self, command: str) -> str:
+        if not self._variables:
+            return command
+        if self._pattern is None:
+            return self._inject_sequentially(command)
+        matches = list(self._pattern.finditer(command))
+        if not matches:
+            return command
+        for match in matches:
+            # After "$NAME" text (including a reference just before this one)
+            # substitution order matters: a value can complete a reference to
+            # a later variable, or change the character a \b is checked against.
+            if match.start() and _NAME_CHARACTER.match(command, match.start() - 1):
+                return self._inject_sequentially(command)
+        parts = []
+        position = 0
+        for match in matches:
+            parts.append(command[position : match.start()])
+            parts.append(self._variables[match.group()])
+            position = match.end()
+        parts.append(command[position:])
+        return "".join(parts)
+
+
+@lru_cache(maxsize=8)
+def _get_variable_injector(
+    variables: Tuple[Tuple[str, Optional[str]], ...],
+) -> VariableInjector:
+    return VariableInjector(dict(variables))
+
+
+def get_variable_injector(
+    variables_to_inject: Dict[str, Optional[str]],
+) -> VariableInjector:
+    """Return the injector for these variables, compiled once per generation."""
+    return _get_variable_injector(tuple(variables_to_inject.items()))
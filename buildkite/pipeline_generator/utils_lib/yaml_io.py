@@ -0,0 +1,37 @@
+"""YAML I/O that uses libyaml's C loader and dumper when PyYAML has them."""
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as SafeDumper
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeDumper, SafeLoader
+
+from utils_lib.frozen import FrozenDict, FrozenList
+
+# libyaml and the Python emitter fold long scalars at different points, so
+# lines are never folded: the output is then the same with either dumper.
+# libyaml takes the width as a C int.
+LINE_WIDTH = 2**31 - 1
+
+
+class _Dumper(SafeDumper):
+    """SafeDumper that also writes the frozen containers.
+
+    A subclass keeps the representers off PyYAML's shared dumper classes.
+    """
+
+
+# Representers are looked up by exact type, so the subclasses need their own.
+_Dumper.add_representer(FrozenDict, yaml.SafeDumper.represent_dict)
+_Dumper.add_representer(FrozenList, yaml.SafeDumper.represent_list)
+
+
+def safe_load(stream):
+    return yaml.load(stream, Loader=SafeLoader)
+
+
+def dump(data, stream=None, **kwargs):
+    kwargs.setdefault("width", LINE_WIDTH)
+    return yaml.dump(data, stream, Dumper=_Dumper, **kwargs)
@@ -0,0 +1,122 @@
+"""Shared helpers for the pipeline generator benchmarks.
+
+Benchmarks are plain scripts rather than tests so they never slow down the
+regular suite. Run them from the repository root, e.g.::
+
+    python buildkite/tests/pipeline_generator/benchmarks/bench_job_dir_loader.py
+"""
+
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+GENERATOR_DIR = Path(__file__).resolve().parents[3] / "pipeline_generator"
+if str(GENERATOR_DIR) not in sys.path:
+    sys.path.insert(0, str(GENERATOR_DIR))
+
+
+def fake_global_config(**overrides) -> Dict:
+    """Install a global config that needs no git, GitHub or ECR access."""
+    import global_config
+
+    config = {
+        "name": "vllm_ci",
+        "github_repo_name": "vllm-project/vllm",
+        "job_dirs": [],
+        "registries": "public.ecr.aws/q9t5s3a7",
+        "repositories": {
+            "main": "vllm-ci-postmerge-repo",
+            "premerge": "vllm-ci-test-repo",
+        },
+        "branch": "bench-branch",
+        "commit": "0" * 40,
+        "pull_request": "false",
+        "docs_only_disable": "1",
+        "nightly": "0",
+        "torch_nightly": "0",
+        "run_all": False,
+        "list_file_diff": [],
+        "fail_fast": False,
+        "only_step_keys": None,
+    }
+    config.update(overrides)
+    global_config.config = config
+    return config
+
+
+def generate_pipeline(job_dirs: List[str], output_file_path: str, **kwargs):
+    """Run PipelineGenerator.generate offline against synthetic job dirs."""
+    import buildkite_step
+    import pipeline_generator
+
+    fake_global_config(job_dirs=job_dirs)
+    buildkite_step.get_ecr_cache_registry = lambda: ("cache-from", "cache-to")
+    generator = pipeline_generator.PipelineGenerator(
+        "unused", output_file_path, **kwargs
+    )
+    with open(os.devnull, "w") as devnull:
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            generator.generate()
+        finally:
+            sys.stdout = stdout
+
+
+def write_synthetic_job_tree(
+    root: Path, num_files: int, steps_per_file: int = 4, num_areas: int = 40
+) -> List[Path]:
+    """Write a `test_areas`-like tree with `num_files` job YAML files."""
+    paths = []
+    for file_index in range(num_files):
+        area = root / f"area_{file_index % num_areas:03d}"
+        area.mkdir(parents=True, exist_ok=True)
+        lines = [
+            f"group: Area {file_index % num_areas}",
+            "depends_on:",
+            "  - image-build",
+            "steps:",
+        ]
+        for step_index in range(steps_per_file):
+            key = f"step-{file_index}-{step_index}"
+            lines += [
+                f"- label: Step {file_index}.{step_index}",
+                f"  key: {key}",
+                "  timeout_in_minutes: 30",
+                "  device: h200_18gb" if step_index % 2 else "  num_devices: 1",
+                "  source_file_dependencies:",
+                f"  - vllm/area_{file_index % num_areas}/",
+                f"  - tests/area_{file_index % num_areas}/test_{file_index}.py",
+                "  commands:",
+                f"  - pytest -v -s area_{file_index % num_areas}/test_{file_index}.py"
+                f" -k case_{step_index}",
+                f"  - echo $BUILDKITE_COMMIT $IMAGE_TAG {key}",
+            ]
+        path = area / f"jobs_{file_index:05d}.yaml"
+        path.write_text("\n".join(lines) + "\n")
+        paths.append(path)
+    return paths
+
+
+def measure(fn: Callable[[], object], repeat: int = 3) -> float:
+    """Return the median wall time of `fn` in seconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def report(name: str, baseline: float, candidate: float):
+    speedup = baseline / candidate if candidate else float("inf")
+    print(
+        f"{name}: baseline {baseline * 1000:.1f} ms, "
+        f"candidate {candidate * 1000:.1f} ms, speedup {speedup:.2f}x"
+    )
+
+
+def cpu_count() -> int:
+    return os.cpu_count() or 1
@@ -0,0 +1,102 @@
+"""Measure building 2,000 AMD steps with shared templates vs per-step copies.
+
+The baseline swaps the per-step env and pod patch construction back in.
+Steps are spread over native and DinD jobs on four devices; both runs must
+produce the same pipeline.
+"""
+
+import tracemalloc
+from typing import Any, Dict, List
+
+from _common import measure, report
+
+import amd
+import buildkite_step
+
+NUM_STEPS = 2000
+DEVICES = ("mi300_1", "mi325_1", "mi325_4", "mi355_8")
+
+
+def _per_step_env_template(dind: bool, gpu_count: int) -> Dict[str, str]:
+    return amd._get_amd_env(commands="", extra_env=None, dind=dind, gpu_count=gpu_count)
+
+
+def _per_step_native_plugin(gpu_count: int) -> Dict[str, Any]:
+    container_env = {
+        "AMD_CI_RUNTIME": "native",
+        "NATIVE_CI": "true",
+        "VLLM_CI_DOCKER_DISABLED": "1",
+        "VLLM_CI_EXPECTED_GPU_COUNT": str(gpu_count),
+        "VLLM_CI_WORKSPACE": amd.AMD_NATIVE_WORKSPACE,
+        "VLLM_CI_REQUIRE_WORKSPACE_MOUNT": "1",
+        "PYTORCH_ROCM_ARCH": "",
+    }
+    return amd.get_amd_k8s_plugin(
+        image=amd.AMD_NATIVE_BASE_IMAGE,
+        gpu_count=gpu_count,
+        workspace=amd.AMD_NATIVE_WORKSPACE,
+        workspace_volume_name=amd.AMD_NATIVE_WORKSPACE_VOLUME,
+        shm_size=amd.AMD_NATIVE_SHM_SIZE,
+        container_env=container_env,
+    )
+
+
+def _build_steps() -> List[Any]:
+    return [
+        buildkite_step._create_amd_step(
+            label=f"Test {index}",
+            key=f"amd-test-{index}",
+            device=DEVICES[index % len(DEVICES)],
+            num_devices=None,
+            commands_str=f"pytest -v -s tests/test_{index}.py",
+            depends_on=["image-build-amd"],
+            extra_env=None,
+            dind=index % 3 == 0,
+            no_plugin=False,
+            no_gpu=False,
+            num_nodes=None,
+            soft_fail=False,
+            parallelism=None,
+            concurrency=None,
+            concurrency_group=None,
+        )
+        for index in range(NUM_STEPS)
+    ]
+
+
+def _peak_mib() -> float:
+    tracemalloc.start()
+    try:
+        steps = _build_steps()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        del steps
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    shared = (amd._get_amd_env_template, amd._get_amd_native_plugin)
+    per_step = (_per_step_env_template, _per_step_native_plugin)
+    results = {}
+    for name, (env_template, native_plugin) in (
+        ("shared", shared),
+        ("per_step", per_step),
+    ):
+        amd._get_amd_env_template = env_template
+        amd._get_amd_native_plugin = native_plugin
+        dumped = [step.model_dump(exclude_none=True) for step in _build_steps()]
+        seconds = measure(_build_steps, repeat=15)
+        results[name] = (dumped, seconds, _peak_mib())
+    amd._get_amd_env_template, amd._get_amd_native_plugin = shared
+
+    assert results["shared"][0] == results["per_step"][0]
+    report(f"build {NUM_STEPS} AMD steps", results["per_step"][1], results["shared"][1])
+    print(
+        f"tracemalloc peak: per-step {results['per_step'][2]:.2f} MiB, "
+        f"shared {results['shared'][2]:.2f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
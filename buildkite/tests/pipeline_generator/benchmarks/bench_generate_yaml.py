@@ -0,0 +1,45 @@
+"""Measure PipelineGenerator.generate with PyYAML's Python and libyaml codecs."""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+import yaml
+from _common import generate_pipeline, measure, report, write_synthetic_job_tree
+
+from utils_lib import yaml_io
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=300)
+    parser.add_argument("--steps_per_file", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    if not getattr(yaml, "__with_libyaml__", False):
+        raise SystemExit("PyYAML was built without libyaml; nothing to compare.")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "test_areas"
+        write_synthetic_job_tree(root, args.num_files, args.steps_per_file)
+        output = str(Path(tmp) / "pipeline.yaml")
+
+        representers = yaml_io._Dumper.yaml_representers
+
+        def generate_with(loader, dumper):
+            yaml_io.SafeLoader = loader
+            yaml_io._Dumper = type(
+                "_Dumper", (dumper,), {"yaml_representers": representers}
+            )
+            return measure(lambda: generate_pipeline([str(root)], output), args.repeat)
+
+        print(f"{args.num_files * args.steps_per_file} steps")
+        report(
+            "generate",
+            generate_with(yaml.SafeLoader, yaml.SafeDumper),
+            generate_with(yaml.CSafeLoader, yaml.CSafeDumper),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Compare `git add . && git diff` with listing changes without staging."""
+
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from _common import report
+
+from utils_lib import git_utils
+
+
+def _git(repo, *args):
+    subprocess.run(
+        ["git", "-c", "user.name=ci", "-c", "user.email=ci@example.com", *args],
+        cwd=repo,
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def _write_synthetic_repo(root: Path, num_files: int, num_untracked: int) -> str:
+    """A committed tree of `num_files` files plus untracked build output."""
+    _git(root, "init", "-q", "-b", "main")
+    for i in range(num_files):
+        path = root / f"pkg_{i % 200:03d}" / f"module_{i}.py"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(f"VALUE = {i}\n")
+    _git(root, "add", ".")
+    _git(root, "commit", "-q", "-m", "base")
+    base = subprocess.check_output(
+        ["git", "rev-parse", "HEAD"], cwd=root, text=True
+    ).strip()
+    for i in range(0, num_files, 100):
+        (root / f"pkg_{i % 200:03d}" / f"module_{i}.py").write_text("changed\n")
+    _git(root, "commit", "-q", "-am", "branch")
+    # Untracked, non-ignored artifacts that `git add .` has to hash.
+    artifacts = root / "artifacts"
+    artifacts.mkdir()
+    for i in range(num_untracked):
+        (artifacts / f"blob_{i}.bin").write_bytes(os.urandom(64 * 1024))
+    return base
+
+
+def _time_reset(fn, root, repeat):
+    timings = []
+    for _ in range(repeat):
+        _git(root, "reset", "-q")
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=50000)
+    parser.add_argument("--num_untracked", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        base = _write_synthetic_repo(root, args.num_files, args.num_untracked)
+        cwd = os.getcwd()
+        os.chdir(root)
+        try:
+            staged = _time_reset(
+                lambda: git_utils._get_list_file_diff_staged(base), root, args.repeat
+            )
+            worktree = _time_reset(
+                lambda: git_utils.get_file_changes(base, "worktree"),
+                root,
+                args.repeat,
+            )
+            head = _time_reset(
+                lambda: git_utils.get_file_changes(base, "head"), root, args.repeat
+            )
+        finally:
+            os.chdir(cwd)
+        print(f"{args.num_files} files, {args.num_untracked} untracked")
+        report("worktree vs git add", staged, worktree)
+        report("head vs git add", staged, head)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare the serial, process-pool and cached job directory loaders."""
+
+import argparse
+import tempfile
+from pathlib import Path
+
+from _common import (
+    cpu_count,
+    fake_global_config,
+    measure,
+    report,
+    write_synthetic_job_tree,
+)
+
+from step import read_steps_from_job_dirs
+from step_cache import StepCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=3000)
+    parser.add_argument("--steps_per_file", type=int, default=4)
+    parser.add_argument("--num_workers", type=int, default=cpu_count())
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    fake_global_config()
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "test_areas"
+        write_synthetic_job_tree(root, args.num_files, args.steps_per_file)
+        job_dirs = [str(root)]
+
+        serial = read_steps_from_job_dirs(job_dirs, num_workers=1)
+        parallel = read_steps_from_job_dirs(job_dirs, num_workers=args.num_workers)
+        assert [step.model_dump() for step in serial] == [
+            step.model_dump() for step in parallel
+        ], "parallel loader changed the loaded steps"
+
+        print(
+            f"{args.num_files} files, {len(serial)} steps, {args.num_workers} workers"
+        )
+        report(
+            "read_steps_from_job_dirs",
+            measure(lambda: read_steps_from_job_dirs(job_dirs), args.repeat),
+            measure(
+                lambda: read_steps_from_job_dirs(
+                    job_dirs, num_workers=args.num_workers
+                ),
+                args.repeat,
+            ),
+        )
+
+        cache_dir = str(Path(tmp) / "step-cache")
+        read_steps_from_job_dirs(job_dirs, step_cache=StepCache(cache_dir))
+        report(
+            "warm step cache",
+            measure(lambda: read_steps_from_job_dirs(job_dirs), args.repeat),
+            measure(
+                lambda: read_steps_from_job_dirs(
+                    job_dirs, step_cache=StepCache(cache_dir)
+                ),
+                args.repeat,
+            ),
+        )
+
+
+if __name__ == "__main__":
+    main()
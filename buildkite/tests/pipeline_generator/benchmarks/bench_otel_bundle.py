@@ -0,0 +1,51 @@
+"""Compare pipeline size and generation time with inline vs artifact OTel helpers."""
+
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from _common import fake_global_config, report, write_synthetic_job_tree
+
+import buildkite_step
+from buildkite_step import OTEL_BUNDLE_ENV_VAR, convert_group_step_to_buildkite_step
+from pipeline_writer import write_pipeline
+from step import group_steps, read_steps_from_job_dirs
+
+
+def _generate(steps, output_file_path, mode):
+    os.environ[OTEL_BUNDLE_ENV_VAR] = mode
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        groups = convert_group_step_to_buildkite_step(group_steps(steps))
+    write_pipeline(groups, output_file_path)
+    elapsed = time.perf_counter() - start
+    size = Path(output_file_path).stat().st_size
+    print(f"{mode}: {elapsed * 1000:.1f} ms, pipeline {size / 2**20:.2f} MiB")
+    return elapsed, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=300)
+    parser.add_argument("--steps_per_file", type=int, default=4)
+    args = parser.parse_args()
+
+    # Only trusted main-branch builds are traced.
+    fake_global_config(branch="main")
+    buildkite_step.get_ecr_cache_registry = lambda: ("cache-from", "cache-to")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "test_areas"
+        write_synthetic_job_tree(root, args.num_files, args.steps_per_file)
+        steps = read_steps_from_job_dirs([str(root)])
+        output = str(Path(tmp) / "pipeline.yaml")
+        inline_time, inline_size = _generate(steps, output, "inline")
+        artifact_time, artifact_size = _generate(steps, output, "artifact")
+        report("generate + write", inline_time, artifact_time)
+        print(f"pipeline size: {inline_size / artifact_size:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
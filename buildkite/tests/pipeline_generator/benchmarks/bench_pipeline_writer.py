@@ -0,0 +1,89 @@
+"""Compare peak memory and time of one-document, streamed YAML and JSON output.
+
+The last two runs include conversion: every group converted before the
+write, and groups converted as the writer consumes them.
+"""
+
+import argparse
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from _common import fake_global_config, write_synthetic_job_tree
+
+from buildkite_step import (
+    convert_group_step_to_buildkite_step,
+    iter_buildkite_group_steps,
+)
+from pipeline_writer import write_pipeline
+from step import group_steps, read_steps_from_job_dirs
+from utils_lib import yaml_io
+
+
+def _write_single_document(group_steps, output_file_path, output_format):
+    with open(output_file_path, "w") as f:
+        yaml_io.dump(
+            {"steps": [group.model_dump(exclude_none=True) for group in group_steps]},
+            f,
+            sort_keys=False,
+            default_flow_style=False,
+        )
+
+
+def _profile(name, writer, group_steps, output_file_path, output_format="yaml"):
+    tracemalloc.start()
+    start = time.perf_counter()
+    writer(group_steps, output_file_path, output_format)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = Path(output_file_path).stat().st_size
+    print(
+        f"{name}: {elapsed * 1000:.1f} ms, peak {peak / 2**20:.1f} MiB, "
+        f"output {size / 2**20:.1f} MiB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=300)
+    parser.add_argument("--steps_per_file", type=int, default=4)
+    args = parser.parse_args()
+
+    # Trusted main-branch builds inline the OTel bundle into every step.
+    fake_global_config(branch="main")
+    import buildkite_step
+
+    buildkite_step.get_ecr_cache_registry = lambda: ("cache-from", "cache-to")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "test_areas"
+        write_synthetic_job_tree(root, args.num_files, args.steps_per_file)
+        grouped_steps = group_steps(read_steps_from_job_dirs([str(root)]))
+        groups = convert_group_step_to_buildkite_step(grouped_steps)
+        output = str(Path(tmp) / "pipeline")
+        _profile("single document", _write_single_document, groups, output)
+        _profile("streamed yaml", write_pipeline, groups, output)
+        _profile("streamed json", write_pipeline, groups, output, "json")
+        _profile(
+            "convert, then json",
+            lambda steps, path, output_format: write_pipeline(
+                convert_group_step_to_buildkite_step(steps), path, output_format
+            ),
+            grouped_steps,
+            output,
+            "json",
+        )
+        _profile(
+            "convert while writing json",
+            lambda steps, path, output_format: write_pipeline(
+                iter_buildkite_group_steps(steps), path, output_format
+            ),
+            grouped_steps,
+            output,
+            "json",
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measure building plugins for 1,000 steps with memoized vs per-step copies.
+
+Steps are spread over eight devices, five docker and three Kubernetes, with
+varying GPU counts. The baseline calls the uncached builders without
+freezing, which is the per-step deepcopy the factories replaced. Both runs
+must produce the same plugins.
+"""
+
+import tracemalloc
+from typing import Any, List
+
+from _common import fake_global_config, measure, report
+
+from plugin import docker_plugin, k8s_plugin
+from step import Step
+from utils_lib.frozen import freeze
+
+NUM_STEPS = 1000
+IMAGE = "public.ecr.aws/q9t5s3a7/vllm-ci-test-repo:" + "0" * 40
+DOCKER_DEVICES = ("h200_18gb", "h200_35gb", "h200", "b200", "cpu")
+K8S_DEVICES = ("h100", "a100", "b200-k8s")
+DEVICES = DOCKER_DEVICES + K8S_DEVICES
+
+
+def _steps() -> List[Step]:
+    return [
+        Step(
+            label=f"Test {index}",
+            key=f"test-{index}",
+            device=DEVICES[index % len(DEVICES)],
+            num_devices=2 ** (index % 4),
+            mount_buildkite_agent=index % 5 == 0,
+        )
+        for index in range(NUM_STEPS)
+    ]
+
+
+def _build_plugins(steps: List[Step]) -> List[Any]:
+    return [
+        (
+            k8s_plugin.get_k8s_plugin(step, IMAGE)
+            if step.device in K8S_DEVICES
+            else docker_plugin.get_docker_plugin(step, IMAGE)
+        )
+        for step in steps
+    ]
+
+
+def _peak_mib(steps: List[Step]) -> float:
+    tracemalloc.start()
+    try:
+        plugins = _build_plugins(steps)
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        del plugins
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    fake_global_config()
+    steps = _steps()
+    memoized = (
+        docker_plugin._build_docker_plugin,
+        k8s_plugin._build_k8s_plugin,
+        freeze,
+    )
+    # The baseline hands out a fresh mutable copy per step, as before.
+    per_step = (
+        docker_plugin._build_docker_plugin.__wrapped__,
+        k8s_plugin._build_k8s_plugin.__wrapped__,
+        lambda value: value,
+    )
+    results = {}
+    for name, (docker_builder, k8s_builder, freezer) in (
+        ("memoized", memoized),
+        ("per_step", per_step),
+    ):
+        docker_plugin._build_docker_plugin = docker_builder
+        k8s_plugin._build_k8s_plugin = k8s_builder
+        docker_plugin.freeze = k8s_plugin.freeze = freezer
+        plugins = _build_plugins(steps)
+        seconds = measure(lambda: _build_plugins(steps), repeat=15)
+        results[name] = (plugins, seconds, _peak_mib(steps))
+    docker_plugin._build_docker_plugin, k8s_plugin._build_k8s_plugin, _ = memoized
+    docker_plugin.freeze = k8s_plugin.freeze = freeze
+
+    assert results["memoized"][0] == results["per_step"][0]
+    report(
+        f"plugins for {NUM_STEPS} steps", results["per_step"][1], results["memoized"][1]
+    )
+    print(
+        f"tracemalloc peak: per-step {results['per_step'][2]:.2f} MiB, "
+        f"memoized {results['memoized'][2]:.2f} MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
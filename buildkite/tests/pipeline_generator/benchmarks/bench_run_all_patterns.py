@@ -0,0 +1,85 @@
+"""Compare the per-pattern run-all loop with the compiled pattern sets."""
+
+import argparse
+import re
+
+from _common import measure, report
+
+from global_config import _find_run_all_trigger
+
+RUN_ALL_PATTERNS = [
+    "docker/Dockerfile",
+    "CMakeLists.txt",
+    "requirements/common.txt",
+    "requirements/cuda.txt",
+    "requirements/build.txt",
+    "requirements/test.txt",
+    "setup.py",
+    "csrc/",
+    "cmake/",
+]
+RUN_ALL_EXCLUDE_PATTERNS = [
+    "docker/Dockerfile.",
+    "csrc/cpu",
+    "csrc/rocm",
+    "cmake/hipify.py",
+    "cmake/cpu_extension.cmake",
+]
+
+
+def _sequential(list_file_diff, run_all_patterns, run_all_exclude_patterns):
+    """The run-all loop before pattern sets, kept as the baseline."""
+    for file in list_file_diff:
+        pattern_matched = False
+        for pattern in run_all_patterns:
+            if re.match(pattern, file):
+                pattern_matched = True
+                break
+        if pattern_matched:
+            match_ignore = False
+            for exclude_pattern in run_all_exclude_patterns:
+                if re.match(exclude_pattern, file):
+                    match_ignore = True
+                    break
+            if not match_ignore:
+                return True
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Nothing triggers, so both sides scan the whole diff; csrc/rocm files
+    # also exercise the exclude patterns.
+    list_file_diff = [
+        f"csrc/rocm/kernel_{i}.cu" if i % 5 == 0 else f"vllm/area_{i % 97}/m_{i}.py"
+        for i in range(args.num_files)
+    ]
+    assert not _sequential(list_file_diff, RUN_ALL_PATTERNS, RUN_ALL_EXCLUDE_PATTERNS)
+    assert not _find_run_all_trigger(
+        list_file_diff, RUN_ALL_PATTERNS, RUN_ALL_EXCLUDE_PATTERNS
+    )
+
+    print(f"{args.num_files} changed files")
+    report(
+        "should run all",
+        measure(
+            lambda: _sequential(
+                list_file_diff, RUN_ALL_PATTERNS, RUN_ALL_EXCLUDE_PATTERNS
+            ),
+            args.repeat,
+        ),
+        measure(
+            lambda: _find_run_all_trigger(
+                list_file_diff, RUN_ALL_PATTERNS, RUN_ALL_EXCLUDE_PATTERNS
+            ),
+            args.repeat,
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
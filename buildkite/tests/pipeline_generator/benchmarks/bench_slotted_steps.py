@@ -0,0 +1,140 @@
+"""Measure converting a 2,000-step pipeline with slotted vs pydantic step models.
+
+The baseline swaps the pydantic models that `buildkite_step` used before
+back in. Every step is mirrored to AMD, so each job-dir step converts to
+two command steps. Both runs must produce the same pipeline.
+"""
+
+import contextlib
+import os
+import tempfile
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from _common import fake_global_config, measure, report, write_synthetic_job_tree
+from pydantic import BaseModel
+
+import buildkite_step
+from step import group_steps, read_steps_from_job_dirs
+
+NUM_FILES = 500
+STEPS_PER_FILE = 4
+
+
+class PydanticCommandStep(BaseModel):
+    label: str
+    group: Optional[str] = None
+    key: str
+    agents: Dict[str, str] = {}
+    commands: List[str] = []
+    depends_on: Optional[List[str]] = None
+    soft_fail: Optional[bool] = False
+    retry: Optional[Dict[str, Any]] = None
+    plugins: Optional[List[Dict[str, Any]]] = None
+    env: Optional[Dict[str, str]] = None
+    artifact_paths: Optional[List[str]] = None
+    parallelism: Optional[int] = None
+    concurrency: Optional[int] = None
+    concurrency_group: Optional[str] = None
+    timeout_in_minutes: Optional[int] = None
+    priority: Optional[int] = None
+
+
+class PydanticBlockStep(BaseModel):
+    block: str
+    depends_on: Optional[Union[str, List[str]]] = None
+    key: str
+
+
+class PydanticGroupStep(BaseModel):
+    group: str
+    steps: List[Union[PydanticCommandStep, PydanticBlockStep]]
+
+
+AMD_MIRROR = """\
+  mirror:
+    amd:
+      device: mi325_1
+      depends_on:
+      - image-build-amd
+"""
+
+
+def _write_mirrored_job_tree(root: Path):
+    for path in write_synthetic_job_tree(root, NUM_FILES, STEPS_PER_FILE):
+        header, *steps = path.read_text().split("- label:")
+        path.write_text(header + "".join(f"- label:{s}{AMD_MIRROR}" for s in steps))
+
+
+def _use_models(command_cls, block_cls, group_cls):
+    buildkite_step.BuildkiteCommandStep = command_cls
+    buildkite_step.BuildkiteBlockStep = block_cls
+    buildkite_step.BuildkiteGroupStep = group_cls
+
+
+def _convert(grouped_steps):
+    return buildkite_step.convert_group_step_to_buildkite_step(grouped_steps)
+
+
+def _convert_and_dump(grouped_steps) -> List[Dict[str, Any]]:
+    return [group.model_dump(exclude_none=True) for group in _convert(grouped_steps)]
+
+
+def _traced(fn):
+    """Peak traced MiB and allocated blocks still held by `fn`'s result."""
+    tracemalloc.start()
+    try:
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        blocks = sum(
+            stat.count for stat in tracemalloc.take_snapshot().statistics("filename")
+        )
+        del result
+        return peak / 2**20, current / 2**20, blocks
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    slotted = (
+        buildkite_step.BuildkiteCommandStep,
+        buildkite_step.BuildkiteBlockStep,
+        buildkite_step.BuildkiteGroupStep,
+    )
+    pydantic = (PydanticCommandStep, PydanticBlockStep, PydanticGroupStep)
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_mirrored_job_tree(Path(tmp))
+        fake_global_config(branch="main", run_all=True)
+        buildkite_step.get_ecr_cache_registry = lambda: ("cache-from", "cache-to")
+        grouped_steps = group_steps(read_steps_from_job_dirs([tmp]))
+
+    results = {}
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, models in (("slotted", slotted), ("pydantic", pydantic)):
+            _use_models(*models)
+            dumped = _convert_and_dump(grouped_steps)
+            convert = measure(lambda: _convert(grouped_steps), repeat=15)
+            total = measure(lambda: _convert_and_dump(grouped_steps), repeat=15)
+            memory = _traced(lambda: _convert(grouped_steps))
+            results[name] = (dumped, convert, total, memory)
+    _use_models(*slotted)
+
+    assert results["pydantic"][0] == results["slotted"][0]
+    num_steps = NUM_FILES * STEPS_PER_FILE
+    report(
+        f"convert {num_steps} steps",
+        results["pydantic"][1],
+        results["slotted"][1],
+    )
+    report("convert, then dump", results["pydantic"][2], results["slotted"][2])
+    for name in ("pydantic", "slotted"):
+        peak, held, blocks = results[name][3]
+        print(
+            f"tracemalloc {name}: peak {peak:.2f} MiB, "
+            f"held by the steps {held:.2f} MiB in {blocks} blocks"
+        )
+
+
+if __name__ == "__main__":
+    main()
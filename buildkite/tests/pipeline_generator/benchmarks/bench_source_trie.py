@@ -0,0 +1,61 @@
+"""Compare per-step source dependency matching with the compiled prefix trie."""
+
+import argparse
+import random
+
+from _common import measure, report
+
+from buildkite_step import _source_file_dependencies_match
+from utils_lib.source_trie import SourceDependencyTrie
+
+
+def _synthetic_inputs(num_files, num_steps, seed=0):
+    rng = random.Random(seed)
+    areas = [f"vllm/area_{i:03d}" for i in range(100)]
+    list_file_diff = [
+        f"{rng.choice(areas)}/sub_{rng.randrange(20)}/file_{i}.py"
+        for i in range(num_files)
+    ]
+    dependency_lists = []
+    for i in range(num_steps):
+        deps = [f"tests/step_{i}/"]
+        deps += [f"{area}/sub_{rng.randrange(20)}/" for area in rng.sample(areas, 4)]
+        if i % 10 == 0:
+            deps += ["vllm/", f"!{rng.choice(areas)}/"]
+        dependency_lists.append(deps)
+    return dependency_lists, list_file_diff
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=5000)
+    parser.add_argument("--num_steps", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    dependency_lists, list_file_diff = _synthetic_inputs(args.num_files, args.num_steps)
+
+    def linear():
+        return [
+            _source_file_dependencies_match(deps, list_file_diff)
+            for deps in dependency_lists
+        ]
+
+    def trie():
+        triggered = SourceDependencyTrie(dependency_lists).triggered(list_file_diff)
+        return [
+            _source_file_dependencies_match(deps, list_file_diff, triggered)
+            for deps in dependency_lists
+        ]
+
+    assert linear() == trie()
+    print(f"{args.num_files} changed files x {args.num_steps} steps")
+    report(
+        "select steps",
+        measure(linear, args.repeat),
+        measure(trie, args.repeat),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Compare per-variable re.sub injection with the precompiled single pass."""
+
+import argparse
+import re
+
+from _common import fake_global_config, measure, report
+
+import buildkite_step
+from utils_lib.variable_injector import VariableInjector
+
+
+def _inject_sequentially(variables_to_inject, commands):
+    """The per-variable substitution used before VariableInjector."""
+    final_commands = []
+    for command in commands:
+        for variable, value in variables_to_inject.items():
+            if not value:
+                continue
+            command = re.sub(re.escape(variable) + r"\b", value, command)
+        final_commands.append(command)
+    return final_commands
+
+
+def _inject_single_pass(variables_to_inject, commands):
+    injector = VariableInjector(variables_to_inject)
+    return [injector.inject(command) for command in commands]
+
+
+def _synthetic_commands(num_steps):
+    commands = []
+    for i in range(num_steps):
+        commands.extend(
+            [
+                "nvidia-smi",
+                f"cd /vllm-workspace/tests/area_{i % 40}",
+                (
+                    f"pytest -v -s area_{i}/test_a.py \\\n"
+                    f"  --junitxml=/tmp/{i}.xml \\\n"
+                    "  -k 'not slow' && echo $BUILDKITE_COMMIT"
+                ),
+                (
+                    "docker pull $IMAGE_TAG || docker pull $IMAGE_TAG_LATEST\n"
+                    f"echo $REGISTRY/$REPO:$BRANCH step {i}"
+                ),
+            ]
+        )
+    return commands
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_steps", type=int, default=800)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    fake_global_config(branch="main")
+    buildkite_step.get_ecr_cache_registry = lambda: ("cache-from", "cache-to")
+    variables_to_inject = buildkite_step._get_variables_to_inject()
+    commands = _synthetic_commands(args.num_steps)
+    assert _inject_sequentially(variables_to_inject, commands) == (
+        _inject_single_pass(variables_to_inject, commands)
+    )
+
+    print(f"{args.num_steps} steps, {len(commands)} commands")
+    report(
+        "inject variables",
+        measure(
+            lambda: _inject_sequentially(variables_to_inject, commands), args.repeat
+        ),
+        measure(
+            lambda: _inject_single_pass(variables_to_inject, commands), args.repeat
+        ),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Compare the size and parse time of plain YAML and YAML anchor output.
+
+`buildkite-agent pipeline upload` sends the file as is and the server parses
+it, so upload time follows the byte count (also shown gzipped) and the
+parse time. Half of the steps are mirrored to AMD so both docker and
+Kubernetes plugin blocks repeat. Both files must load to the same data.
+"""
+
+import argparse
+import gzip
+import tempfile
+from pathlib import Path
+
+from _common import fake_global_config, measure, report, write_synthetic_job_tree
+
+from buildkite_step import convert_group_step_to_buildkite_step
+from pipeline_writer import write_pipeline
+from step import group_steps, read_steps_from_job_dirs
+from utils_lib import yaml_io
+
+AMD_MIRROR = """\
+  mirror:
+    amd:
+      device: mi325_1
+      depends_on:
+      - image-build-amd
+"""
+
+
+def _add_amd_mirrors(paths):
+    for path in paths[::2]:
+        lines = path.read_text().splitlines(keepends=True)
+        out = []
+        for line in lines:
+            out.append(line)
+            if line.startswith("  timeout_in_minutes:"):
+                out.append(AMD_MIRROR)
+        path.write_text("".join(out))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--num_files", type=int, default=300)
+    parser.add_argument("--steps_per_file", type=int, default=4)
+    args = parser.parse_args()
+
+    fake_global_config()
+    import buildkite_step
+
+    buildkite_step.get_ecr_cache_registry = lambda: ("cache-from", "cache-to")
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp) / "test_areas"
+        _add_amd_mirrors(
+            write_synthetic_job_tree(root, args.num_files, args.steps_per_file)
+        )
+        groups = convert_group_step_to_buildkite_step(
+            group_steps(read_steps_from_job_dirs([str(root)]))
+        )
+        outputs = {}
+        write_seconds = {}
+        for output_format in ("yaml", "yaml_anchors"):
+            path = Path(tmp) / f"pipeline.{output_format}"
+            write_seconds[output_format] = measure(
+                lambda: write_pipeline(groups, str(path), output_format), repeat=3
+            )
+            outputs[output_format] = path.read_text()
+
+    plain, anchored = outputs["yaml"], outputs["yaml_anchors"]
+    assert yaml_io.safe_load(plain) == yaml_io.safe_load(anchored)
+    for name, text in outputs.items():
+        data = text.encode()
+        print(
+            f"{name}: {len(data) / 2**20:.2f} MiB, "
+            f"gzipped {len(gzip.compress(data)) / 2**10:.0f} KiB"
+        )
+    print(f"byte reduction: {len(plain) / len(anchored):.2f}x")
+    report("write", write_seconds["yaml"], write_seconds["yaml_anchors"])
+    report(
+        "parse",
+        measure(lambda: yaml_io.safe_load(plain), repeat=3),
+        measure(lambda: yaml_io.safe_load(anchored), repeat=3),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,7 @@ import pytest
 
 import buildkite_step
 import step as step_module
+from buildkite_step import BuildkiteCommandStep
 
 
 @pytest.fixture
@@ -45,3 +46,17 @@ def fake_global_config(monkeypatch):
         lambda: "torch-nightly-image",
     )
     return config
+
+
+@pytest.fixture
+def command_step():
+    """Factory for keyed command steps: `command_step("b", "a")` depends on a."""
+
+    def make(key, *depends_on, queue=None, **kwargs):
+        if queue is not None:
+            kwargs["agents"] = {"queue": queue}
+        return BuildkiteCommandStep(
+            label=key.title(), key=key, depends_on=list(depends_on) or None, **kwargs
+        )
+
+    return make
@@ -174,6 +174,32 @@ def test_direct_amd_gpu_steps_use_dind_flag(device, queue, dind, expected_gpu_co
     assert "CUDA_ENABLE_COREDUMP_ON_EXCEPTION" not in test_commands
 
 
+def test_amd_steps_share_frozen_templates():
+    options = [
+        amd.build_amd_step_options(
+            label=f"Test {index}",
+            device="mi325_1",
+            num_devices=None,
+            commands=f"pytest tests/test_{index}.py",
+            depends_on=None,
+            extra_env=None,
+            dind=False,
+            no_plugin=False,
+            no_gpu=False,
+            num_nodes=None,
+            agent_tags=None,
+        )
+        for index in range(2)
+    ]
+
+    assert options[0]["plugins"][0] is options[1]["plugins"][0]
+    assert options[0]["env"] is not options[1]["env"]
+    assert options[1]["env"]["VLLM_TEST_COMMANDS"] == "pytest tests/test_1.py"
+    pod_patch = options[0]["plugins"][0]["kubernetes"]["podSpecPatch"]
+    with pytest.raises(TypeError, match="shared"):
+        pod_patch["containers"].append({})
+
+
 def test_amd_device_rejects_conflicting_gpu_count():
     step = Step(
         label="AMD GPU count mismatch",
@@ -267,6 +293,47 @@ def test_amd_mirror_uses_shared_gating_with_amd_dependency_fallback(
     assert "ROCm debug agent disabled" in (amd_command_step.env["VLLM_TEST_COMMANDS"])
 
 
+def test_groups_are_converted_as_they_are_consumed(fake_global_config, monkeypatch):
+    fake_global_config["list_file_diff"] = ["vllm/foo.py"]
+
+    def mirrored(group, key):
+        return Step(
+            label=key,
+            group=group,
+            key=key,
+            commands=["pytest tests/mirror.py"],
+            source_file_dependencies=["vllm/"],
+            mirror={"amd": {"device": "mi325_1"}},
+        )
+
+    groups = buildkite_step.iter_buildkite_group_steps(
+        {
+            "Z Tests": [mirrored("Z Tests", "z-test")],
+            "A Tests": [mirrored("A Tests", "a-test")],
+        }
+    )
+    converted = []
+    original = buildkite_step._convert_command_steps
+
+    def record(steps, *args):
+        converted.append(steps[0].group)
+        return original(steps, *args)
+
+    monkeypatch.setattr(buildkite_step, "_convert_command_steps", record)
+    first = next(groups)
+    assert first.group == "A Tests"
+    assert converted == ["A Tests"]
+
+    amd_group = next(groups)
+    assert amd_group.group == "Hardware-AMD Tests"
+    # The AMD group keeps the job file order; Z Tests waits its turn.
+    assert [s.key for s in amd_group.steps] == ["amd-z-test", "amd-a-test"]
+    assert converted == ["A Tests"]
+
+    assert [group.group for group in groups] == ["Z Tests"]
+    assert converted == ["A Tests", "Z Tests"]
+
+
 @pytest.mark.parametrize("optional", [False, True])
 def test_rocm_base_change_runs_only_amd_mirror(fake_global_config, optional):
     fake_global_config["list_file_diff"] = [amd.AMD_ROCM_BASE_DOCKERFILE]
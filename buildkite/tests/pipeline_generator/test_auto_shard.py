@@ -0,0 +1,174 @@
+import json
+import subprocess
+
+import pytest
+
+import buildkite_step
+from auto_shard import (
+    MAX_SHARDS,
+    auto_shard_steps,
+    balance_shards,
+    load_test_timings,
+    shard_count,
+)
+from step import Step
+
+pytestmark = pytest.mark.usefixtures("fake_global_config")
+
+TIMINGS = {
+    "models/test_llama.py": 1500,
+    "models/test_qwen.py": 1200,
+    "models/test_mistral.py": 900,
+    "models/test_gemma.py": 600,
+    "models/test_phi.py": 300,
+    "models/test_opt.py": 300,
+    "models/test_tiny.py": 60,
+}
+
+
+def _sharded_step(**kwargs):
+    return Step(
+        label="Models Test",
+        group="Models",
+        key="models",
+        commands=["pytest -v -s $${VLLM_TEST_SHARD_ARGS:-models/}"],
+        **kwargs,
+    )
+
+
+def test_shards_balance_duration_not_count():
+    shards = balance_shards(TIMINGS, 3)
+
+    loads = [sum(TIMINGS[test] for test in shard) for shard in shards]
+    assert loads == [1800, 1560, 1500]
+    assert sorted(test for shard in shards for test in shard) == sorted(TIMINGS)
+    # Splitting by count would put llama, qwen and mistral in the first 3.
+    assert shards[0] == ["models/test_llama.py", "models/test_phi.py"]
+
+
+def test_shard_count_follows_target_duration():
+    assert shard_count(TIMINGS, 30 * 60) == 3
+    assert shard_count(TIMINGS, 120 * 60) == 1
+    # Never more jobs than tests, or than MAX_SHARDS.
+    assert shard_count(TIMINGS, 1) == len(TIMINGS)
+    assert shard_count({f"t{i}": 60 for i in range(100)}, 1) == MAX_SHARDS
+
+
+def test_only_opted_in_steps_without_parallelism_are_sharded():
+    opted_in = _sharded_step()
+    hand_tuned = _sharded_step(parallelism=2)
+    hand_tuned.key = "hand-tuned"
+    not_opted_in = Step(label="Plain", key="plain", commands=["pytest models/"])
+    timings = {"models": TIMINGS, "hand-tuned": TIMINGS, "plain": TIMINGS}
+
+    shards = auto_shard_steps(
+        [opted_in, hand_tuned, not_opted_in], timings, target_seconds=30 * 60
+    )
+
+    assert list(shards) == ["models"]
+    assert opted_in.parallelism == 3
+    assert len(opted_in.commands) == 2
+    assert hand_tuned.parallelism == 2
+    assert not_opted_in.parallelism is None
+    assert not_opted_in.commands == ["pytest models/"]
+
+
+@pytest.mark.parametrize("job", [0, 1, 2])
+def test_each_parallel_job_runs_its_shard(job):
+    step = _sharded_step()
+    shards = auto_shard_steps([step], {"models": TIMINGS}, target_seconds=30 * 60)
+
+    commands = buildkite_step._prepare_commands(
+        step, variables_to_inject={}, setup_profile="none"
+    )
+    # What the agent runs after `pipeline upload` unescapes `$$`.
+    script = (
+        " && ".join(commands)
+        .replace("$$", "$")
+        .replace("pytest -v -s", "printf '%s\\n'")
+    )
+    result = subprocess.run(
+        ["sh", "-c", script],
+        env={"BUILDKITE_PARALLEL_JOB": str(job), "PATH": "/usr/bin:/bin"},
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    tests = shards["models"][job]
+    assert result.stdout.split()[-len(tests) :] == tests
+
+
+def test_unknown_parallel_job_fails():
+    step = _sharded_step()
+    auto_shard_steps([step], {"models": TIMINGS}, target_seconds=30 * 60)
+
+    result = subprocess.run(
+        ["sh", "-c", step.commands[0].replace("$$", "$")],
+        env={"BUILDKITE_PARALLEL_JOB": "7"},
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 1
+    assert "No test shard 7" in result.stderr
+
+
+def test_shard_args_are_quoted_for_shell_and_upload():
+    step = _sharded_step()
+    timings = {'test_a.py::test[a b"c$HOME`x`]': 100, "test_b.py": 100}
+    auto_shard_steps([step], {"models": timings}, target_seconds=100)
+
+    script = step.commands[0].replace("$$", "$") + '; echo "$VLLM_TEST_SHARD_ARGS"'
+    result = subprocess.run(
+        ["sh", "-c", script],
+        env={"BUILDKITE_PARALLEL_JOB": "0", "HOME": "/home"},
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.stdout == 'test_a.py::test[a b"c$HOME`x`]\n'
+
+
+@pytest.mark.parametrize("num_nodes", [None, 2])
+def test_single_quotes_survive_command_preparation(num_nodes):
+    # Commands of single-node steps have every `'` rewritten to `"`.
+    step = _sharded_step(num_nodes=num_nodes, num_devices=num_nodes)
+    timings = {"test_a.py::test[it's]": 200, "test_b.py": 100}
+    auto_shard_steps([step], {"models": timings}, target_seconds=200)
+
+    commands = buildkite_step._prepare_commands(
+        step, variables_to_inject={}, setup_profile="none"
+    )
+    script = next(command for command in commands if command.startswith("case"))
+    result = subprocess.run(
+        ["sh", "-c", script.replace("$$", "$") + '; echo "$VLLM_TEST_SHARD_ARGS"'],
+        env={"BUILDKITE_PARALLEL_JOB": "0", "PATH": "/usr/bin:/bin"},
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.stdout == "test_a.py::test[it's]\n"
+
+
+def test_load_timings_from_json_and_csv(tmp_path):
+    json_path = tmp_path / "timings.json"
+    json_path.write_text(json.dumps({"models": {"a.py": [10, 30, 20], "b.py": 5}}))
+    csv_path = tmp_path / "timings.csv"
+    csv_path.write_text(
+        "step_key,test,duration_seconds\n"
+        "models,a.py,10\nmodels,a.py,30\nmodels,b.py,5\n"
+    )
+
+    assert load_test_timings(str(json_path)) == {"models": {"a.py": 20, "b.py": 5}}
+    assert load_test_timings(str(csv_path)) == {"models": {"a.py": 20, "b.py": 5}}
+
+
+def test_timings_reject_unknown_layouts(tmp_path):
+    path = tmp_path / "timings.json"
+    path.write_text(json.dumps({"models": 10}))
+
+    with pytest.raises(ValueError, match="must map step keys"):
+        load_test_timings(str(path))
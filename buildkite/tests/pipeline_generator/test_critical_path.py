@@ -0,0 +1,147 @@
+import json
+
+import pytest
+
+from buildkite_step import BuildkiteBlockStep, BuildkiteGroupStep
+from critical_path import (
+    analyze_critical_path,
+    assign_priorities,
+    load_step_durations,
+)
+
+
+@pytest.fixture
+def pipeline(command_step):
+    return [
+        BuildkiteGroupStep(group="Pre-commit", steps=[command_step("pre-commit")]),
+        BuildkiteGroupStep(
+            group="Tests",
+            steps=[
+                command_step("unit", "image-build", "pre-commit"),
+                command_step("kernels", "image-build", "pre-commit"),
+                BuildkiteBlockStep(
+                    block="Run Multi-node", depends_on=[], key="block-multi-node"
+                ),
+                command_step("multi-node", "block-multi-node", "image-build"),
+                command_step("report", "unit"),
+            ],
+        ),
+    ]
+
+
+DURATIONS = {
+    "image-build": 1200,
+    "pre-commit": 300,
+    "unit": 900,
+    "kernels": 3000,
+    "multi-node": 600,
+    "report": 60,
+}
+
+
+def test_earliest_finish_and_critical_path(pipeline):
+    report = analyze_critical_path(pipeline, DURATIONS)
+
+    assert report.earliest_finish == 4200
+    assert report.critical_path == ["image-build", "kernels"]
+    assert report.earliest_start["unit"] == 1200
+    assert report.slack["kernels"] == 0
+    assert report.slack["unit"] == 4200 - 60 - 2100
+    assert report.slack["report"] == 4200 - 2160
+    assert report.slack["pre-commit"] == 1200 - 300
+    assert report.gated == ["block-multi-node", "multi-node"]
+    assert "multi-node" not in report.slack
+
+
+def test_recommendations(pipeline):
+    report = analyze_critical_path(pipeline, DURATIONS)
+
+    assert report.split == ["kernels"]
+    assert report.prioritize == []
+    assert "Split: Kernels (50.0 min, 71% of the critical path)" in report.format()
+
+    pipeline[1].steps[1].parallelism = 4
+    report = analyze_critical_path(pipeline, DURATIONS)
+    assert report.split == []
+    assert report.prioritize == ["kernels"]
+
+
+def test_missing_durations_count_as_zero(pipeline):
+    report = analyze_critical_path(pipeline, {"kernels": 60})
+
+    assert report.earliest_finish == 60
+    assert report.critical_path == ["kernels"]
+    assert report.missing_durations == ["pre-commit", "unit", "report"]
+    assert "3 steps have no recorded duration" in report.format()
+
+
+def test_steps_behind_a_block_are_left_out(command_step):
+    pipeline = [
+        BuildkiteGroupStep(
+            group="Tests",
+            steps=[
+                command_step("build"),
+                BuildkiteBlockStep(
+                    block="Run Slow", depends_on=["build"], key="block-slow"
+                ),
+                command_step("slow", "block-slow"),
+                command_step("report", "slow"),
+                command_step("fast", "build"),
+            ],
+        )
+    ]
+    report = analyze_critical_path(
+        pipeline, {"build": 600, "slow": 7200, "report": 60, "fast": 300}
+    )
+
+    assert report.earliest_finish == 900
+    assert report.critical_path == ["build", "fast"]
+    assert report.gated == ["block-slow", "slow", "report"]
+    assert "3 steps wait on a block step and are left out." in report.format()
+
+    assign_priorities(pipeline, report)
+    priorities = {
+        step.key: getattr(step, "priority", None) for step in pipeline[0].steps
+    }
+    assert priorities == {
+        "build": 99,
+        "block-slow": None,
+        "slow": None,
+        "report": None,
+        "fast": 33,
+    }
+
+
+def test_cycles_are_rejected(command_step):
+    pipeline = [
+        BuildkiteGroupStep(
+            group="g", steps=[command_step("a", "b"), command_step("b", "a")]
+        )
+    ]
+
+    with pytest.raises(ValueError, match="dependency cycle"):
+        analyze_critical_path(pipeline, {})
+
+
+def test_load_durations_from_json_and_csv(tmp_path):
+    json_path = tmp_path / "durations.json"
+    json_path.write_text(json.dumps({"unit": [100, 300, 200], "kernels": 60}))
+    csv_path = tmp_path / "durations.csv"
+    csv_path.write_text(
+        "key,duration_seconds,build\nunit,100,1\nunit,400,2\nkernels,60,1\n"
+    )
+
+    assert load_step_durations(str(json_path)) == {"unit": 200, "kernels": 60}
+    assert load_step_durations(str(csv_path)) == {"unit": 250, "kernels": 60}
+
+
+def test_load_durations_rejects_unknown_layouts(tmp_path):
+    csv_path = tmp_path / "durations.csv"
+    csv_path.write_text("step,seconds\nunit,100\n")
+    json_path = tmp_path / "durations.json"
+    json_path.write_text("[1, 2]")
+
+    with pytest.raises(ValueError, match="'key' and 'duration_seconds'"):
+        load_step_durations(str(csv_path))
+    with pytest.raises(ValueError, match="must map step keys"):
+        load_step_durations(str(json_path))
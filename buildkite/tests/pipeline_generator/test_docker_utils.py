@@ -1,4 +1,10 @@
+import threading
+
+import pytest
+
 import utils_lib.docker_utils as docker_utils
+from utils_lib.cache_utils import CACHE_DIR_ENV_VAR
+from utils_lib.registry_client import ManifestCache, RegistryClient, first_existing_tag
 
 
 def _cfg(**overrides):
@@ -38,3 +44,105 @@ def test_get_image_uses_torch_nightly_tag(monkeypatch):
         docker_utils.get_image(cpu=True)
         == "example.com/vllm/vllm-ci-postmerge-repo:$BUILDKITE_COMMIT-torch-nightly-cpu"
     )
+
+
+class FakeRegistry(RegistryClient):
+    """In-memory registry that blocks each probe until all have started."""
+
+    def __init__(self, existing, concurrent_probes=1):
+        self.existing = set(existing)
+        self.logins = []
+        self.probes = []
+        self._barrier = threading.Barrier(concurrent_probes, timeout=5)
+
+    def login(self, registry):
+        self.logins.append(registry)
+
+    def manifest_exists(self, image_tag):
+        self.probes.append(image_tag)
+        self._barrier.wait()
+        return image_tag in self.existing
+
+
+def test_registry_clients_must_implement_every_operation():
+    class LoginOnly(RegistryClient):
+        def login(self, registry):
+            pass
+
+    with pytest.raises(TypeError, match="manifest_exists"):
+        LoginOnly()
+
+
+TEST_CACHE = f"{docker_utils.ECR_REGISTRY}/vllm-ci-test-cache"
+POSTMERGE_CACHE = f"{docker_utils.ECR_REGISTRY}/vllm-ci-postmerge-cache:latest"
+
+
+@pytest.fixture
+def pr_build(monkeypatch):
+    monkeypatch.setattr(
+        docker_utils,
+        "get_global_config",
+        lambda: _cfg(branch="feature", pull_request="123"),
+    )
+    monkeypatch.setenv("BUILDKITE_PULL_REQUEST_BASE_BRANCH", "release/v1")
+    monkeypatch.delenv(CACHE_DIR_ENV_VAR, raising=False)
+
+
+def test_ecr_cache_probes_candidates_concurrently_and_prefers_pr_tag(pr_build):
+    registry = FakeRegistry(
+        [f"{TEST_CACHE}:pr-123", f"{TEST_CACHE}:release-v1"], concurrent_probes=2
+    )
+
+    cache_from, cache_to = docker_utils.get_ecr_cache_registry(registry)
+
+    assert registry.logins == [docker_utils.ECR_REGISTRY]
+    assert sorted(registry.probes) == [
+        f"{TEST_CACHE}:pr-123",
+        f"{TEST_CACHE}:release-v1",
+    ]
+    assert (cache_from, cache_to) == (f"{TEST_CACHE}:pr-123", f"{TEST_CACHE}:pr-123")
+
+
+@pytest.mark.parametrize(
+    "existing, expected",
+    [
+        ([f"{TEST_CACHE}:release-v1"], f"{TEST_CACHE}:release-v1"),
+        ([], POSTMERGE_CACHE),
+    ],
+)
+def test_ecr_cache_falls_back_in_priority_order(pr_build, existing, expected):
+    registry = FakeRegistry(existing, concurrent_probes=2)
+
+    cache_from, cache_to = docker_utils.get_ecr_cache_registry(registry)
+
+    assert (cache_from, cache_to) == (expected, f"{TEST_CACHE}:pr-123")
+
+
+def test_ecr_cache_on_main_does_not_probe(monkeypatch):
+    monkeypatch.setattr(
+        docker_utils, "get_global_config", lambda: _cfg(pull_request=None)
+    )
+    registry = FakeRegistry([])
+
+    assert docker_utils.get_ecr_cache_registry(registry) == (
+        POSTMERGE_CACHE,
+        POSTMERGE_CACHE,
+    )
+    assert registry.probes == []
+
+
+def test_manifest_cache_skips_fresh_probes_and_expires(tmp_path):
+    cache = ManifestCache(str(tmp_path), ttl_seconds=60)
+    candidates = ["registry/cache:pr-1", "registry/cache:base"]
+
+    first = FakeRegistry(["registry/cache:base"], concurrent_probes=2)
+    assert first_existing_tag(first, candidates, cache) == "registry/cache:base"
+
+    second = FakeRegistry([])
+    assert first_existing_tag(second, candidates, cache) == "registry/cache:base"
+    assert second.probes == []
+
+    cache.ttl_seconds = -1
+    third = FakeRegistry(["registry/cache:pr-1"], concurrent_probes=2)
+    assert first_existing_tag(third, candidates, cache) == "registry/cache:pr-1"
+    assert len(third.probes) == 2
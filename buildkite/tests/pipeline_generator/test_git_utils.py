@@ -0,0 +1,111 @@
+import subprocess
+
+import pytest
+
+from utils_lib.cache_utils import CACHE_DIR_ENV_VAR
+from utils_lib.git_utils import (
+    DIFF_MODE_ENV_VAR,
+    FileChange,
+    _resolve_merge_base,
+    get_file_changes,
+    get_list_file_diff,
+    get_merge_base_commit,
+)
+
+
+def _git(repo, *args):
+    return subprocess.run(
+        ["git", "-c", "user.name=ci", "-c", "user.email=ci@example.com", *args],
+        cwd=repo,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+
+
+@pytest.fixture
+def repo(tmp_path, monkeypatch):
+    """A branch one commit ahead of its merge base, plus local edits."""
+    _git(tmp_path, "init", "-q", "-b", "main")
+    (tmp_path / ".gitignore").write_text("*.log\n")
+    for name in ["keep.py", "edit.py", "delete.py", "move.py"]:
+        (tmp_path / name).write_text(f"{name} contents, long enough to rename\n")
+    _git(tmp_path, "add", ".")
+    _git(tmp_path, "commit", "-q", "-m", "base")
+    base = _git(tmp_path, "rev-parse", "HEAD").strip()
+
+    _git(tmp_path, "mv", "move.py", "moved.py")
+    (tmp_path / "delete.py").unlink()
+    (tmp_path / "added.py").write_text("new\n")
+    _git(tmp_path, "add", "-A")
+    _git(tmp_path, "commit", "-q", "-m", "branch")
+
+    (tmp_path / "edit.py").write_text("edited in the working tree\n")
+    (tmp_path / "untracked.py").write_text("untracked\n")
+    (tmp_path / "ignored.log").write_text("ignored\n")
+    monkeypatch.chdir(tmp_path)
+    return tmp_path, base
+
+
+def test_head_mode_compares_commit_trees(repo):
+    _, base = repo
+
+    assert get_file_changes(base, "head") == [
+        FileChange("A", "added.py"),
+        FileChange("D", "delete.py"),
+        FileChange("R", "moved.py", "move.py"),
+    ]
+
+
+def test_worktree_mode_includes_local_and_untracked_changes(repo):
+    path, base = repo
+
+    assert get_file_changes(base, "worktree") == [
+        FileChange("A", "added.py"),
+        FileChange("D", "delete.py"),
+        FileChange("M", "edit.py"),
+        FileChange("R", "moved.py", "move.py"),
+        FileChange("A", "untracked.py"),
+    ]
+    # Nothing was staged.
+    assert _git(path, "diff", "--cached", "--name-only") == ""
+
+
+def test_worktree_mode_matches_staged_fallback(repo, monkeypatch):
+    _, base = repo
+
+    monkeypatch.setenv(DIFF_MODE_ENV_VAR, "worktree")
+    without_staging = get_list_file_diff("feature", base)
+    monkeypatch.setenv(DIFF_MODE_ENV_VAR, "stage")
+    staged = get_list_file_diff("feature", base)
+
+    assert sorted(without_staging) == sorted(staged)
+
+
+def test_missing_merge_base_is_an_error(repo):
+    with pytest.raises(RuntimeError, match="merge base"):
+        get_list_file_diff("feature", None)
+
+
+def test_merge_base_is_memoized_per_head_and_main(repo, monkeypatch, tmp_path_factory):
+    path, base = repo
+    _git(path, "update-ref", "refs/remotes/origin/main", base)
+    monkeypatch.delenv("MERGE_BASE_COMMIT", raising=False)
+    monkeypatch.setenv(CACHE_DIR_ENV_VAR, str(tmp_path_factory.mktemp("cache")))
+
+    assert _resolve_merge_base() == (base, "git merge-base")
+    assert _resolve_merge_base() == (base, "cached")
+
+    # A new origin/main is a new pair and is resolved again.
+    # A commit-graph file is found and used.
+    _git(path, "update-ref", "refs/remotes/origin/main", "HEAD")
+    _git(path, "commit-graph", "write", "--reachable")
+    head = _git(path, "rev-parse", "HEAD").strip()
+    assert _resolve_merge_base() == (head, "commit-graph")
+
+
+def test_merge_base_env_var_skips_git(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("MERGE_BASE_COMMIT", "abc123")
+
+    assert get_merge_base_commit() == "abc123"
@@ -0,0 +1,117 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from utils_lib.git_utils import get_pr_labels, get_pr_metadata
+from utils_lib.github_client import GitHubClient, PullRequestMetadata
+
+PULL = {
+    "labels": [{"name": "ready"}, {"name": "ci-no-fail-fast"}],
+    "base": {"ref": "main"},
+    "head": {"sha": "0123456789abcdef"},
+}
+
+
+class _StubGitHub(BaseHTTPRequestHandler):
+    """Serves one PR, honoring If-None-Match and failing on request."""
+
+    requests = []
+    failures_left = 0
+    etag = '"v1"'
+
+    def do_GET(self):
+        type(self).requests.append(
+            (
+                self.path,
+                self.headers.get("If-None-Match"),
+                self.headers.get("Authorization"),
+            )
+        )
+        if type(self).failures_left:
+            type(self).failures_left -= 1
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.path != "/repos/vllm-project/vllm/pulls/42":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = json.dumps(PULL).encode()
+        self.send_response(200)
+        self.send_header("ETag", self.etag)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def github_url():
+    _StubGitHub.requests = []
+    _StubGitHub.failures_left = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubGitHub)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_pull_request_metadata_in_one_request(github_url):
+    client = GitHubClient(base_url=github_url, token="secret")
+
+    metadata = get_pr_metadata("42", "vllm-project/vllm", client)
+
+    assert metadata == PullRequestMetadata(
+        labels=["ready", "ci-no-fail-fast"],
+        base_branch="main",
+        head_sha="0123456789abcdef",
+    )
+    assert _StubGitHub.requests == [
+        ("/repos/vllm-project/vllm/pulls/42", None, "Bearer secret")
+    ]
+
+
+def test_cached_pull_request_is_revalidated_with_etag(github_url, tmp_path):
+    client = GitHubClient(base_url=github_url, cache_dir=str(tmp_path))
+
+    first = client.get_pull_request("vllm-project/vllm", "42")
+    second = client.get_pull_request("vllm-project/vllm", "42")
+
+    assert first == second
+    assert [etag for _, etag, _ in _StubGitHub.requests] == [None, '"v1"']
+
+
+def test_transient_errors_are_retried(github_url):
+    _StubGitHub.failures_left = 2
+    client = GitHubClient(base_url=github_url)
+
+    assert get_pr_labels("42", "vllm-project/vllm", client) == [
+        "ready",
+        "ci-no-fail-fast",
+    ]
+    assert len(_StubGitHub.requests) == 3
+
+
+def test_missing_pull_request_raises(github_url):
+    client = GitHubClient(base_url=github_url, retries=0)
+
+    with pytest.raises(requests.HTTPError, match="404"):
+        client.get_pull_request("vllm-project/vllm", "7")
+
+
+def test_non_pr_builds_skip_github(monkeypatch):
+    monkeypatch.setenv("GITHUB_API_URL", "http://127.0.0.1:9")
+
+    assert get_pr_labels("false", "vllm-project/vllm") == []
+    assert get_pr_metadata(None, "vllm-project/vllm") is None
@@ -1,14 +1,18 @@
 import os
+import re
 from unittest.mock import mock_open, patch
 
 import pytest
 
 from buildkite.pipeline_generator.global_config import (
     ONLY_STEP_KEYS_ENV_VAR,
+    _find_run_all_trigger,
     _parse_only_step_keys,
+    _should_run_all,
     _validate_pipeline_config,
     init_global_config,
 )
+from buildkite.pipeline_generator.utils_lib.pattern_set import PatternSet
 
 
 @pytest.fixture(autouse=True)
@@ -182,3 +186,48 @@ def test_validate_pipeline_config_invalid_repo_traversal():
     with patch("os.path.exists", return_value=True):
         with pytest.raises(ValueError, match="Invalid github_repo_name"):
             _validate_pipeline_config(config)
+
+
+def test_run_all_trigger_reports_file_and_first_pattern():
+    patterns = ["docker/Dockerfile", r"requirements/.*\.txt", "requirements/"]
+    diff = ["vllm/config.py", "requirements/test.txt"]
+
+    assert _find_run_all_trigger(diff, patterns, None) == (
+        "requirements/test.txt",
+        r"requirements/.*\.txt",
+    )
+
+
+def test_run_all_trigger_honors_exclude_patterns():
+    patterns = ["docker/", "setup.py"]
+    excludes = ["docker/Dockerfile.rocm", "docker/Dockerfile.cpu"]
+
+    assert (
+        _find_run_all_trigger(["docker/Dockerfile.rocm_base"], patterns, excludes)
+        is None
+    )
+    assert _find_run_all_trigger(
+        ["docker/Dockerfile.rocm", "setup.py"], patterns, excludes
+    ) == ("setup.py", "setup.py")
+
+
+def test_run_all_trigger_treats_missing_patterns_as_empty():
+    assert _find_run_all_trigger(["setup.py"], None, None) is None
+    with patch.dict(os.environ, {"RUN_ALL": "0", "TORCH_NIGHTLY": "0"}):
+        assert not _should_run_all([], ["setup.py"], None, None)
+        assert _should_run_all([], ["setup.py"], ["setup"], None)
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        ["docker/", r"(csrc|cmake)/.*\1", "setup.py"],
+        ["(?i)SETUP.PY", "docker/"],
+        ["docker/", "setup.py"],
+    ],
+)
+def test_pattern_set_matches_like_sequential_re_match(patterns):
+    pattern_set = PatternSet(patterns)
+    for text in ["docker/x", "csrc/csrc", "setup.py", "SETUP.PY", "vllm/x"]:
+        expected = next((p for p in patterns if re.match(p, text)), None)
+        assert pattern_set.first_match(text) == expected
@@ -0,0 +1,128 @@
+import pytest
+
+import buildkite_step
+from impact_analysis import ImportGraph, ImpactAnalysis, parse_imports
+from step import Step
+from utils_lib.cache_utils import CACHE_DIR_ENV_VAR
+
+CHECKOUT = {
+    "setup.py": "import vllm\n",
+    "vllm/__init__.py": "",
+    "vllm/core.py": "",
+    "vllm/distributed/__init__.py": "",
+    "vllm/distributed/comm.py": "from vllm.core import Scheduler\n",
+    "vllm/entrypoints/__init__.py": "",
+    "vllm/entrypoints/chat.py": "from ..utils import random_uuid\n",
+    "vllm/utils.py": "",
+    "tests/__init__.py": "",
+    "tests/conftest.py": "",
+    "tests/utils.py": "",
+    "tests/distributed/__init__.py": "",
+    "tests/distributed/test_comm_ops.py": (
+        "from vllm.distributed import comm\nfrom ..utils import wait_for_gpu\n"
+    ),
+    "tests/entrypoints/__init__.py": "",
+    "tests/entrypoints/test_chat.py": "import vllm.entrypoints.chat\n",
+}
+
+
+@pytest.fixture
+def checkout(tmp_path, monkeypatch):
+    monkeypatch.delenv(CACHE_DIR_ENV_VAR, raising=False)
+    for path, source in CHECKOUT.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(source)
+    return tmp_path
+
+
+def _step(*commands, source_file_dependencies=("vllm/",)):
+    return Step(
+        label="Test",
+        commands=list(commands),
+        working_dir="/vllm-workspace/tests",
+        source_file_dependencies=list(source_file_dependencies),
+    )
+
+
+DISTRIBUTED = _step("pytest -v -s distributed/test_comm_ops.py::test_all_reduce")
+ENTRYPOINTS = _step("pytest -v -s entrypoints/")
+KERNELS = _step("pytest -v -s kernels", source_file_dependencies=["csrc/", "vllm/"])
+
+
+def test_parse_imports_resolves_relative_and_from_imports():
+    source = (
+        b"import os\nfrom . import comm\nfrom ..core import a, b\nfrom x import *\n"
+    )
+
+    assert parse_imports("vllm/distributed/api.py", source) == [
+        "os",
+        "vllm.core",
+        "vllm.core.a",
+        "vllm.core.b",
+        "vllm.distributed",
+        "vllm.distributed.comm",
+        "x",
+    ]
+    assert parse_imports("vllm/broken.py", b"def (") == []
+
+
+def test_changes_affect_transitive_importers(checkout):
+    graph = ImportGraph.from_checkout(str(checkout))
+
+    assert graph.affected_by(["vllm/core.py"]) == {
+        "vllm/core.py",
+        "vllm/distributed/comm.py",
+        "tests/distributed/test_comm_ops.py",
+    }
+    # Importing a module runs its parent packages too.
+    assert "tests/entrypoints/test_chat.py" in graph.affected_by(
+        ["vllm/entrypoints/__init__.py"]
+    )
+
+
+def test_steps_run_only_when_their_tests_import_a_change(checkout, fake_global_config):
+    diff = ["vllm/core.py"]
+    impact = ImpactAnalysis.from_checkout(str(checkout), None, diff)
+
+    assert buildkite_step._step_should_run(DISTRIBUTED, diff, None, impact)
+    assert not buildkite_step._step_should_run(ENTRYPOINTS, diff, None, impact)
+    # Without test impact, `vllm/` matches every change.
+    assert buildkite_step._step_should_run(ENTRYPOINTS, diff)
+
+
+def test_other_changes_fall_back_to_source_file_dependencies(
+    checkout, fake_global_config
+):
+    diff = ["csrc/attention.cu", "setup.py"]
+    impact = ImpactAnalysis.from_checkout(str(checkout), None, diff)
+
+    assert impact.unmapped_diff == diff
+    # `kernels` is not in the checkout, so its impact is unknown.
+    assert impact.step_is_impacted(KERNELS) is None
+    assert buildkite_step._step_should_run(KERNELS, diff, None, impact)
+    assert not buildkite_step._step_should_run(DISTRIBUTED, diff, None, impact)
+
+
+def test_conftest_changes_affect_the_tests_below(checkout):
+    impact = ImpactAnalysis.from_checkout(str(checkout), None, ["tests/conftest.py"])
+
+    assert impact.step_is_impacted(DISTRIBUTED)
+    assert impact.step_is_impacted(ENTRYPOINTS)
+
+
+def test_import_graph_is_cached_per_merge_base(checkout, tmp_path, monkeypatch):
+    monkeypatch.setenv(CACHE_DIR_ENV_VAR, str(tmp_path / "cache"))
+    ImportGraph.from_checkout(str(checkout), "base1", ["vllm/utils.py"])
+
+    # Unchanged files come from the cache; changed files are parsed again,
+    # including those another build with the same merge base changed.
+    (checkout / "vllm/core.py").write_text("import vllm.utils\n")
+    (checkout / "vllm/utils.py").write_text("import vllm.distributed\n")
+    (checkout / "tests/utils.py").write_text("import vllm.core\n")
+    graph = ImportGraph.from_checkout(str(checkout), "base1", ["tests/utils.py"])
+
+    assert graph.imports["vllm/core.py"] == []
+    assert graph.imports["vllm/utils.py"] == ["vllm.distributed"]
+    assert graph.imports["tests/utils.py"] == ["vllm.core"]
+    fresh = ImportGraph.from_checkout(str(checkout), "base2", [])
+    assert fresh.imports["vllm/core.py"] == ["vllm.utils"]
@@ -0,0 +1,305 @@
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+import yaml
+
+import pipeline_generator
+import profiling
+from utils_lib import yaml_io
+from utils_lib.cache_utils import CACHE_DIR_ENV_VAR
+from utils_lib.frozen import FrozenDict, FrozenList
+
+TEST_FILES_DIR = Path(__file__).resolve().parent / "test_files"
+GOLDEN_JOB_DIR = TEST_FILES_DIR / "golden_jobs"
+GOLDEN_PIPELINE = TEST_FILES_DIR / "golden_pipeline.yaml"
+
+# Environment read at generation time that would change the golden output.
+GENERATION_ENV_VARS = (
+    "PRIORITY",
+    "NOAUTO",
+    "CONTINUE_ON_FAILURE",
+    "BUILDKITE_SOURCE",
+    "CI_INFRA_OTEL_TREATMENT_BRANCH",
+    "VLLM_CI_ENABLE_ROCM_DEBUG_AGENT",
+    "ROCM_BASE_REFRESH_SKIP",
+    "ROCM_BASE_REFRESH_FORCE",
+)
+
+
+@pytest.fixture
+def golden_config(fake_global_config, monkeypatch):
+    for name in GENERATION_ENV_VARS:
+        monkeypatch.delenv(name, raising=False)
+    fake_global_config.update(
+        {
+            "job_dirs": [str(GOLDEN_JOB_DIR)],
+            "registries": "public.ecr.aws/q9t5s3a7",
+            "branch": "feature/golden",
+            "commit": "0123456789abcdef0123456789abcdef01234567",
+            "pull_request": "4242",
+            "docs_only_disable": "0",
+            "fail_fast": True,
+            "list_file_diff": [
+                "vllm/distributed/parallel_state.py",
+                "csrc/attention.cu",
+            ],
+        }
+    )
+    monkeypatch.setattr(
+        pipeline_generator, "get_global_config", lambda: fake_global_config
+    )
+    monkeypatch.setattr(pipeline_generator, "init_global_config", lambda path: None)
+    # The golden pipeline was rendered with the real image tags.
+    import buildkite_step
+    from utils_lib import docker_utils
+
+    monkeypatch.setattr(buildkite_step, "get_image", docker_utils.get_image)
+    monkeypatch.setattr(
+        buildkite_step, "get_torch_nightly_image", docker_utils.get_torch_nightly_image
+    )
+    monkeypatch.setattr(docker_utils, "get_global_config", lambda: fake_global_config)
+    return fake_global_config
+
+
+def _generate(tmp_path: Path, **kwargs) -> Path:
+    output = tmp_path / "pipeline.yaml"
+    pipeline_generator.PipelineGenerator("unused", str(output), **kwargs).generate()
+    return output
+
+
+def test_generated_pipeline_matches_golden(golden_config, tmp_path):
+    output = _generate(tmp_path)
+
+    assert output.read_bytes() == GOLDEN_PIPELINE.read_bytes()
+
+
+def test_pure_python_yaml_fallback_matches_golden(golden_config, tmp_path, monkeypatch):
+    monkeypatch.setattr(yaml_io, "SafeLoader", yaml.SafeLoader)
+    monkeypatch.setattr(yaml_io, "SafeDumper", yaml.SafeDumper)
+
+    class PythonDumper(yaml.SafeDumper):
+        yaml_representers = yaml_io._Dumper.yaml_representers
+
+    monkeypatch.setattr(yaml_io, "_Dumper", PythonDumper)
+
+    output = _generate(tmp_path)
+
+    assert output.read_bytes() == GOLDEN_PIPELINE.read_bytes()
+
+
+def test_json_output_matches_golden_pipeline(golden_config, tmp_path):
+    output = tmp_path / "pipeline.json"
+    pipeline_generator.PipelineGenerator(
+        "unused", str(output), output_format="json"
+    ).generate()
+
+    assert json.loads(output.read_text()) == yaml.safe_load(GOLDEN_PIPELINE.read_text())
+
+
+def test_yaml_anchors_output_matches_golden_pipeline(golden_config, tmp_path):
+    output = tmp_path / "pipeline.yaml"
+    pipeline_generator.PipelineGenerator(
+        "unused", str(output), output_format="yaml_anchors"
+    ).generate()
+
+    assert "*id001" in output.read_text()
+    assert len(output.read_bytes()) < len(GOLDEN_PIPELINE.read_bytes())
+    assert yaml.safe_load(output.read_text()) == yaml.safe_load(
+        GOLDEN_PIPELINE.read_text()
+    )
+
+
+def test_yaml_io_uses_libyaml_when_available():
+    if not getattr(yaml, "__with_libyaml__", False):
+        pytest.skip("PyYAML was built without libyaml")
+
+    assert yaml_io.SafeLoader is yaml.CSafeLoader
+    assert yaml_io.SafeDumper is yaml.CSafeDumper
+    assert issubclass(yaml_io._Dumper, yaml.CSafeDumper)
+
+
+def test_yaml_io_leaves_pyyaml_dumpers_unchanged():
+    assert yaml_io.dump(FrozenDict(a=FrozenList([1]))) == "a:\n- 1\n"
+    for dumper in (yaml.SafeDumper, getattr(yaml, "CSafeDumper", yaml.SafeDumper)):
+        assert FrozenDict not in dumper.yaml_representers
+        assert FrozenList not in dumper.yaml_representers
+
+
+def test_profile_reports_every_generate_phase(golden_config, tmp_path):
+    profiling.start()
+    try:
+        _generate(tmp_path)
+    finally:
+        timer = profiling.stop()
+    report_path = tmp_path / "profile.json"
+    timer.write_report(str(report_path))
+
+    report = json.loads(report_path.read_text())
+    phases = {phase["name"]: phase for phase in report["phases"]}
+    assert list(phases) == [
+        "init_config",
+        "load_steps",
+        "select_steps",
+        "ecr_cache",
+        "convert",
+    ]
+    assert phases["ecr_cache"]["parent"] == "convert"
+    assert phases["load_steps"]["steps"] == phases["select_steps"]["steps"] > 0
+    assert phases["convert"]["steps"] > 0
+    assert all(
+        phase["wall_ms"] >= 0 and phase["cpu_ms"] >= 0 for phase in report["phases"]
+    )
+    assert report["total_wall_ms"] >= phases["convert"]["wall_ms"]
+
+
+def _priorities(pipeline):
+    """Pop and return the priority of every keyed command step."""
+    return {
+        step["key"]: step.pop("priority")
+        for group in pipeline["steps"]
+        for step in group.get("steps", [group])
+        if "priority" in step
+    }
+
+
+def test_step_durations_report_critical_path_and_set_priorities(
+    golden_config, tmp_path, capsys
+):
+    durations = tmp_path / "durations.json"
+    durations.write_text(
+        json.dumps({"image-build-cpu": 1200, "pre-commit": 300, "zen5-tests": 2400})
+    )
+
+    output = _generate(tmp_path, step_durations_path=str(durations))
+
+    pipeline = yaml.safe_load(output.read_text())
+    golden = yaml.safe_load(GOLDEN_PIPELINE.read_text())
+    priorities = _priorities(pipeline)
+    golden_priorities = _priorities(golden)
+    # Only priorities change: the CPU image build heads the critical path.
+    # Zen5 Tests waits on a block step, so it is not scheduled or boosted.
+    assert pipeline == golden
+    assert priorities["image-build-cpu"] == golden_priorities["image-build-cpu"] + 99
+    assert priorities["zen5-tests"] == golden_priorities["zen5-tests"]
+    assert priorities["cpu-unit-tests"] == golden_priorities["cpu-unit-tests"]
+    printed = capsys.readouterr().out
+    assert "Critical path: 20.0 min earliest finish, 1 steps" in printed
+    assert "Zen5 Tests" not in printed
+    assert "steps wait on a block step and are left out." in printed
+
+
+def test_phase_is_a_no_op_without_profiling():
+    with profiling.phase("anything") as record:
+        record["steps"] = 1
+    assert profiling.stop() is None
+
+
+def test_queue_capacity_limits_and_staggers_queue_jobs(golden_config, tmp_path, capsys):
+    capacity = tmp_path / "capacity.yaml"
+    capacity.write_text(
+        "queues:\n  cpu_queue_premerge_us_east_1: {agents: 4, max_jobs_per_build: 1}\n"
+    )
+
+    output = _generate(tmp_path, queue_capacity_path=str(capacity))
+
+    pipeline = yaml.safe_load(output.read_text())
+    limited = [
+        step
+        for group in pipeline["steps"]
+        for step in group.get("steps", [group])
+        if step.get("agents", {}).get("queue") == "cpu_queue_premerge_us_east_1"
+    ]
+    assert [step["concurrency"] for step in limited] == [1, 1]
+    assert {step["concurrency_group"] for step in limited} == {
+        "vllm_ci/cpu_queue_premerge_us_east_1/$BUILDKITE_BUILD_ID"
+    }
+    golden = yaml.safe_load(GOLDEN_PIPELINE.read_text())
+    golden_priorities = _priorities(golden)
+    priorities = _priorities(pipeline)
+    assert sum(priorities.values()) == sum(golden_priorities.values()) - 1
+    assert "| cpu_queue_premerge_us_east_1 | 2 | 1 | ~15 min |" in (
+        capsys.readouterr().out
+    )
+
+
+@pytest.fixture
+def output_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv(CACHE_DIR_ENV_VAR, str(cache_dir))
+    return cache_dir
+
+
+def _convert_calls(monkeypatch):
+    calls = []
+    convert = pipeline_generator.iter_buildkite_group_steps
+
+    def counting_convert(*args):
+        calls.append(args)
+        return convert(*args)
+
+    monkeypatch.setattr(
+        pipeline_generator, "iter_buildkite_group_steps", counting_convert
+    )
+    return calls
+
+
+def test_output_cache_reuses_pipeline_for_same_inputs(
+    golden_config, output_cache_dir, tmp_path, monkeypatch
+):
+    (tmp_path / "first").mkdir()
+    first = _generate(tmp_path / "first")
+    calls = _convert_calls(monkeypatch)
+    (tmp_path / "second").mkdir()
+
+    second = _generate(tmp_path / "second")
+
+    assert calls == []
+    assert second.read_bytes() == first.read_bytes()
+    monkeypatch.setenv("PRIORITY", "HIGH")
+    (tmp_path / "third").mkdir()
+    third = _generate(tmp_path / "third")
+    assert len(calls) == 1
+    assert third.read_bytes() != first.read_bytes()
+
+
+def test_output_cache_reuses_unchanged_groups(
+    golden_config, output_cache_dir, tmp_path, monkeypatch, capsys
+):
+    job_dir = tmp_path / "jobs"
+    shutil.copytree(GOLDEN_JOB_DIR, job_dir)
+    golden_config["job_dirs"] = [str(job_dir)]
+    (tmp_path / "first").mkdir()
+    _generate(tmp_path / "first")
+    # The next commit edits a job file; the step selection stays the same.
+    cpu_jobs = job_dir / "cpu.yaml"
+    cpu_jobs.write_text(cpu_jobs.read_text().replace("CPU Unit Tests", "CPU Tests"))
+    golden_config["commit"] = "fedcba9876543210fedcba9876543210fedcba98"
+    golden_config["list_file_diff"] = golden_config["list_file_diff"] + [
+        ".buildkite/test_areas/cpu.yaml",
+        "vllm/distributed/utils.py",
+    ]
+    capsys.readouterr()
+
+    def generate_cached_and_fresh(name):
+        (tmp_path / name).mkdir()
+        cached = _generate(tmp_path / name)
+        printed = capsys.readouterr().out
+        with monkeypatch.context() as no_cache:
+            no_cache.delenv(CACHE_DIR_ENV_VAR)
+            (tmp_path / f"{name}_fresh").mkdir()
+            fresh = _generate(tmp_path / f"{name}_fresh")
+        assert cached.read_bytes() == fresh.read_bytes()
+        return printed
+
+    assert "Output cache: 3 groups reused, 1 converted" in (
+        generate_cached_and_fresh("edited")
+    )
+    # A change that unblocks a step reconverts only that step's group.
+    golden_config["list_file_diff"] = golden_config["list_file_diff"] + [
+        "vllm/executor/ray_utils.py"
+    ]
+    assert "Output cache: 3 groups reused, 1 converted" in (
+        generate_cached_and_fresh("unblocked")
+    )
@@ -0,0 +1,222 @@
+import json
+from itertools import groupby
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+import main
+from buildkite_step import (
+    BuildkiteBlockStep,
+    BuildkiteCommandStep,
+    BuildkiteGroupStep,
+)
+from critical_path import analyze_critical_path, assign_priorities
+from pipeline_simulator import load_pipeline, simulate
+
+TEST_FILES_DIR = Path(__file__).resolve().parent / "test_files"
+RECORDED_BUILD = TEST_FILES_DIR / "recorded_build.json"
+GOLDEN_PIPELINE = TEST_FILES_DIR / "golden_pipeline.yaml"
+
+
+def _load_recorded_build():
+    build = json.loads(RECORDED_BUILD.read_text())
+    groups = [
+        BuildkiteGroupStep(
+            group=group,
+            steps=[
+                BuildkiteCommandStep(
+                    label=step["label"],
+                    key=step["key"],
+                    agents={"queue": step["queue"]},
+                    depends_on=step["depends_on"] or None,
+                    priority=0,
+                )
+                for step in steps
+            ],
+        )
+        for group, steps in groupby(build["steps"], key=lambda step: step["group"])
+    ]
+    durations = {step["key"]: step["duration_seconds"] for step in build["steps"]}
+    return groups, durations, build["agents_per_queue"]
+
+
+def test_priorities_shorten_the_recorded_build():
+    groups, durations, agents = _load_recorded_build()
+    baseline = simulate(groups, durations, agents)
+
+    report = analyze_critical_path(groups, durations)
+    assign_priorities(groups, report)
+    prioritized = simulate(groups, durations, agents)
+
+    # Pipeline order starts the long extended tests last on both GPU queues.
+    assert baseline.start["models-extended"] > 0
+    assert prioritized.start["models-extended"] == baseline.start["async-engine"]
+    assert prioritized.start["distributed-tp"] == baseline.start["distributed-comm"]
+    assert baseline.makespan == 5620
+    # The single gpu_4 agent is now busy from the image build to the end.
+    assert prioritized.makespan == 930 + 2380 + 880 + 590 == 4780
+    # Unlimited agents cannot do better than the critical path.
+    assert prioritized.makespan >= report.earliest_finish
+
+
+def test_assigned_priorities_follow_the_remaining_chain():
+    groups, durations, _ = _load_recorded_build()
+    steps = {step.key: step for group in groups for step in group.steps}
+    for step in steps.values():
+        step.priority = 1000
+
+    assign_priorities(groups, analyze_critical_path(groups, durations))
+
+    assert 1000 <= steps["metrics"].priority < steps["entrypoints"].priority
+    assert steps["distributed-tp"].priority > steps["distributed-report"].priority
+    assert (
+        steps["entrypoints"].priority
+        < steps["models-extended"].priority
+        < steps["image-build"].priority
+    )
+    assert max(step.priority for step in steps.values()) == 1099
+
+
+def test_simulator_honors_queues_parallelism_and_blocks():
+    groups = [
+        BuildkiteGroupStep(
+            group="g",
+            steps=[
+                BuildkiteCommandStep(label="A", key="a", agents={"queue": "q"}),
+                BuildkiteCommandStep(
+                    label="B", key="b", agents={"queue": "q"}, parallelism=2
+                ),
+                BuildkiteBlockStep(block="Run C", depends_on=["a"], key="block-c"),
+                BuildkiteCommandStep(
+                    label="C",
+                    key="c",
+                    agents={"queue": "other"},
+                    depends_on=["block-c", "image-build"],
+                ),
+            ],
+        )
+    ]
+
+    result = simulate(groups, {"a": 10, "b": 5, "c": 1, "image-build": 12}, {"q": 2})
+
+    assert result.start == {"a": 0, "b": 0, "block-c": 10, "c": 12}
+    assert result.finish["b"] == 10
+    assert result.makespan == 13
+
+
+def test_simulator_rejects_queues_without_agents():
+    groups = [
+        BuildkiteGroupStep(
+            group="g",
+            steps=[BuildkiteCommandStep(label="A", key="a", agents={"queue": "q"})],
+        )
+    ]
+
+    with pytest.raises(ValueError, match="never ran.*: a"):
+        simulate(groups, {"a": 1}, {"q": 0})
+
+
+def test_simulator_honors_concurrency_groups(command_step):
+    limited = {"concurrency": 1, "concurrency_group": "vllm/lock"}
+    groups = [
+        BuildkiteGroupStep(
+            group="g",
+            steps=[
+                command_step("a", queue="q", **limited),
+                command_step("b", queue="q", **limited),
+                command_step("c", queue="q"),
+            ],
+        )
+    ]
+
+    result = simulate(groups, {"a": 10, "b": 10, "c": 10}, {"q": 3})
+
+    # `b` waits for the group while `c` takes a free agent.
+    assert result.start == {"a": 0, "c": 0, "b": 10}
+    assert result.makespan == 20
+
+
+def test_simulator_reports_queue_waits_and_idle_agents(command_step):
+    groups = [
+        BuildkiteGroupStep(
+            group="g",
+            steps=[
+                command_step("a", queue="q"),
+                command_step("b", queue="q", parallelism=2),
+            ],
+        )
+    ]
+
+    result = simulate(groups, {"a": 30, "b": 10}, {"q": 2})
+
+    stats = result.queues["q"]
+    assert (stats.agents, stats.jobs) == (2, 3)
+    # One `b` job waits for the other to finish.
+    assert stats.wait_seconds == stats.max_wait_seconds == 10
+    assert stats.busy_seconds == 50
+    assert stats.idle_seconds == 2 * 30 - 50
+    assert "q" in result.format()
+
+
+def test_simulator_can_leave_blocked_steps_unrun(command_step):
+    groups = [
+        BuildkiteGroupStep(
+            group="g",
+            steps=[
+                command_step("a", queue="q"),
+                BuildkiteBlockStep(block="Run B", depends_on=[], key="block-b"),
+                command_step("b", "block-b", queue="q"),
+                command_step("report", "b", queue="q"),
+            ],
+        )
+    ]
+
+    result = simulate(groups, {"a": 5, "b": 50, "report": 1}, {}, run_blocked=False)
+
+    assert result.makespan == 5
+    assert result.skipped == ["block-b", "b", "report"]
+    assert "3 blocked steps were not run." in result.format()
+
+
+def test_simulate_command_replays_a_generated_pipeline(tmp_path):
+    groups = load_pipeline(str(GOLDEN_PIPELINE))
+    steps = [step for group in groups for step in group.steps]
+    durations = tmp_path / "durations.json"
+    durations.write_text(json.dumps({step.key: 600 for step in steps}))
+
+    result = CliRunner().invoke(
+        main.main,
+        [
+            "simulate",
+            str(GOLDEN_PIPELINE),
+            "--step_durations_path",
+            str(durations),
+            "--agents",
+            "gpu_1_queue=2",
+            "--skip_blocked",
+        ],
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "Simulated build:" in result.output
+    assert "gpu_1_queue" in result.output
+    assert "blocked steps were not run." in result.output
+    assert {type(step).__name__ for step in steps} == {
+        "BuildkiteCommandStep",
+        "BuildkiteBlockStep",
+    }
+
+
+def test_simulate_command_rejects_malformed_agents(tmp_path):
+    durations = tmp_path / "durations.json"
+    durations.write_text("{}")
+
+    result = CliRunner().invoke(
+        main.main,
+        ["simulate", str(GOLDEN_PIPELINE), "--step_durations_path", str(durations)]
+        + ["--agents", "gpu_1_queue"],
+    )
+
+    assert result.exit_code != 0
+    assert "expected QUEUE=COUNT" in result.output
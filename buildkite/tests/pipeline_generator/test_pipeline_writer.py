@@ -0,0 +1,89 @@
+import json
+
+import pytest
+import yaml
+
+from buildkite_step import BuildkiteBlockStep, BuildkiteCommandStep, BuildkiteGroupStep
+from pipeline_writer import write_pipeline
+from utils_lib import yaml_io
+
+
+def _group_steps():
+    return [
+        BuildkiteGroupStep(
+            group=f"Group {index}",
+            steps=[
+                BuildkiteBlockStep(block="Run", key=f"block-{index}", depends_on=[]),
+                BuildkiteCommandStep(
+                    label=f"Step {index}",
+                    key=f"step-{index}",
+                    commands=["echo 'multi\\nline'", "pytest -v -s tests"],
+                    depends_on=[f"block-{index}"],
+                    agents={"queue": "gpu_1_queue"},
+                ),
+            ],
+        )
+        for index in range(3)
+    ]
+
+
+def test_streamed_yaml_matches_single_document_dump(tmp_path):
+    output = tmp_path / "pipeline.yaml"
+    write_pipeline(iter(_group_steps()), str(output))
+
+    expected = yaml_io.dump(
+        {"steps": [group.model_dump(exclude_none=True) for group in _group_steps()]},
+        sort_keys=False,
+        default_flow_style=False,
+    )
+    assert output.read_text() == expected
+
+
+@pytest.mark.parametrize("output_format", ["yaml", "json", "yaml_anchors"])
+def test_empty_pipeline_is_valid(tmp_path, output_format):
+    output = tmp_path / f"pipeline.{output_format}"
+    write_pipeline([], str(output), output_format)
+
+    assert yaml.safe_load(output.read_text()) == {"steps": []}
+
+
+def test_json_output_is_loadable_as_yaml(tmp_path):
+    output = tmp_path / "pipeline.json"
+    write_pipeline(_group_steps(), str(output), "json")
+
+    assert yaml.safe_load(output.read_text()) == json.loads(output.read_text())
+
+
+def test_yaml_anchors_alias_repeated_step_fields(tmp_path):
+    output = tmp_path / "pipeline.yaml"
+    write_pipeline(_group_steps(), str(output), "yaml_anchors")
+
+    text = output.read_text()
+    assert text.count("queue: gpu_1_queue") == 1
+    assert text.count("agents: *id001") == 2
+    # Aliases are shared objects once loaded; the data is unchanged.
+    loaded = yaml_io.safe_load(text)
+    assert loaded == {
+        "steps": [group.model_dump(exclude_none=True) for group in _group_steps()]
+    }
+
+
+def test_unknown_output_format_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="Unsupported output format: toml"):
+        write_pipeline([], str(tmp_path / "pipeline.toml"), "toml")
+
+
+@pytest.mark.parametrize("output_format", ["yaml", "json", "yaml_anchors"])
+def test_failed_conversion_keeps_the_previous_output(tmp_path, output_format):
+    output = tmp_path / "pipeline.yaml"
+    output.write_text("steps: []\n")
+
+    def groups():
+        yield from _group_steps()[:2]
+        raise RuntimeError("conversion failed")
+
+    with pytest.raises(RuntimeError, match="conversion failed"):
+        write_pipeline(groups(), str(output), output_format)
+
+    assert output.read_text() == "steps: []\n"
+    assert [path.name for path in tmp_path.iterdir()] == ["pipeline.yaml"]
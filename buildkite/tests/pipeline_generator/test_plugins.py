@@ -65,3 +65,26 @@ def test_standard_k8s_templates_inject_buildkite_analytics_token(template):
             }
         },
     }
+
+
+def test_plugins_are_shared_per_device_image_and_gpu_count(fake_global_config):
+    image = "example/image:latest"
+    first = k8s_plugin.get_k8s_plugin(Step(label="A", device="h100"), image)
+    second = k8s_plugin.get_k8s_plugin(Step(label="B", device="h100"), image)
+    four_gpus = k8s_plugin.get_k8s_plugin(
+        Step(label="C", device="h100", num_devices=4), image
+    )
+
+    assert first is second
+    container = four_gpus["kubernetes"]["podSpec"]["containers"][0]
+    assert container["resources"]["limits"]["nvidia.com/gpu"] == 4
+    with pytest.raises(TypeError, match="shared"):
+        first["kubernetes"]["podSpec"]["containers"][0]["image"] = "other"
+
+    docker = docker_plugin.get_docker_plugin(Step(label="A", device="h200"), image)
+    assert docker is docker_plugin.get_docker_plugin(
+        Step(label="B", device="h200"), image
+    )
+    assert docker_plugin.get_docker_plugin(
+        Step(label="C", device="h200", mount_buildkite_agent=True), image
+    )["mount_buildkite_agent"]
@@ -0,0 +1,140 @@
+import pytest
+
+import queue_capacity
+from buildkite_step import BuildkiteGroupStep
+from queue_capacity import (
+    QueueCapacity,
+    format_estimates,
+    load_queue_capacity,
+    shape_pipeline,
+)
+
+
+@pytest.fixture
+def pipeline(command_step):
+    return [
+        BuildkiteGroupStep(
+            group="Tests",
+            steps=[
+                command_step("a", queue="gpu_1_queue"),
+                command_step("b", queue="gpu_1_queue", priority=10),
+                command_step("c", queue="gpu_1_queue", parallelism=3),
+                command_step(
+                    "d",
+                    concurrency=1,
+                    concurrency_group="vllm/gpu-lock",
+                    queue="gpu_1_queue",
+                ),
+                command_step("e", queue="gpu_1_queue"),
+                command_step("multi-gpu", queue="gpu_4_queue"),
+                command_step("cpu", queue="cpu_queue"),
+            ],
+        )
+    ]
+
+
+CAPACITY = {
+    "gpu_1_queue": QueueCapacity(agents=10, max_jobs_per_build=2, job_minutes=20),
+    "gpu_4_queue": QueueCapacity(agents=4),
+}
+
+
+def test_per_build_concurrency_limits(pipeline):
+    shape_pipeline(pipeline, CAPACITY, "vllm_ci")
+    steps = {step.key: step for step in pipeline[0].steps}
+
+    assert steps["a"].concurrency == 2
+    assert steps["a"].concurrency_group == "vllm_ci/gpu_1_queue/$BUILDKITE_BUILD_ID"
+    # Hand-set limits win, and queues without a per-build limit are left alone.
+    assert steps["d"].concurrency == 1
+    assert steps["d"].concurrency_group == "vllm/gpu-lock"
+    assert steps["multi-gpu"].concurrency is None
+    assert steps["cpu"].concurrency is None
+
+
+def test_priorities_are_staggered_by_wave(pipeline):
+    shape_pipeline(pipeline, CAPACITY, "vllm_ci")
+
+    # Dispatch order b, a, c (3 jobs), d, e over 2 slots: waves 0, 0, 1, 2, 3.
+    priorities = {step.key: step.priority for step in pipeline[0].steps}
+    assert priorities == {
+        "a": None,
+        "b": 10,
+        "c": -1,
+        "d": -2,
+        "e": -3,
+        "multi-gpu": None,
+        "cpu": None,
+    }
+
+
+def test_time_to_start_estimates(pipeline):
+    estimates = shape_pipeline(pipeline, CAPACITY, "vllm_ci")
+
+    assert [(e.queue, e.jobs, e.slots, e.waves) for e in estimates] == [
+        ("gpu_1_queue", 7, 2, 4),
+        ("gpu_4_queue", 1, 4, 1),
+    ]
+    assert estimates[0].last_start_minutes == 60
+    assert estimates[1].last_start_minutes == 0
+    assert "| gpu_1_queue | 7 | 2 | ~60 min |" in format_estimates(estimates)
+
+
+def test_annotation_only_on_buildkite(pipeline, monkeypatch, capsys):
+    calls = []
+    monkeypatch.setattr(
+        queue_capacity.subprocess,
+        "run",
+        lambda args, **kwargs: calls.append(args) or type("R", (), {"returncode": 0}),
+    )
+    estimates = shape_pipeline(pipeline, CAPACITY, "vllm_ci")
+
+    monkeypatch.delenv("BUILDKITE", raising=False)
+    queue_capacity.annotate_estimates(estimates)
+    assert calls == []
+    assert "gpu_4_queue" in capsys.readouterr().out
+
+    monkeypatch.setenv("BUILDKITE", "true")
+    queue_capacity.annotate_estimates(estimates)
+    assert calls[0][:6] == [
+        "buildkite-agent",
+        "annotate",
+        "--style",
+        "info",
+        "--context",
+        "queue-capacity",
+    ]
+
+
+def test_load_queue_capacity(tmp_path):
+    path = tmp_path / "capacity.yaml"
+    path.write_text(
+        "default_job_minutes: 30\n"
+        "queues:\n"
+        "  gpu_1_queue: {agents: 40, max_jobs_per_build: 16, job_minutes: 20}\n"
+        "  gpu_4_queue: {agents: 8}\n"
+    )
+
+    assert load_queue_capacity(str(path)) == {
+        "gpu_1_queue": QueueCapacity(40, 16, 20.0),
+        "gpu_4_queue": QueueCapacity(8, None, 30.0),
+    }
+
+
+@pytest.mark.parametrize(
+    "content, message",
+    [
+        ("queues: {}\n", "must have a 'queues' mapping"),
+        ("queues:\n  q: {agents: 0}\n", "needs a positive 'agents'"),
+        (
+            "queues:\n  q: {agents: 2, max_jobs_per_build: two}\n",
+            "invalid 'max_jobs_per_build'",
+        ),
+    ],
+)
+def test_load_queue_capacity_rejects_bad_config(tmp_path, content, message):
+    path = tmp_path / "capacity.yaml"
+    path.write_text(content)
+
+    with pytest.raises(ValueError, match=message):
+        load_queue_capacity(str(path))
@@ -9,8 +9,18 @@ from pathlib import Path
 import pytest
 
 import buildkite_step
+import pipeline_generator
+from constants import AgentQueue
 from pipeline_generator import select_steps_and_dependencies
-from step import Step, group_steps, read_steps_from_job_dir
+from step import (
+    Step,
+    group_steps,
+    read_steps_from_job_dir,
+    read_steps_from_job_dirs,
+)
+from utils_lib import yaml_io
+from utils_lib.source_trie import SourceDependencyTrie, TriggeredDependencies
+from utils_lib.variable_injector import get_variable_injector
 
 pytestmark = pytest.mark.usefixtures("fake_global_config")
 
@@ -52,6 +62,18 @@ def test_read_steps_from_job_dir():
     assert steps_by_label["Test E"].group == "a"
 
 
+def test_parallel_job_dir_loader_matches_serial_order():
+    job_dirs = [str(TEST_JOB_DIR), str(TEST_JOB_DIR)]
+
+    serial = read_steps_from_job_dirs(job_dirs)
+    parallel = read_steps_from_job_dirs(job_dirs, num_workers=2)
+
+    assert len(serial) == 16
+    assert [step.model_dump() for step in parallel] == [
+        step.model_dump() for step in serial
+    ]
+
+
 def test_group_steps_sorts_steps_within_each_group():
     steps = read_steps_from_job_dir(str(TEST_JOB_DIR))
     grouped_steps = group_steps(steps)
@@ -226,9 +248,7 @@ def test_otel_trace_wraps_every_command_on_trusted_main(fake_global_config):
     assert "'" not in commands[4]
 
 
-def test_otel_trace_allows_exact_api_treatment_branch(
-    fake_global_config, monkeypatch
-):
+def test_otel_trace_allows_exact_api_treatment_branch(fake_global_config, monkeypatch):
     fake_global_config["branch"] = "khluu/otel"
     monkeypatch.setenv("BUILDKITE_SOURCE", "api")
     monkeypatch.setenv("CI_INFRA_OTEL_TREATMENT_BRANCH", "khluu/otel")
@@ -243,9 +263,7 @@ def test_otel_trace_allows_exact_api_treatment_branch(
     assert any("ci_otel_start" in command for command in commands)
 
 
-def test_otel_trace_rejects_non_api_treatment_branch(
-    fake_global_config, monkeypatch
-):
+def test_otel_trace_rejects_non_api_treatment_branch(fake_global_config, monkeypatch):
     fake_global_config["branch"] = "khluu/otel"
     monkeypatch.setenv("BUILDKITE_SOURCE", "webhook")
     monkeypatch.setenv("CI_INFRA_OTEL_TREATMENT_BRANCH", "khluu/otel")
@@ -281,6 +299,44 @@ def test_otel_trace_preserves_generator_variable_injection(fake_global_config):
     assert "build registry.example.com vllm-ci $$BUILDKITE_COMMIT" in commands[2]
 
 
+def _inject_sequentially(variables, command):
+    for variable, value in variables.items():
+        if value:
+            command = re.sub(re.escape(variable) + r"\b", value, command)
+    return command
+
+
+@pytest.mark.parametrize(
+    "variables",
+    [
+        {
+            "$REGISTRY": "public.ecr.aws/q9t5s3a7",
+            "$REPO": "vllm-ci-test-repo",
+            "$BUILDKITE_COMMIT": "$$BUILDKITE_COMMIT",
+            "$BRANCH": "main",
+            "$IMAGE_TAG": "public.ecr.aws/q9t5s3a7/vllm-ci-test-repo:$BUILDKITE_COMMIT",
+            "$IMAGE_TAG_LATEST": None,
+        },
+        # A value that references a later variable must still be expanded.
+        {"$A": "$B-suffix", "$B": "b"},
+        # A backslash in a value is a re.sub template escape.
+        {"$A": "x\\ny", "$B": "b"},
+    ],
+)
+def test_variable_injector_matches_sequential_substitution(variables):
+    commands = [
+        "docker build -t $IMAGE_TAG --cache-from $REGISTRY/$REPO:$BRANCH .",
+        "echo $BUILDKITE_COMMIT $$BUILDKITE_COMMIT $IMAGE_TAG_LATEST $IMAGE_TAGS",
+        "$REPO$BRANCH $BRANCH$REPO x$REPO $$REPO $REPO_1 $REPOsitory\n$BRANCH",
+        "$A$B $B$A $A-$B $AB",
+        "no variables here",
+    ]
+    injector = get_variable_injector(variables)
+
+    for command in commands:
+        assert injector.inject(command) == _inject_sequentially(variables, command)
+
+
 def test_otel_helper_bundle_installs_and_sources():
     command = buildkite_step._otel_setup_command().replace("$$", "$")
     result = subprocess.run(
@@ -310,6 +366,104 @@ def test_otel_helper_bundle_installs_and_sources():
     assert result.returncode == 0, result.stderr
 
 
+def _make_buildkite_agent_bin(tmp_path: Path, artifacts_dir: Path) -> Path:
+    """Fake agent whose artifact download copies from artifacts_dir."""
+    bin_dir = tmp_path / "agent-bin"
+    bin_dir.mkdir()
+    agent = bin_dir / "buildkite-agent"
+    agent.write_text(
+        "#!/bin/sh\n"
+        'test "$1 $2" = "artifact download" || exit 1\n'
+        f'cp {shlex.quote(str(artifacts_dir))}/"$3" "$4"/\n',
+        encoding="utf-8",
+    )
+    agent.chmod(0o755)
+    return bin_dir
+
+
+def _run_otel_setup_with_artifacts(tmp_path: Path, artifacts_dir: Path):
+    agent_bin = _make_buildkite_agent_bin(tmp_path, artifacts_dir)
+    command = buildkite_step._otel_setup_command().replace("$$", "$")
+    return subprocess.run(
+        [
+            "bash",
+            "-c",
+            command
+            + ' && test -f "$CI_INFRA_OTEL_DIR/ci_otel.py"'
+            + ' && test "$CI_INFRA_OTEL_READY" = 1',
+        ],
+        check=False,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "PATH": f"{agent_bin}:{os.environ['PATH']}"},
+    )
+
+
+def test_otel_helper_artifact_downloads_and_sources(monkeypatch, tmp_path):
+    monkeypatch.setenv(buildkite_step.OTEL_BUNDLE_ENV_VAR, "artifact")
+    artifacts_dir = tmp_path / "artifacts"
+    artifacts_dir.mkdir()
+    path = buildkite_step.write_otel_helpers_artifact(str(artifacts_dir))
+
+    result = _run_otel_setup_with_artifacts(tmp_path, artifacts_dir)
+
+    assert Path(path).name == buildkite_step.otel_helpers_artifact_name()
+    assert result.returncode == 0, result.stderr
+    assert buildkite_step._otel_helpers_bundle() not in (
+        buildkite_step._otel_setup_command()
+    )
+
+
+def test_otel_helper_artifact_rejects_tampered_bundle(monkeypatch, tmp_path):
+    monkeypatch.setenv(buildkite_step.OTEL_BUNDLE_ENV_VAR, "artifact")
+    artifacts_dir = tmp_path / "artifacts"
+    artifacts_dir.mkdir()
+    path = Path(buildkite_step.write_otel_helpers_artifact(str(artifacts_dir)))
+    path.write_bytes(path.read_bytes() + b"\0")
+
+    result = _run_otel_setup_with_artifacts(tmp_path, artifacts_dir)
+
+    assert result.returncode != 0
+    assert "tracing setup skipped" in result.stderr
+
+
+def test_otel_helper_artifact_shrinks_traced_steps(fake_global_config, monkeypatch):
+    fake_global_config["branch"] = "main"
+    step = Step(label="Traced", group="Tracing", commands=["echo traced"])
+    inline = buildkite_step._prepare_commands(
+        step, variables_to_inject={}, setup_profile="none"
+    )
+    monkeypatch.setenv(buildkite_step.OTEL_BUNDLE_ENV_VAR, "artifact")
+    artifact = buildkite_step._prepare_commands(
+        step, variables_to_inject={}, setup_profile="none"
+    )
+
+    assert len("".join(artifact)) < len("".join(inline)) // 4
+
+
+def test_publish_otel_helper_artifact_uploads_by_content_name(
+    fake_global_config, monkeypatch, tmp_path
+):
+    fake_global_config["branch"] = "main"
+    monkeypatch.setenv(buildkite_step.OTEL_BUNDLE_ENV_VAR, "artifact")
+    uploads = tmp_path / "uploads"
+    agent_bin = tmp_path / "agent-bin"
+    agent_bin.mkdir()
+    agent = agent_bin / "buildkite-agent"
+    agent.write_text(
+        f'#!/bin/sh\necho "$PWD/$3" >> {shlex.quote(str(uploads))}\n',
+        encoding="utf-8",
+    )
+    agent.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{agent_bin}:{os.environ['PATH']}")
+
+    pipeline_generator.publish_otel_helpers_artifact(str(tmp_path))
+
+    name = buildkite_step.otel_helpers_artifact_name()
+    assert uploads.read_text().splitlines() == [str(tmp_path / name)]
+    assert (tmp_path / name).read_bytes() == buildkite_step._otel_helpers_archive()
+
+
 def test_pytest_shim_traces_with_command_level_pythonpath_override(
     fake_global_config, tmp_path
 ):
@@ -810,5 +964,111 @@ def test_step_explicitly_listing_excluded_subtree_still_matches():
     )
 
 
+def test_source_dependency_trie_matches_linear_scan():
+    dependency_lists = [
+        ["vllm/", "tests/models/multimodal"],
+        ["vllm/", "!vllm/distributed/kv_transfer/"],
+        ["vllm/distributed/kv_transfer/kv_connector/v1/nixl/"],
+        ["csrc", "setup.py", "!csrc/rocm"],
+        ["vllm/config/__init__.py"],
+        ["docs//", "!"],
+        ["/"],
+    ]
+    diffs = [
+        [],
+        ["docs/foo.md"],
+        ["vllm/distributed/kv_transfer/kv_connector/v1/nixl/worker.py"],
+        [
+            "vllm/distributed/kv_transfer/kv_connector/v1/nixl/worker.py",
+            "vllm/config/__init__.py",
+        ],
+        ["vllm/config/__init__.pyc", "setup.py"],
+        ["csrc/rocm/attention.cu"],
+        ["csrcx/ops.cu", "tests/models/multimodal/test_llava.py"],
+    ]
+    trie = SourceDependencyTrie(dependency_lists)
+
+    for diff in diffs:
+        triggered = trie.triggered(diff)
+        for deps in dependency_lists:
+            assert (tuple(deps) in triggered) == (
+                buildkite_step._source_file_dependencies_match(deps, diff)
+            ), (deps, diff)
+
+
+def test_step_should_run_uses_precomputed_triggered_set(fake_global_config):
+    step = Step(
+        label="Kernels",
+        group="Kernels",
+        source_file_dependencies=["csrc/", "!csrc/rocm/"],
+    )
+    diff = ["csrc/rocm/attention.cu"]
+    triggered = SourceDependencyTrie([step.source_file_dependencies]).triggered(diff)
+
+    key = tuple(step.source_file_dependencies)
+
+    assert not buildkite_step._step_should_run(step, diff, triggered)
+    assert buildkite_step._step_should_run(
+        step, diff, TriggeredDependencies(frozenset({key}), frozenset({key}))
+    )
+
+
+def test_lists_missing_from_the_trie_fall_back_to_the_linear_scan(
+    fake_global_config,
+):
+    step = Step(label="Kernels", group="Kernels", source_file_dependencies=["csrc/"])
+    diff = ["csrc/ops.cu"]
+    triggered = SourceDependencyTrie([["vllm/"]]).triggered(diff)
+
+    assert triggered.match(step.source_file_dependencies) is None
+    assert buildkite_step._step_should_run(step, diff, triggered)
+
+
+def test_command_step_dump_matches_pydantic_semantics():
+    shared_depends_on = ["image-build"]
+    first = buildkite_step.BuildkiteCommandStep(
+        label="First",
+        key="first",
+        agents={"queue": AgentQueue.SMALL_CPU_PREMERGE},
+        depends_on=shared_depends_on,
+    )
+    second = buildkite_step.BuildkiteCommandStep(
+        label="Second", key="second", depends_on=shared_depends_on
+    )
+    first.depends_on.append("pre-commit")
+    first.commands.append("echo first")
+
+    assert first.model_dump(exclude_none=True) == {
+        "label": "First",
+        "key": "first",
+        "agents": {"queue": "small_cpu_queue_premerge"},
+        "commands": ["echo first"],
+        "depends_on": ["image-build", "pre-commit"],
+        "soft_fail": False,
+    }
+    assert type(first.agents["queue"]) is str
+    # Containers are copied on construction and defaults are per instance.
+    assert second.depends_on == shared_depends_on == ["image-build"]
+    assert second.commands == []
+    assert "group" in first.model_dump() and first.model_dump()["group"] is None
+
+
+def test_group_step_dump_shares_no_containers():
+    retry = {"automatic": [{"exit_status": -1, "limit": 1}]}
+    group = buildkite_step.BuildkiteGroupStep(
+        group="g",
+        steps=[
+            buildkite_step.BuildkiteCommandStep(label=label, key=label, retry=retry)
+            for label in ("a", "b")
+        ],
+    )
+
+    dumped = group.model_dump(exclude_none=True)
+
+    assert dumped["steps"][0]["retry"] == dumped["steps"][1]["retry"] == retry
+    assert dumped["steps"][0]["retry"] is not dumped["steps"][1]["retry"]
+    assert "&id" not in yaml_io.dump(dumped)
+
+
 if __name__ == "__main__":
     sys.exit(pytest.main(["-v", __file__]))
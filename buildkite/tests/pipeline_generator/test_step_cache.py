@@ -0,0 +1,108 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+import pytest
+
+import step as step_module
+from step import read_steps_from_job_dir
+from step_cache import StepCache
+from utils_lib import cache_utils
+
+pytestmark = pytest.mark.usefixtures("fake_global_config")
+
+TEST_JOB_DIR = Path(__file__).resolve().parent / "test_files" / "test_jobs"
+
+
+def _copy_job_dir(tmp_path: Path) -> Path:
+    job_dir = tmp_path / "jobs"
+    shutil.copytree(TEST_JOB_DIR, job_dir)
+    return job_dir
+
+
+def test_cache_hit_skips_parsing_and_matches_fresh_load(tmp_path, monkeypatch):
+    job_dir = _copy_job_dir(tmp_path)
+    cache = StepCache(str(tmp_path / "cache"))
+    fresh = read_steps_from_job_dir(str(job_dir), step_cache=cache)
+    assert (cache.hits, cache.misses) == (0, 2)
+
+    def fail_parse(contents):
+        raise AssertionError("cached job file was parsed again")
+
+    monkeypatch.setattr(step_module, "_parse_job_contents", fail_parse)
+    cache = StepCache(str(tmp_path / "cache"))
+    cached = read_steps_from_job_dir(str(job_dir), step_cache=cache)
+
+    assert (cache.hits, cache.misses) == (2, 0)
+    assert [step.model_dump() for step in cached] == [
+        step.model_dump() for step in fresh
+    ]
+
+
+def test_changed_job_file_misses_cache(tmp_path):
+    job_dir = _copy_job_dir(tmp_path)
+    read_steps_from_job_dir(str(job_dir), step_cache=StepCache(str(tmp_path / "c")))
+    job_file = job_dir / "group_a.yaml"
+    job_file.write_text(job_file.read_text().replace("Test E", "Test E2"))
+
+    cache = StepCache(str(tmp_path / "c"))
+    steps = read_steps_from_job_dir(str(job_dir), step_cache=cache)
+
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert "Test E2" in {step.label for step in steps}
+    assert cache.stats_line().startswith("Step cache: 1 hits, 1 misses")
+
+
+def test_cache_key_includes_generator_version(monkeypatch):
+    key = StepCache.key(b"steps: []")
+    monkeypatch.setattr("step_cache.get_generator_version", lambda: "other")
+
+    assert StepCache.key(b"steps: []") != key
+
+
+def test_generator_version_covers_every_generator_file(tmp_path, monkeypatch):
+    root = tmp_path / "pipeline_generator"
+    (root / "otel_helpers").mkdir(parents=True)
+    (root / "step.py").write_text("")
+    script = root / "otel_helpers" / "ci_otel.sh"
+    script.write_text("echo one\n")
+    monkeypatch.setattr(cache_utils, "GENERATOR_DIR", root)
+
+    def version():
+        cache_utils.get_generator_version.cache_clear()
+        return cache_utils.get_generator_version()
+
+    before = version()
+    # Shims linked in by ci_otel.sh and bytecode are not sources.
+    (root / "otel_helpers" / "bin").mkdir()
+    (root / "otel_helpers" / "bin" / "pytest").symlink_to(script)
+    (root / "__pycache__").mkdir()
+    (root / "__pycache__" / "step.cpython-312.pyc").write_bytes(b"\0")
+    assert version() == before
+
+    script.write_text("echo two\n")
+    assert version() != before
+    cache_utils.get_generator_version.cache_clear()
+
+
+def test_evict_drops_expired_then_oldest_entries(tmp_path):
+    cache = StepCache(str(tmp_path), max_bytes=250, max_age_seconds=3600)
+    now = time.time()
+    for name, age in (("expired", 7200), ("old", 600), ("new", 60)):
+        path = tmp_path / f"{name}.json"
+        path.write_text("x" * 200)
+        os.utime(path, (now - age, now - age))
+
+    cache.evict()
+
+    assert sorted(os.listdir(tmp_path)) == ["new.json"]
+    assert cache.evicted == 2
+
+
+def test_corrupt_entry_is_a_miss(tmp_path):
+    cache = StepCache(str(tmp_path))
+    (tmp_path / "bad.json").write_text("{not json")
+
+    assert cache.get("bad") is None
+    assert cache.misses == 1
@@ -0,0 +1,107 @@
+import pytest
+
+from pipeline_generator import select_steps_and_dependencies
+from step import Step
+from step_graph import StepGraph
+
+
+@pytest.fixture
+def graph(command_step):
+    #   image-build <- prepare <- test-a
+    #            ^           ^--- test-b <- report
+    #            '--- lint
+    return StepGraph(
+        [
+            command_step("report", "test-b"),
+            command_step("test-a", "prepare"),
+            command_step("image-build"),
+            command_step("test-b", "prepare"),
+            command_step("prepare", "image-build"),
+            command_step("lint", "image-build"),
+            Step(label="No key", commands=["true"]),
+        ]
+    )
+
+
+def test_adjacency_and_reverse_adjacency(graph):
+    assert graph.dependencies["test-b"] == ("prepare",)
+    assert graph.dependents["prepare"] == ("test-a", "test-b")
+    assert graph.dependents["image-build"] == ("prepare", "lint")
+    assert len(graph) == 6
+    assert "No key" not in graph
+
+
+def test_closures(graph):
+    assert graph.dependency_closure("report") == {"test-b", "prepare", "image-build"}
+    assert graph.dependency_closure("image-build") == frozenset()
+    assert graph.dependent_closure("prepare") == {"test-a", "test-b", "report"}
+    assert graph.dependent_closure("image-build") == {
+        "prepare",
+        "lint",
+        "test-a",
+        "test-b",
+        "report",
+    }
+
+
+def test_closures_are_memoized(graph):
+    first = graph.dependency_closure("report")
+
+    assert graph.dependency_closure("report") is first
+    assert graph.dependency_closure("test-b") == {"prepare", "image-build"}
+
+
+def test_topological_order_keeps_load_order_for_ties(graph):
+    assert graph.topological_order() == [
+        "image-build",
+        "prepare",
+        "test-a",
+        "test-b",
+        "report",
+        "lint",
+    ]
+
+
+def test_cycles_are_detected(command_step):
+    graph = StepGraph(
+        [
+            command_step("a", "c"),
+            command_step("b", "a"),
+            command_step("c", "b"),
+            command_step("d", "a"),
+        ]
+    )
+
+    assert graph.find_cycle() == ["a", "c", "b", "a"]
+    assert graph.find_cycle({"d"}) is None
+    assert graph.dependency_closure("d") == {"a", "b", "c"}
+    with pytest.raises(ValueError, match="dependency cycle: a -> c -> b -> a"):
+        graph.topological_order()
+
+
+def test_selection_rejects_cycles():
+    # Selection runs on the job-dir steps, before they are converted.
+    steps = [
+        Step(label="A", key="a", depends_on=["b"], commands=["a"]),
+        Step(label="B", key="b", depends_on=["a"], commands=["b"]),
+        Step(label="Other", key="other", commands=["other"]),
+    ]
+
+    assert select_steps_and_dependencies(steps, frozenset({"other"}))[1] == {"other"}
+    with pytest.raises(ValueError, match="dependency cycle: a -> b -> a"):
+        select_steps_and_dependencies(steps, frozenset({"a"}))
+
+
+def test_unknown_dependencies_only_fail_when_walked(command_step):
+    graph = StepGraph([command_step("test", "missing"), command_step("other")])
+
+    assert graph.select({"other"}) == {"other"}
+    assert graph.dependent_closure("other") == frozenset()
+    assert graph.topological_order() == ["test", "other"]
+    with pytest.raises(ValueError, match="CI step test depends on unknown step"):
+        graph.select({"test"})
+
+
+def test_duplicate_keys_are_rejected(command_step):
+    with pytest.raises(ValueError, match="Duplicate CI step key: a"):
+        StepGraph([command_step("a"), command_step("a")])